@@ -0,0 +1,267 @@
+"""
+Typed AST built by Parser(tokens, build_ast=True).
+
+Nodes use __slots__ so whole-program trees stay small in memory while later phases walk
+them repeatedly. Expression nodes carry the Type computed by the semantic checks and
+statements/expressions carry the source line of the token that introduced them.
+"""
+
+
+class Node:
+    __slots__ = ("line",)
+    fields = ()  # Child node attributes, in evaluation order, used by walk()
+
+
+# ---------- Declarations ----------
+
+class Unit(Node):
+    __slots__ = ("decls", "symbols")
+    fields = ("decls",)
+
+    def __init__(self, decls, symbols, line=1):
+        self.decls = decls  # StructDecl, VarDecl and FuncDecl in source order
+        self.symbols = symbols  # SymbolTable of the unit
+        self.line = line
+
+
+class StructDecl(Node):
+    __slots__ = ("symbol",)
+
+    def __init__(self, symbol, line):
+        self.symbol = symbol  # CLS_STRUCT symbol, members included
+        self.line = line
+
+
+class VarDecl(Node):
+    __slots__ = ("symbol",)
+
+    def __init__(self, symbol, line):
+        self.symbol = symbol  # CLS_VAR symbol (MEM_GLOBAL or MEM_LOCAL)
+        self.line = line
+
+
+class FuncDecl(Node):
+    __slots__ = ("symbol", "body", "locals")
+    fields = ("body",)
+
+    def __init__(self, symbol, body, locals_, line):
+        self.symbol = symbol  # CLS_FUNC symbol; symbol.args are the MEM_ARG symbols used in the body
+        self.body = body  # Block
+        self.locals = locals_  # MEM_LOCAL symbols of the whole body, in declaration order
+        self.line = line
+
+
+# ---------- Statements ----------
+
+class Block(Node):
+    __slots__ = ("items",)
+    fields = ("items",)
+
+    def __init__(self, items, line):
+        self.items = items  # VarDecl and statements
+        self.line = line
+
+
+class If(Node):
+    __slots__ = ("cond", "then", "orelse")
+    fields = ("cond", "then", "orelse")
+
+    def __init__(self, cond, then, orelse, line):
+        self.cond = cond
+        self.then = then
+        self.orelse = orelse  # None without else
+        self.line = line
+
+
+class While(Node):
+    __slots__ = ("cond", "body")
+    fields = ("cond", "body")
+
+    def __init__(self, cond, body, line):
+        self.cond = cond
+        self.body = body
+        self.line = line
+
+
+class For(Node):
+    __slots__ = ("init", "cond", "step", "body")
+    fields = ("init", "cond", "step", "body")
+
+    def __init__(self, init, cond, step, body, line):
+        self.init = init  # Each of init, cond and step may be None
+        self.cond = cond
+        self.step = step
+        self.body = body
+        self.line = line
+
+
+class Break(Node):
+    __slots__ = ()
+
+    def __init__(self, line):
+        self.line = line
+
+
+class Return(Node):
+    __slots__ = ("value",)
+    fields = ("value",)
+
+    def __init__(self, value, line):
+        self.value = value  # None for a bare return
+        self.line = line
+
+
+class ExprStm(Node):
+    __slots__ = ("expr",)
+    fields = ("expr",)
+
+    def __init__(self, expr, line):
+        self.expr = expr
+        self.line = line
+
+
+# ---------- Expressions ----------
+
+class Expr(Node):
+    __slots__ = ("type",)  # Type of the result
+
+
+class Const(Expr):
+    __slots__ = ("value",)
+
+    def __init__(self, value, type_, line):
+        self.value = value  # int for int/char, float for double, str for strings
+        self.type = type_
+        self.line = line
+
+
+class Var(Expr):
+    __slots__ = ("symbol",)
+
+    def __init__(self, symbol, line):
+        self.symbol = symbol
+        self.type = symbol.type
+        self.line = line
+
+
+class Call(Expr):
+    __slots__ = ("symbol", "args")
+    fields = ("args",)
+
+    def __init__(self, symbol, args, line):
+        self.symbol = symbol  # CLS_FUNC or CLS_EXTFUNC
+        self.args = args
+        self.type = symbol.type
+        self.line = line
+
+
+class Index(Expr):
+    __slots__ = ("base", "index")
+    fields = ("base", "index")
+
+    def __init__(self, base, index, type_, line):
+        self.base = base
+        self.index = index
+        self.type = type_
+        self.line = line
+
+
+class Member(Expr):
+    __slots__ = ("base", "field")
+    fields = ("base",)
+
+    def __init__(self, base, field, line):
+        self.base = base
+        self.field = field  # Member symbol of the struct
+        self.type = field.type
+        self.line = line
+
+
+class Unary(Expr):
+    __slots__ = ("op", "operand")
+    fields = ("operand",)
+
+    def __init__(self, op, operand, type_, line):
+        self.op = op  # "-" or "!"
+        self.operand = operand
+        self.type = type_
+        self.line = line
+
+
+class Binary(Expr):
+    __slots__ = ("op", "left", "right")
+    fields = ("left", "right")
+
+    def __init__(self, op, left, right, type_, line):
+        self.op = op  # || && == != < <= > >= + - * /
+        self.left = left
+        self.right = right
+        self.type = type_
+        self.line = line
+
+
+class Cast(Expr):
+    __slots__ = ("operand",)
+    fields = ("operand",)
+
+    def __init__(self, operand, type_, line):
+        self.operand = operand
+        self.type = type_
+        self.line = line
+
+
+class Assign(Expr):
+    __slots__ = ("target", "value")
+    fields = ("target", "value")
+
+    def __init__(self, target, value, type_, line):
+        self.target = target  # Var, Index or Member
+        self.value = value
+        self.type = type_
+        self.line = line
+
+
+# ---------- Helpers ----------
+
+def children(node):
+    """Direct child nodes, in evaluation order"""
+    for name in node.fields:
+        value = getattr(node, name)
+        if isinstance(value, list):
+            yield from value
+        elif value is not None:
+            yield value
+
+
+def walk(node):
+    """Yields node and all its descendants, depth first"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(list(children(node))))
+
+
+def type_name(t):
+    name = t.typeBase if t.structSymbol is None else f"struct {t.structSymbol.name}"
+    return name if t.nElements == -1 else f"{name}[{t.nElements or ''}]"
+
+
+def dump(node, indent=0):
+    """Readable multi-line rendering of a tree, for debugging"""
+    pad = "  " * indent
+    label = type(node).__name__
+    if isinstance(node, (StructDecl, VarDecl, FuncDecl, Var, Call)):
+        label += f" {node.symbol.name}"
+    elif isinstance(node, Member):
+        label += f" .{node.field.name}"
+    elif isinstance(node, (Unary, Binary)):
+        label += f" {node.op}"
+    elif isinstance(node, Const):
+        label += f" {node.value!r}"
+    if isinstance(node, Expr):
+        label += f" : {type_name(node.type)}"
+    lines = [f"{pad}{label}  @{node.line}"]
+    for child in children(node):
+        lines.append(dump(child, indent + 1))
+    return "\n".join(lines)
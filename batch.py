@@ -0,0 +1,263 @@
+"""
+Batch compilation driver: runs lex + parse + semantic checks on many AtomC files
+across a process pool and reports per-file results and aggregated timings.
+
+Usage: python batch.py [-j WORKERS] [--engine regex|dfa] [--cache-dir DIR [--cache-size MB]]
+                       [--time-report JSON] [--import FILE.atomi ...] PATH [PATH ...]
+Directories are searched (non-recursively) for *.c files. With --cache-dir, files whose
+content was already compiled are answered from the on-disk cache. With --time-report, the
+phases, grammar rules and semantic checks are timed (see instrument.py); the merged
+report is written as JSON and printed as a table. With --import, the declarations of the
+given interface files (see interface.py) are visible to every file.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from compile_cache import DEFAULT_MAX_BYTES, CacheEntry, CompileCache
+from instrument import Profiler, format_table, merge_reports, to_json
+from interface import load_imports
+from lexical_analyzer import TokenWindow, tokenize, tokenize_buffer, tokenize_file
+from syntactic_analyzer import Parser
+
+
+class CompileResult:
+    def __init__(self, path):
+        self.path = path
+        self.ok = False
+        self.error = None  # Diagnostic message when the file failed
+        self.tokens = 0  # Number of tokens, EOF included
+        self.symbols = 0  # Number of symbols defined in the unit
+        self.rescanned = 0  # Tokens the parser had to scan again after rewinding
+        self.lex_time = 0.0
+        self.parse_time = 0.0
+        self.cached = None  # True on a cache hit, False on a miss, None without a cache
+        self.evictions = 0  # Cache entries evicted while storing this result
+        self.profile = None  # Profiler.report() of the compile, with time_report on a cache miss
+
+    @property
+    def total_time(self):
+        return self.lex_time + self.parse_time
+
+
+_caches = {}  # Cache directory -> CompileCache, one per worker process
+
+
+def get_cache(directory, max_bytes=DEFAULT_MAX_BYTES):
+    cache = _caches.get(directory)
+    if cache is None:
+        cache = _caches[directory] = CompileCache(directory, max_bytes)
+    return cache
+
+
+_imports = {}  # Tuple of interface paths -> Parser imports, mapped once per worker process
+
+
+def get_imports(paths):
+    imports = _imports.get(paths)
+    if imports is None:
+        imports = _imports[paths] = load_imports(paths)
+    return imports
+
+
+def describe_error(e):
+    return str(e) if isinstance(e, (SyntaxError, OSError)) else f"{type(e).__name__}: {e}"
+
+
+def compile_file(path, engine="regex", cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES, time_report=False,
+                 imports=()):
+    """
+    Compiles one file and returns its CompileResult; never raises. Without a cache, which keys
+    on the whole source, or a time report, which times lexing apart, the regex engine streams it
+    """
+    if engine == "regex" and not cache_dir and not time_report:
+        return compile_stream(path, imports)
+    try:
+        with open(path, 'r') as file:
+            code = file.read()
+    except Exception as e:
+        result = CompileResult(path)
+        result.error = describe_error(e)
+        return result
+    return compile_code(code, path, engine, cache_dir, cache_max_bytes, time_report, imports)
+
+
+def compile_stream(path, imports=()):
+    """
+    Compiles the file at path as it is read, a chunk at a time (tokenize_file), with the parser
+    indexing a TokenWindow: neither the source nor its tokens are ever held whole
+    """
+    result = CompileResult(path)
+    try:
+        interfaces = get_imports(tuple(imports)) if imports else None
+        start = time.perf_counter()
+        tokens = TokenWindow(tokenize_file(path))
+        parser = Parser(tokens, imports=interfaces)
+        parser.parse_unit()
+        result.parse_time = time.perf_counter() - start  # Lexing included: tokens are read as they are parsed
+        result.tokens = len(tokens)
+        result.symbols = len(parser.symbols)
+        result.rescanned = parser.rescanned_tokens
+        result.ok = True
+    except Exception as e:  # One bad file must not stop the batch
+        result.error = describe_error(e)
+    return result
+
+
+def lex(code, engine):
+    """Tokens of code; the regex engine stores them in a TokenBuffer, which the parser reads like a list"""
+    return tokenize_buffer(code) if engine == "regex" else tokenize(code, engine)
+
+
+def compile_code(code, path="<source>", engine="regex", cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+                 time_report=False, imports=()):
+    """
+    Compiles source text, reported under path, and returns its CompileResult; never raises.
+    imports: paths of interface files whose declarations the source may use.
+    """
+    result = CompileResult(path)
+    try:
+        interfaces = get_imports(tuple(imports)) if imports else None
+    except (OSError, ValueError) as e:
+        result.error = describe_error(e)
+        return result
+    cache = get_cache(cache_dir, cache_max_bytes) if cache_dir else None
+    cache_key = code
+    if cache and interfaces:
+        cache_key = "\0".join([code] + [interface.digest for interface in interfaces])  # Results depend on them
+    if cache:
+        entry = cache.get(cache_key)
+        result.cached = entry is not None
+        if entry is not None:
+            result.ok = entry.ok
+            result.error = entry.error
+            result.tokens = len(entry.tokens)
+            result.symbols = len(entry.symbols) if entry.symbols is not None else 0
+            return result
+
+    tokens = []
+    parser = None
+    cacheable = True
+    profiler = Profiler() if time_report else None
+    try:
+        start = time.perf_counter()
+        if profiler:
+            with profiler.phase("tokenize"):
+                tokens = lex(code, engine)
+        else:
+            tokens = lex(code, engine)
+        result.lex_time = time.perf_counter() - start
+        result.tokens = len(tokens)
+
+        start = time.perf_counter()
+        parser = Parser(tokens, imports=interfaces)
+        if profiler:
+            profiler.attach(parser)
+            with profiler.checks(), profiler.phase("parse"):
+                parser.parse_unit()
+        else:
+            parser.parse_unit()
+        result.parse_time = time.perf_counter() - start
+        result.symbols = len(parser.symbols)
+        result.rescanned = parser.rescanned_tokens
+        result.ok = True
+    except SyntaxError as e:
+        result.error = describe_error(e)
+    except Exception as e:  # One bad file must not stop the batch
+        result.error = describe_error(e)
+        cacheable = False  # Not a diagnostic, e.g. RecursionError; it may not happen again
+    if profiler:
+        result.profile = profiler.report()
+
+    if cache and cacheable:
+        evictions = cache.evictions
+        try:
+            cache.put(cache_key, CacheEntry(tokens, result.ok, result.error, parser.symbols if result.ok else None))
+        except Exception as e:  # A broken cache only costs the speedup
+            print(f"cache write failed for {path}: {describe_error(e)}", file=sys.stderr)
+        result.evictions = cache.evictions - evictions
+    return result
+
+
+def collect_sources(paths):
+    """Expands directories into their *.c files, keeping the given order"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(sorted(glob.glob(os.path.join(path, "*.c"))))
+        else:
+            sources.append(path)
+    return sources
+
+
+def compile_batch(paths, workers=None, engine="regex", cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+                  time_report=False, imports=()):
+    """
+    Compiles the given files, using a process pool of `workers` processes (None: one per CPU,
+    1: in this process). Results come back in input order.
+    """
+    options = ([engine] * len(paths), [cache_dir] * len(paths), [cache_max_bytes] * len(paths),
+               [time_report] * len(paths), [tuple(imports)] * len(paths))
+    if workers == 1 or len(paths) <= 1:
+        return list(map(compile_file, paths, *options))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(compile_file, paths, *options, chunksize=max(1, len(paths) // 64)))
+
+
+def print_report(results, wall_time, out=sys.stdout):
+    for result in results:
+        if result.ok and result.cached:
+            print(f"OK     {result.path}: {result.tokens} tokens, {result.symbols} symbols, cached", file=out)
+        elif result.ok:
+            print(f"OK     {result.path}: {result.tokens} tokens, {result.symbols} symbols, "
+                  f"lex {result.lex_time * 1000:.2f}ms, parse {result.parse_time * 1000:.2f}ms", file=out)
+        else:
+            print(f"ERROR  {result.path}: {result.error}", file=out)
+
+    failed = sum(1 for result in results if not result.ok)
+    tokens = sum(result.tokens for result in results)
+    lex_time = sum(result.lex_time for result in results)
+    parse_time = sum(result.parse_time for result in results)
+    print("-" * 60, file=out)
+    print(f"{len(results)} files, {len(results) - failed} ok, {failed} failed, {tokens} tokens", file=out)
+    print(f"lex {lex_time:.3f}s + parse {parse_time:.3f}s summed over files, {wall_time:.3f}s wall", file=out)
+    print(f"{sum(result.rescanned for result in results)} tokens re-scanned by the parser", file=out)
+    if any(result.cached is not None for result in results):
+        hits = sum(1 for result in results if result.cached)
+        misses = sum(1 for result in results if result.cached is False)
+        evictions = sum(result.evictions for result in results)
+        print(f"cache: {hits} hits, {misses} misses, {evictions} evictions", file=out)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compile many AtomC files in parallel")
+    arg_parser.add_argument("paths", nargs="+", help="source files or directories of *.c files")
+    arg_parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    arg_parser.add_argument("--engine", choices=["regex", "dfa"], default="regex", help="lexer engine")
+    arg_parser.add_argument("--cache-dir", default=None, help="directory of the on-disk result cache")
+    arg_parser.add_argument("--cache-size", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                            help="cache size limit in MB before least recently used entries are evicted")
+    arg_parser.add_argument("--time-report", metavar="JSON", default=None,
+                            help="time phases, grammar rules and semantic checks; write the report to JSON")
+    arg_parser.add_argument("--import", dest="imports", metavar="FILE", action="append", default=[],
+                            help="interface file whose declarations every file may use (repeatable)")
+    args = arg_parser.parse_args(argv)
+
+    paths = collect_sources(args.paths)
+    start = time.perf_counter()
+    results = compile_batch(paths, args.workers, args.engine, args.cache_dir, int(args.cache_size * 1024 * 1024),
+                            args.time_report is not None, args.imports)
+    print_report(results, time.perf_counter() - start)
+    if args.time_report is not None:
+        report = merge_reports(result.profile for result in results if result.profile is not None)
+        with open(args.time_report, 'w') as file:
+            file.write(to_json(report))
+        print(format_table(report))
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
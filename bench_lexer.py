@@ -0,0 +1,53 @@
+"""
+Benchmarks the lexer engines of lexical_analyzer against each other on a large input
+made of copies of the tests/ corpus.
+
+Usage: python bench_lexer.py [copies] [repeats]
+"""
+import glob
+import os
+import sys
+import time
+
+from lexical_analyzer import tokenize
+
+ENGINES = ["regex", "dfa"]
+
+
+def build_input(copies):
+    corpus_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests")
+    sources = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.c"))):
+        with open(path, 'r') as file:
+            sources.append(file.read())
+    return "\n".join(sources * copies)
+
+
+def bench(code, engine, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        tokens = tokenize(code, engine)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, tokens
+
+
+if __name__ == "__main__":
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    code = build_input(copies)
+
+    results = {}
+    for engine in ENGINES:
+        results[engine] = bench(code, engine, repeats)
+
+    reference = results[ENGINES[0]][1]
+    for engine in ENGINES[1:]:
+        if results[engine][1] != reference:
+            raise SystemExit(f"engine {engine} produced different tokens than {ENGINES[0]}")
+
+    print(f"Input: {len(code)} chars, {len(reference)} tokens (best of {repeats})")
+    for engine in ENGINES:
+        elapsed = results[engine][0]
+        print(f"  {engine:6} {elapsed:8.3f}s  {len(reference) / elapsed:12.0f} tokens/s")
@@ -0,0 +1,146 @@
+"""
+Scaling benchmark of the compiler phases on programs generated by gen_atomc.py.
+
+For every shape and size tier it reports, per phase (tokenize, parse with the semantic
+checks, codegen from the AST), the best wall time of a few runs, tokens/s, lines/s and
+the peak memory allocated by the phase (tracemalloc, measured in a separate run so it
+does not slow down the timed ones). The last column compares the cost per token with the
+smallest tier of the same shape: it stays near 1.0 for linear phases, and values marked
+with '!' point at super-linear behavior.
+
+Usage: python bench_scaling.py [--shapes globals,nesting,...] [--tiers 1,2,4,8] [--repeats 3] [--json FILE]
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from codegen import compile_unit
+from gen_atomc import SHAPES, generate
+from lexical_analyzer import tokenize
+from syntactic_analyzer import Parser
+
+BASE_SIZES = {"globals": 1000, "nesting": 20, "expressions": 64, "structs": 50, "functions": 50, "mixed": 100}
+PHASES = ["tokenize", "parse", "codegen"]
+SUPER_LINEAR = 2.0  # Cost per token relative to the smallest tier above which a phase is flagged
+
+
+def run_phases(code):
+    """Runs every phase once; returns ({phase: seconds}, token count)"""
+    times = {}
+    start = time.perf_counter()
+    tokens = tokenize(code)
+    times["tokenize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Parser(tokens).parse_unit()
+    times["parse"] = time.perf_counter() - start
+
+    parser = Parser(tokens, build_ast=True)  # AST construction is not part of the measured codegen phase
+    parser.parse_unit()
+    start = time.perf_counter()
+    compile_unit(parser.unit)
+    times["codegen"] = time.perf_counter() - start
+    return times, len(tokens)
+
+
+def peak_memory(code):
+    """Peak bytes allocated during each phase"""
+    peaks = {}
+    tracemalloc.start()
+    try:
+        def measure(phase, fn):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = fn()
+            peaks[phase] = tracemalloc.get_traced_memory()[1] - base
+            return result
+
+        tokens = measure("tokenize", lambda: tokenize(code))
+        measure("parse", lambda: Parser(tokens).parse_unit())
+        parser = Parser(tokens, build_ast=True)
+        parser.parse_unit()
+        measure("codegen", lambda: compile_unit(parser.unit))
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def bench_shape(shape, tiers, repeats):
+    rows = []
+    for tier in tiers:
+        size = BASE_SIZES[shape] * tier
+        code = generate(shape, size)
+        row = {"shape": shape, "size": size, "lines": code.count("\n"), "tokens": 0, "phases": {}, "error": None}
+        try:
+            best = {}
+            for _ in range(repeats):
+                times, row["tokens"] = run_phases(code)
+                for phase, elapsed in times.items():
+                    best[phase] = min(best.get(phase, elapsed), elapsed)
+            peaks = peak_memory(code)
+        except (RecursionError, SyntaxError) as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+            rows.append(row)
+            continue
+        for phase in PHASES:
+            row["phases"][phase] = {
+                "seconds": best[phase],
+                "tokens_per_second": row["tokens"] / best[phase] if best[phase] else 0.0,
+                "lines_per_second": row["lines"] / best[phase] if best[phase] else 0.0,
+                "peak_bytes": peaks[phase],
+            }
+        rows.append(row)
+
+    # Cost per token relative to the smallest tier that ran
+    first = next((row for row in rows if row["error"] is None), None)
+    for row in rows:
+        for phase, entry in row["phases"].items():
+            reference = first["phases"][phase]["seconds"] / first["tokens"]
+            entry["relative_cost"] = (entry["seconds"] / row["tokens"]) / reference if reference else 0.0
+    return rows
+
+
+def print_rows(rows, out=sys.stdout):
+    print(f"{'shape':12} {'size':>6} {'lines':>7} {'tokens':>8}  {'phase':9} {'ms':>9} {'tokens/s':>11} "
+          f"{'lines/s':>10} {'peak MB':>8} {'cost/token':>10}", file=out)
+    for row in rows:
+        head = f"{row['shape']:12} {row['size']:>6} {row['lines']:>7} {row['tokens']:>8}"
+        if row["error"]:
+            print(f"{head}  {row['error']}", file=out)
+            continue
+        for phase in PHASES:
+            entry = row["phases"][phase]
+            flag = "!" if entry["relative_cost"] > SUPER_LINEAR else " "
+            print(f"{head}  {phase:9} {entry['seconds'] * 1000:>9.2f} {entry['tokens_per_second']:>11.0f} "
+                  f"{entry['lines_per_second']:>10.0f} {entry['peak_bytes'] / 1e6:>8.2f} "
+                  f"{entry['relative_cost']:>9.2f}{flag}", file=out)
+            head = " " * len(head)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Measure how the compiler phases scale with input size")
+    arg_parser.add_argument("--shapes", default=",".join(SHAPES), help="comma separated gen_atomc shapes")
+    arg_parser.add_argument("--tiers", default="1,2,4,8", help="comma separated multipliers of each shape's base size")
+    arg_parser.add_argument("--repeats", type=int, default=3, help="timed runs per tier, the best one is kept")
+    arg_parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = arg_parser.parse_args(argv)
+
+    tiers = [int(tier) for tier in args.tiers.split(",")]
+    results = []
+    for shape in args.shapes.split(","):
+        if shape not in SHAPES:
+            raise SystemExit(f"unknown shape {shape!r}, expected one of {', '.join(SHAPES)}")
+        rows = bench_shape(shape, tiers, args.repeats)
+        print_rows(rows)
+        print()
+        results.extend(rows)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
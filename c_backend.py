@@ -0,0 +1,607 @@
+"""
+Backend that emits C for a checked AtomC unit, with a small runtime for the predefined
+functions, and optionally builds it with the system compiler.
+
+Usage: python c_backend.py FILE.c [-o OUT.c] [--build EXE] [--run] [--cc CC]
+
+Types map to C types (char is unsigned char, as the VM keeps chars in 0..255), structs to
+C structs and arrays to C arrays; argument arrays are pointers and structs are passed,
+assigned and returned by value. Every name gets a prefix (f_, g_, v_, s_, m_) so AtomC
+names never clash with C keywords or the runtime.
+
+C leaves the evaluation order of operands and arguments unspecified while the VM goes left
+to right, so when a later operand has side effects, the earlier ones are saved in
+temporaries inside a comma expression. The runtime reads input words and lines like
+vm.Runtime and reports runtime errors in the VM's format. int arithmetic wraps at 32 bits
+like the VM's (-fwrapv, and helpers for INT_MIN / -1 and double to int conversions). Unlike
+the VM, memory accesses are not bounds checked, and a struct argument is copied when it is
+evaluated, as in C, where the VM copies it when the callee starts (the two differ when a
+later argument changes the struct).
+"""
+import argparse
+import math
+import os
+import subprocess
+import sys
+import tempfile
+
+from ast_nodes import Assign, Binary, Block, Break, Call, Cast, Const, ExprStm, For, FuncDecl, If, Index, Member, \
+    Return, StructDecl, Unary, Var, VarDecl, While, walk
+from codegen import char_arithmetic, is_aggregate
+from lexical_analyzer import tokenize
+from syntactic_analyzer import CLS_EXTFUNC, MEM_GLOBAL, TB_CHAR, TB_DOUBLE, TB_INT, TB_STRUCT, TB_VOID, Parser
+
+DEFAULT_CC = os.environ.get("CC", "cc")
+DEFAULT_CFLAGS = ["-std=c11", "-O2", "-fwrapv"]  # -fwrapv: int overflow wraps instead of being undefined
+INDENT = "    "
+
+C_TYPES = {TB_INT: "int", TB_DOUBLE: "double", TB_CHAR: "unsigned char", TB_VOID: "void"}
+LINE_ARGUMENT = {"get_i", "get_d", "get_c", "get_s"}  # Builtins that may fail and report the line of their call
+
+RUNTIME = r"""#include <ctype.h>
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+static void atomc_error(int line, const char *message)
+{
+    fflush(stdout);
+    if (line > 0)
+        fprintf(stderr, "\nruntime error: Line %d: %s\n", line, message);
+    else
+        fprintf(stderr, "\nruntime error: %s\n", message);
+    exit(1);
+}
+
+static int atomc_div(int a, int b, int line)
+{
+    if (b == 0)
+        atomc_error(line, "division by zero");
+    if (b == -1)
+        return (int)(0u - (unsigned)a);  /* INT_MIN / -1 wraps, like the VM */
+    return a / b;
+}
+
+/* The VM truncates a double and wraps it to 32 bits; a C cast is undefined out of range */
+static int atomc_toint(double d, int line)
+{
+    if (d > -2147483649.0 && d < 2147483648.0)
+        return (int)d;
+    if (isnan(d))
+        atomc_error(line, "cannot convert float NaN to integer");
+    if (isinf(d))
+        atomc_error(line, "cannot convert float infinity to integer");
+    return (int)(unsigned)(long long)fmod(d, 4294967296.0);
+}
+
+static double atomc_fdiv(double a, double b, int line)
+{
+    if (b == 0)
+        atomc_error(line, "division by zero");
+    return a / b;
+}
+
+/* Input is read a line at a time; atomc_pending is the unread rest of the current line */
+static char *atomc_line;
+static size_t atomc_line_size;
+static char *atomc_pending = "";
+
+static void atomc_fill(int line)
+{
+    size_t length = 0;
+    if (!atomc_line) {
+        atomc_line_size = 256;
+        atomc_line = malloc(atomc_line_size);
+    }
+    for (;;) {
+        if (!fgets(atomc_line + length, (int)(atomc_line_size - length), stdin)) {
+            if (length == 0)
+                atomc_error(line, "unexpected end of input");
+            break;
+        }
+        length += strlen(atomc_line + length);
+        if (length > 0 && atomc_line[length - 1] == '\n')
+            break;
+        if (length + 1 == atomc_line_size) {
+            atomc_line_size *= 2;
+            atomc_line = realloc(atomc_line, atomc_line_size);
+        }
+    }
+    atomc_pending = atomc_line;
+}
+
+static int atomc_blank(const char *s)
+{
+    for (; *s; s++)
+        if (!isspace((unsigned char)*s))
+            return 0;
+    return 1;
+}
+
+static void atomc_skip_space(void)
+{
+    while (isspace((unsigned char)*atomc_pending))
+        atomc_pending++;
+}
+
+static char *atomc_word(int line)
+{
+    char *word;
+    while (atomc_blank(atomc_pending))
+        atomc_fill(line);
+    atomc_skip_space();
+    word = atomc_pending;
+    while (*atomc_pending && !isspace((unsigned char)*atomc_pending))
+        atomc_pending++;
+    if (*atomc_pending) {
+        *atomc_pending++ = '\0';
+        atomc_skip_space();
+    }
+    return word;
+}
+
+static void atomc_invalid(int line, const char *what, const char *word)
+{
+    char message[128];
+    snprintf(message, sizeof message, "%s '%.80s'", what, word);
+    atomc_error(line, message);
+}
+
+static void atomc_put_s(unsigned char *s) { fputs((const char *)s, stdout); }
+
+static void atomc_get_s(unsigned char *s, int line)
+{
+    char *end;
+    while (!*atomc_pending)
+        atomc_fill(line);
+    end = strchr(atomc_pending, '\n');
+    if (!end)
+        end = atomc_pending + strlen(atomc_pending);
+    memcpy(s, atomc_pending, (size_t)(end - atomc_pending));
+    s[end - atomc_pending] = '\0';
+    atomc_pending = *end ? end + 1 : end;
+}
+
+static void atomc_put_i(int i) { printf("%d", i); }
+
+static int atomc_get_i(int line)
+{
+    char *word = atomc_word(line), *end;
+    long value = strtol(word, &end, 10);
+    if (*end)
+        atomc_invalid(line, "get_i: invalid int", word);
+    return (int)value;
+}
+
+static void atomc_put_d(double d) { printf("%g", d); }
+
+static double atomc_get_d(int line)
+{
+    char *word = atomc_word(line), *end;
+    double value = strtod(word, &end);
+    if (*end)
+        atomc_invalid(line, "get_d: invalid double", word);
+    return value;
+}
+
+static void atomc_put_c(unsigned char c) { putchar(c); }
+
+static unsigned char atomc_get_c(int line)
+{
+    while (atomc_blank(atomc_pending))
+        atomc_fill(line);
+    atomc_skip_space();
+    return (unsigned char)*atomc_pending++;
+}
+
+static double atomc_seconds(void)
+{
+    struct timespec now;
+    timespec_get(&now, TIME_UTC);
+    return (double)now.tv_sec + now.tv_nsec / 1e9;
+}
+"""
+
+
+def pure(node):
+    """True when evaluating node has no side effect"""
+    return not any(isinstance(n, (Call, Assign)) for n in walk(node))
+
+
+def c_string(text):
+    """C literal of the bytes the VM stores for a string constant"""
+    parts = []
+    for code in (ord(c) & 0xFF for c in text):
+        if 32 <= code < 127 and chr(code) not in '"\\?':
+            parts.append(chr(code))
+        else:
+            parts.append(f"\\{code:03o}")
+    return '"' + "".join(parts) + '"'
+
+
+def c_double(value):
+    if math.isnan(value):
+        return "NAN"
+    if math.isinf(value):
+        return "HUGE_VAL" if value > 0 else "(-HUGE_VAL)"
+    return repr(value)
+
+
+def unaffected(node):
+    """True when no call can change the value of node: only constants, locals and operators"""
+    for n in walk(node):
+        if isinstance(n, Var):
+            if n.symbol.mem == MEM_GLOBAL and n.type.nElements < 0:  # The address of an array is fixed
+                return False
+        elif not isinstance(n, (Const, Binary, Unary, Cast)):
+            return False
+    return True
+
+
+def stable(node):
+    """True when no call can change which element or member node designates"""
+    while isinstance(node, (Index, Member)):
+        if isinstance(node, Index) and not unaffected(node.index):
+            return False
+        node = node.base
+    return isinstance(node, Var)
+
+
+def assigns(nodes):
+    return any(isinstance(n, Assign) for node in nodes for n in walk(node))
+
+
+def statement(text):
+    """text without the parentheses around the whole of it"""
+    if not (text.startswith("(") and text.endswith(")")):
+        return text
+    depth = 0
+    for index, c in enumerate(text):
+        depth += c == "("
+        depth -= c == ")"
+        if depth == 0 and index < len(text) - 1:
+            return text
+    return text[1:-1]
+
+
+def wrap(saves, text):
+    """text evaluated after the saves, in one expression"""
+    return f"({', '.join(saves)}, {text})" if saves else text
+
+
+class CGenerator:
+    def __init__(self, unit):
+        self.unit = unit
+        self.out = []
+        self.indent = 0
+        self.strings = {}  # Text of a string constant -> name of its static array
+        self.names = {}  # Symbol -> C name of an argument or local of the current function
+        self.temps = []  # (C type, name) of the temporaries of the current function
+        self.function = None
+
+    def emit(self, text):
+        self.out.append(INDENT * self.indent + text)
+
+    # ---------- Types ----------
+
+    def base_type(self, t):
+        return f"struct s_{t.structSymbol.name}" if t.typeBase == TB_STRUCT else C_TYPES[t.typeBase]
+
+    def declaration(self, t, name, param=False):
+        """C declaration of name with type t; array parameters are pointers"""
+        base = self.base_type(t)
+        if t.nElements < 0:
+            return f"{base} {name}"
+        if param:
+            return f"{base} *{name}"
+        return f"{base} {name}[{max(t.nElements, 1)}]"  # An unsized array still needs storage in C
+
+    def value_type(self, t):
+        """C type of a value of type t; an array value is a pointer to its first element"""
+        return self.base_type(t) + (" *" if t.nElements >= 0 else "")
+
+    def temp(self, c_type):
+        name = f"t{len(self.temps)}"
+        self.temps.append((c_type, name))
+        return name
+
+    # ---------- Declarations ----------
+
+    def compile(self):
+        body = []
+        self.out = body
+        for decl in self.unit.decls:
+            if isinstance(decl, StructDecl):
+                self.struct_decl(decl.symbol)
+            elif isinstance(decl, VarDecl):
+                self.emit(f"static {self.declaration(decl.symbol.type, f'g_{decl.symbol.name}')};")
+        functions = [decl for decl in self.unit.decls if isinstance(decl, FuncDecl)]
+        if functions:
+            self.emit("")
+        for decl in functions:
+            self.emit(f"static {self.signature(decl.symbol)};")
+        for decl in functions:
+            self.function_decl(decl)
+
+        self.emit("")
+        self.emit("int main(void)")
+        self.emit("{")
+        if any(decl.symbol.name == "main" for decl in functions):
+            self.emit(f"{INDENT}f_main();")
+        else:
+            self.emit(f'{INDENT}atomc_error(0, "no main function");')
+        self.emit(f"{INDENT}return 0;")
+        self.emit("}")
+
+        strings = [f"static unsigned char {name}[] = {c_string(text)};" for text, name in self.strings.items()]
+        return RUNTIME + "\n" + "".join(line + "\n" for line in strings + ([""] if strings else []) + body)
+
+    def struct_decl(self, sym):
+        self.emit(f"struct s_{sym.name} {{")
+        for member in sym.members:
+            self.emit(f"{INDENT}{self.declaration(member.type, f'm_{member.name}')};")
+        if not len(sym.members):
+            self.emit(f"{INDENT}char unused;")  # C structs need a member
+        self.emit("};")
+
+    def signature(self, sym):
+        args = ", ".join(self.declaration(arg.type, self.names.get(arg, f"v_{arg.name}"), param=True)
+                         for arg in sym.args)
+        return f"{self.base_type(sym.type)} f_{sym.name}({args or 'void'})"
+
+    def function_decl(self, decl):
+        self.function = decl
+        self.names = {}
+        self.temps = []
+        taken = set()
+        for sym in list(decl.symbol.args) + list(decl.locals):
+            name = f"v_{sym.name}"
+            while name in taken:  # A local of an inner block with the name of an outer one
+                name += "_"
+            taken.add(name)
+            self.names[sym] = name
+
+        outer = self.out
+        self.out = []
+        self.indent = 1
+        for item in decl.body.items:
+            if not isinstance(item, VarDecl):
+                self.stm(item)
+        if decl.symbol.type.typeBase != TB_VOID:
+            self.emit(f"return {self.zero_value()};")
+        body = self.out
+        self.out = outer
+
+        self.indent = 0
+        self.emit("")
+        self.emit(f"static {self.signature(decl.symbol)}")
+        self.emit("{")
+        for sym in decl.locals:
+            zero = "{0}" if is_aggregate(sym.type) else "0"
+            self.emit(f"{INDENT}{self.declaration(sym.type, self.names[sym])} = {zero};")
+        for c_type, name in self.temps:
+            self.emit(f"{INDENT}{c_type}{'' if c_type.endswith('*') else ' '}{name};")
+        self.out.extend(body)
+        self.emit("}")
+
+    def zero_value(self):
+        """What a non-void function returns when it falls off its end or runs return;"""
+        return "0" if self.function.symbol.type.typeBase != TB_STRUCT else self.zero_struct()
+
+    def zero_struct(self):
+        """Falling off the end of a struct function returns a zeroed struct"""
+        name = self.temp(self.base_type(self.function.symbol.type))
+        return f"(memset(&{name}, 0, sizeof {name}), {name})"
+
+    # ---------- Statements ----------
+
+    def stm(self, node):
+        if isinstance(node, Block):
+            self.emit("{")
+            self.indent += 1
+            for item in node.items:
+                if not isinstance(item, VarDecl):
+                    self.stm(item)
+            self.indent -= 1
+            self.emit("}")
+        elif isinstance(node, ExprStm):
+            self.emit(f"{statement(self.expr(node.expr))};")
+        elif isinstance(node, If):
+            self.emit(f"if ({statement(self.expr(node.cond))})")
+            self.nested(node.then)
+            if node.orelse is not None:
+                self.emit("else")
+                self.nested(node.orelse)
+        elif isinstance(node, While):
+            self.emit(f"while ({statement(self.expr(node.cond))})")
+            self.nested(node.body)
+        elif isinstance(node, For):
+            parts = [statement(self.expr(part)) if part is not None else "" for part in (node.init, node.cond, node.step)]
+            self.emit(f"for ({parts[0]}; {parts[1]}; {parts[2]})")
+            self.nested(node.body)
+        elif isinstance(node, Break):
+            self.emit("break;")
+        elif isinstance(node, Return):
+            if node.value is None:
+                void = self.function.symbol.type.typeBase == TB_VOID
+                self.emit("return;" if void else f"return {self.zero_value()};")
+            else:
+                self.emit(f"return {self.converted(node.value, self.function.symbol.type)};")
+
+    def nested(self, node):
+        """Body of an if or loop: blocks stay at the statement's indentation"""
+        if isinstance(node, Block):
+            self.stm(node)
+        else:
+            self.indent += 1
+            self.stm(node)
+            self.indent -= 1
+
+    # ---------- Expressions ----------
+
+    def variable(self, sym):
+        return f"g_{sym.name}" if sym.mem == MEM_GLOBAL else self.names[sym]
+
+    def expr(self, node):
+        """C expression with the value of node"""
+        if isinstance(node, Const):
+            if isinstance(node.value, str):
+                if node.value not in self.strings:
+                    self.strings[node.value] = f"str{len(self.strings)}"
+                return self.strings[node.value]
+            if isinstance(node.value, float):
+                return c_double(node.value)
+            return str(node.value)
+        if isinstance(node, Var):
+            return self.variable(node.symbol)
+        if isinstance(node, Binary):
+            if node.op in ("&&", "||"):
+                return f"({self.expr(node.left)} {node.op} {self.expr(node.right)})"
+            saves, (left, right) = self.operands([node.left, node.right])
+            if node.op == "/":
+                divide = "atomc_fdiv" if node.type.typeBase == TB_DOUBLE else "atomc_div"
+                return wrap(saves, f"{divide}({left}, {right}, {node.line})")
+            return wrap(saves, f"({left} {node.op} {right})")
+        if isinstance(node, Unary):
+            return f"({node.op}{self.expr(node.operand)})"
+        if isinstance(node, Cast):
+            return self.converted(node.operand, node.type)
+        if isinstance(node, (Index, Member)):
+            return wrap(*self.place(node))
+        if isinstance(node, Call):
+            return self.call(node)
+        if isinstance(node, Assign):
+            return self.assign(node)
+        raise SyntaxError(f"Line {node.line}: cannot generate code for {type(node).__name__}")
+
+    def converted(self, node, t):
+        """C expression with the value of node converted to type t, as the VM converts it"""
+        src = node.type
+        value = self.expr(node)
+        if is_aggregate(t) or t.typeBase == TB_VOID or t.typeBase == src.typeBase and not char_arithmetic(node):
+            return value
+        if t.typeBase == TB_DOUBLE:
+            return f"((double){value})"
+        if src.typeBase == TB_DOUBLE:
+            value = f"atomc_toint({value}, {node.line})"
+        if t.typeBase == TB_CHAR:
+            return f"((unsigned char){value})"
+        return value  # char -> int needs no conversion
+
+    def operands(self, nodes, types=None):
+        """
+        (saves, C expressions) of nodes evaluated left to right: an operand before the last one
+        with side effects is saved in a temporary by the saves, unless that cannot change it
+        """
+        last = max((index for index, node in enumerate(nodes) if not pure(node)), default=-1)
+        later_assigns = assigns(nodes[1:last + 1])
+        saves = []
+        texts = []
+        for index, node in enumerate(nodes):
+            t = types[index] if types else node.type
+            text = self.converted(node, t) if types else self.expr(node)
+            if index < last and not (unaffected(node) and not later_assigns):
+                name = self.temp(self.value_type(t))
+                saves.append(f"{name} = {text}")
+                text = name
+            texts.append(text)
+        return saves, texts
+
+    def place(self, node):
+        """(saves, C lvalue) of a variable, element or member"""
+        if isinstance(node, Member):
+            saves, base = self.place(node.base)
+            return saves, f"{base}.m_{node.field.name}"
+        if isinstance(node, Index):
+            saves, base = self.place(node.base)
+            index = self.expr(node.index)
+            if not (pure(node.base) and pure(node.index)) and not (stable(node.base) and not assigns([node.index])):
+                name = self.temp(self.value_type(node.base.type))  # The array is found before the index
+                saves = saves + [f"{name} = {base}"]
+                base = name
+            return saves, f"{base}[{index}]"
+        return [], self.expr(node)
+
+    def call(self, node):
+        saves, args = self.operands(node.args, [param.type for param in node.symbol.args])
+        name = node.symbol.name
+        if node.symbol.cls == CLS_EXTFUNC:
+            if name in LINE_ARGUMENT:
+                args.append(str(node.line))
+            return wrap(saves, f"atomc_{name}({', '.join(args)})")
+        return wrap(saves, f"f_{name}({', '.join(args)})")
+
+    def assign(self, node):
+        target = node.target
+        if isinstance(target, Var):
+            return f"({self.variable(target.symbol)} = {self.converted(node.value, target.type)})"
+        saves, lvalue = self.place(target)
+        if not pure(node.value) and not (stable(target) and not assigns([node.value])):
+            name = self.temp(self.base_type(target.type) + " *")  # The VM finds the target before the value
+            saves = saves + [f"{name} = &{lvalue}"]
+            lvalue = f"(*{name})"
+        return wrap(saves, f"({lvalue} = {self.converted(node.value, target.type)})")
+
+
+def emit_c(unit):
+    """C source of a program for a Unit AST"""
+    return CGenerator(unit).compile()
+
+
+def build(source, executable, cc=DEFAULT_CC, flags=DEFAULT_CFLAGS):
+    """Compiles C source to an executable; raises subprocess.CalledProcessError with the compiler output"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.c")
+        with open(path, "w") as file:
+            file.write(source)
+        subprocess.run([cc, *flags, "-o", executable, path, "-lm"], check=True, capture_output=True, text=True)
+
+
+def compile_source(code):
+    """Lexes, parses and translates AtomC source to C source"""
+    parser = Parser(tokenize(code), build_ast=True)
+    parser.parse_unit()
+    return emit_c(parser.unit)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Translate an AtomC program to C, optionally build and run it")
+    arg_parser.add_argument("path", help="AtomC source file")
+    arg_parser.add_argument("-o", "--output", default=None, help="C file to write (default: stdout, unless building)")
+    arg_parser.add_argument("--build", default=None, metavar="EXE", help="build an executable with the C compiler")
+    arg_parser.add_argument("--run", action="store_true", help="build and run the program")
+    arg_parser.add_argument("--cc", default=DEFAULT_CC, help=f"C compiler (default: {DEFAULT_CC})")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.path, 'r') as file:
+        code = file.read()
+    try:
+        source = compile_source(code)
+    except SyntaxError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(source)
+    elif not (args.build or args.run):
+        print(source, end="")
+    if not (args.build or args.run):
+        return 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        executable = args.build or os.path.join(directory, "program")
+        try:
+            build(source, executable, args.cc)
+        except subprocess.CalledProcessError as e:
+            print(e.stderr, file=sys.stderr, end="")
+            return 1
+        if not args.run:
+            return 0
+        sys.stdout.flush()
+        return subprocess.run([os.path.abspath(executable)]).returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
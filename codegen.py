@@ -0,0 +1,629 @@
+"""
+Lowers a checked AtomC unit (the AST built by Parser(tokens, build_ast=True)) to the bytecode
+executed by vm.VM.
+
+Instructions are fixed (op, a, b, c) tuples over the registers of the current frame:
+arguments first, then locals, then temporaries. Scalar globals live in a separate list and
+are reached through GETG/SETG. Arrays and structs live in a flat byte memory with the
+layout computed by layout.py: global ones and the string constants in the static data of
+the Program, local ones in the frame of their call on the memory stack. Registers hold
+their addresses, so v[i] and s.x are typed loads and stores at an address plus an index or
+a constant offset, and nested members and constant indexes fold into one offset. Struct
+values are copied on assignment, argument passing (by the callee) and return (by the
+caller, right after the call), like in C.
+"""
+from ast_nodes import Assign, Binary, Block, Break, Call, Cast, Const, ExprStm, For, FuncDecl, If, Index, Member, \
+    Return, Unary, Var, VarDecl, While
+from layout import MAX_ALIGN, align_up, layout_unit
+from syntactic_analyzer import CLS_EXTFUNC, MEM_GLOBAL, TB_CHAR, TB_DOUBLE, TB_INT, TB_STRUCT, TB_VOID
+
+# ---------- Opcodes ----------
+# Operands are register numbers unless noted; K variants take a constant as last operand.
+# ADD..NEG are int arithmetic and wrap to 32 bits like C ints; the F forms are for doubles.
+# Memory loads are (dst, address, index) for the indexed LD* and (dst, address, offset) for
+# the LDF* forms; stores are (address, index or offset, src). The I/D/C suffix is the element
+# type: int (4 bytes), double (8 bytes) or char (1 byte).
+
+(MOV, CONST, GETG, SETG,
+ ADD, SUB, MUL, DIVI, DIVF, ADDK, SUBK, MULK, NEG, NOT, ADDF, SUBF, MULF, NEGF,
+ LT, LE, GT, GE, EQ, NE,
+ JMP, JZ, JNZ, JLT, JLE, JGT, JGE, JEQ, JNE, JLTK, JLEK, JGTK, JGEK, JEQK, JNEK,
+ LDI, LDD, LDC, STI, STD, STC, LDFI, LDFD, LDFC, STFI, STFD, STFC, MEMCPY, FRAME,
+ TOINT, TOCHAR, TODOUBLE,
+ CALL, EXT, RET, RETV,
+ INCJLT, INCJLTK) = range(62)
+
+OPCODE_NAMES = ["MOV", "CONST", "GETG", "SETG",
+                "ADD", "SUB", "MUL", "DIVI", "DIVF", "ADDK", "SUBK", "MULK", "NEG", "NOT",
+                "ADDF", "SUBF", "MULF", "NEGF",
+                "LT", "LE", "GT", "GE", "EQ", "NE",
+                "JMP", "JZ", "JNZ", "JLT", "JLE", "JGT", "JGE", "JEQ", "JNE",
+                "JLTK", "JLEK", "JGTK", "JGEK", "JEQK", "JNEK",
+                "LDI", "LDD", "LDC", "STI", "STD", "STC", "LDFI", "LDFD", "LDFC", "STFI", "STFD", "STFC",
+                "MEMCPY", "FRAME",
+                "TOINT", "TOCHAR", "TODOUBLE",
+                "CALL", "EXT", "RET", "RETV",
+                "INCJLT", "INCJLTK"]
+
+# Position of the jump target operand of each jump opcode
+JUMP_TARGET = {JMP: 1, JZ: 2, JNZ: 2}
+for _op in (JLT, JLE, JGT, JGE, JEQ, JNE, JLTK, JLEK, JGTK, JGEK, JEQK, JNEK, INCJLT, INCJLTK):
+    JUMP_TARGET[_op] = 3
+
+ARITH_OPS = {"+": ADD, "-": SUB, "*": MUL}
+ARITH_CONST_OPS = {ADD: ADDK, SUB: SUBK, MUL: MULK}
+DOUBLE_ARITH_OPS = {"+": ADDF, "-": SUBF, "*": MULF, "/": DIVF}
+REL_OPS = {"<": LT, "<=": LE, ">": GT, ">=": GE, "==": EQ, "!=": NE}
+JUMP_OPS = {"<": JLT, "<=": JLE, ">": JGT, ">=": JGE, "==": JEQ, "!=": JNE}
+JUMP_CONST_OPS = {JLT: JLTK, JLE: JLEK, JGT: JGTK, JGE: JGEK, JEQ: JEQK, JNE: JNEK}
+NEGATED = {"<": ">=", "<=": ">", ">": "<=", ">=": "<", "==": "!=", "!=": "=="}
+LOAD_OPS = {TB_INT: LDI, TB_DOUBLE: LDD, TB_CHAR: LDC}
+STORE_OPS = {TB_INT: STI, TB_DOUBLE: STD, TB_CHAR: STC}
+LOAD_FIELD_OPS = {TB_INT: LDFI, TB_DOUBLE: LDFD, TB_CHAR: LDFC}
+STORE_FIELD_OPS = {TB_INT: STFI, TB_DOUBLE: STFD, TB_CHAR: STFC}
+
+
+class Function:
+    def __init__(self, name, nargs):
+        self.name = name
+        self.nargs = nargs
+        self.entry = 0  # Index of the first instruction in Program.code
+        self.end = 0  # Index after the last instruction
+        self.frame = []  # Initial register values: zero of each arg/local type, then temporaries
+        self.frame_size = 0  # Bytes of stack memory of a call: local arrays and structs, struct copies
+        self.frame_zero = b""  # frame_size zero bytes, copied over the frame of every call
+
+
+class Program:
+    def __init__(self):
+        self.code = []  # (op, a, b, c) tuples of all functions
+        self.lines = []  # Source line of each instruction
+        self.functions = {}  # Name -> Function
+        self.globals = []  # Initial value of each global; the static address of global arrays and structs
+        self.global_names = []
+        self.data = bytearray()  # Static memory: global arrays and structs, then string constants
+        self.layouts = None  # layout.Layouts of the unit's structs
+
+
+def zero_value(t):
+    """Initial value of a scalar of type t"""
+    return 0.0 if t.typeBase == TB_DOUBLE else 0
+
+
+def is_aggregate(t):
+    return t.nElements >= 0 or t.typeBase == TB_STRUCT
+
+
+def is_struct_value(t):
+    return t.typeBase == TB_STRUCT and t.nElements < 0
+
+
+def char_arithmetic(node):
+    """
+    True for arithmetic on chars, folded or not: like in C it is done on ints, so its value is
+    only masked to a char when converted to one
+    """
+    if node.type.typeBase != TB_CHAR or node.type.nElements >= 0:
+        return False
+    if isinstance(node, Const):
+        return isinstance(node.value, int) and not 0 <= node.value <= 0xFF
+    return isinstance(node, (Binary, Unary)) and node.op in ("+", "-", "*", "/")
+
+
+class Label:
+    __slots__ = ("position",)
+
+    def __init__(self):
+        self.position = None
+
+
+class CodeGenerator:
+    def __init__(self, unit):
+        self.unit = unit
+        self.program = Program()
+        self.layouts = self.program.layouts = layout_unit(unit)
+        self.strings = {}  # Text of a string constant -> its address in the static data
+        self.global_slots = {}  # Symbol -> index in Program.globals
+        self.slots = {}  # Symbol -> register of the current function
+        self.temp_base = 0  # First temporary register of the current function
+        self.temp_top = 0  # Next free temporary register
+        self.temp_max = 0
+        self.break_labels = []
+        self.line = 0  # Line of the node being compiled, recorded for each instruction
+        self.function = None
+        self.frame_size = 0  # Stack memory used so far by the current function
+
+    # ---------- Emission helpers ----------
+
+    def emit(self, op, a=0, b=0, c=0):
+        self.program.code.append([op, a, b, c])
+        self.program.lines.append(self.line)
+
+    def place(self, label):
+        label.position = len(self.program.code)
+
+    def temp(self):
+        register = self.temp_top
+        self.temp_top += 1
+        self.temp_max = max(self.temp_max, self.temp_top)
+        return register
+
+    # ---------- Memory ----------
+
+    def static(self, t):
+        """Address of fresh zeroed static storage for a variable of type t"""
+        data = self.program.data
+        address = align_up(len(data), self.layouts.alignof(t))
+        data.extend(bytes(address + self.layouts.sizeof(t) - len(data)))
+        return address
+
+    def string(self, text):
+        """Address of the zero terminated static copy of a string constant"""
+        address = self.strings.get(text)
+        if address is None:
+            address = self.strings[text] = len(self.program.data)
+            self.program.data.extend(bytes(ord(c) & 0xFF for c in text) + b"\0")
+        return address
+
+    def stack_slot(self, t):
+        """Frame offset of fresh storage for a value of type t in the current function"""
+        offset = align_up(self.frame_size, self.layouts.alignof(t))
+        self.frame_size = offset + self.layouts.sizeof(t)
+        return offset
+
+    # ---------- Declarations ----------
+
+    def compile(self):
+        for decl in self.unit.decls:
+            if isinstance(decl, VarDecl):
+                t = decl.symbol.type
+                self.global_slots[decl.symbol] = len(self.program.globals)
+                self.program.globals.append(self.static(t) if is_aggregate(t) else zero_value(t))
+                self.program.global_names.append(decl.symbol.name)
+        for decl in self.unit.decls:
+            if isinstance(decl, FuncDecl):
+                self.program.functions[decl.symbol.name] = Function(decl.symbol.name, len(decl.symbol.args))
+        for decl in self.unit.decls:
+            if isinstance(decl, FuncDecl):
+                self.function_decl(decl)
+
+        data = self.program.data
+        data.extend(bytes(align_up(len(data), MAX_ALIGN) - len(data)))
+
+        # Resolve labels and freeze instructions
+        code = self.program.code
+        for index, instruction in enumerate(code):
+            target = JUMP_TARGET.get(instruction[0])
+            if target is not None:
+                instruction[target] = instruction[target].position
+            code[index] = tuple(instruction)
+        return self.program
+
+    def function_decl(self, decl):
+        function = self.program.functions[decl.symbol.name]
+        self.function = decl
+        self.line = decl.line
+        self.slots = {}
+        variables = list(decl.symbol.args) + list(decl.locals)
+        for register, sym in enumerate(variables):
+            self.slots[sym] = register
+        self.temp_base = self.temp_top = self.temp_max = len(variables)
+        self.frame_size = 0
+
+        function.entry = len(self.program.code)
+        # Struct arguments arrive as the address of the caller's value and are copied into the
+        # frame; array arguments stay references. Local arrays and structs get frame storage.
+        for sym in decl.symbol.args:
+            if is_struct_value(sym.type):
+                copy = self.temp()
+                self.emit(FRAME, copy, self.stack_slot(sym.type))
+                self.emit(MEMCPY, copy, self.slots[sym], self.layouts.sizeof(sym.type))
+                self.emit(MOV, self.slots[sym], copy)
+                self.temp_top -= 1
+        for sym in decl.locals:
+            if is_aggregate(sym.type):
+                self.emit(FRAME, self.slots[sym], self.stack_slot(sym.type))
+        self.stm(decl.body)
+        self.line = decl.line
+        if decl.symbol.type.typeBase == TB_VOID:
+            self.emit(RETV)
+        else:
+            self.emit(CONST, self.temp(), zero_value(decl.symbol.type))  # Falling off the end returns 0
+            self.emit(RET, self.temp_top - 1)
+        function.end = len(self.program.code)
+        function.frame_size = align_up(self.frame_size, MAX_ALIGN)
+        function.frame_zero = bytes(function.frame_size)
+
+        frame = [zero_value(sym.type) if not is_aggregate(sym.type) else None for sym in variables]
+        function.frame = frame + [0] * (self.temp_max - len(variables))
+
+    # ---------- Statements ----------
+
+    def stm(self, node):
+        self.line = node.line
+        mark = self.temp_top
+        if isinstance(node, Block):
+            for item in node.items:
+                if not isinstance(item, VarDecl):
+                    self.stm(item)
+        elif isinstance(node, ExprStm):
+            self.expr(node.expr)
+        elif isinstance(node, If) and isinstance(node.cond, Const) and not isinstance(node.cond.value, str):
+            branch = node.then if node.cond.value else node.orelse  # Folded condition: only one branch is live
+            if branch is not None:
+                self.stm(branch)
+        elif isinstance(node, If):
+            orelse = Label()
+            self.jump_if(node.cond, orelse, False)
+            self.stm(node.then)
+            if node.orelse is not None:
+                end = Label()
+                self.emit(JMP, end)
+                self.place(orelse)
+                self.stm(node.orelse)
+                self.place(end)
+            else:
+                self.place(orelse)
+        elif isinstance(node, While):
+            self.loop(None, node.cond, None, node.body)
+        elif isinstance(node, For):
+            self.loop(node.init, node.cond, node.step, node.body)
+        elif isinstance(node, Break):
+            self.emit(JMP, self.break_labels[-1])
+        elif isinstance(node, Return):
+            t = self.function.symbol.type
+            if node.value is None and t.typeBase != TB_VOID:
+                self.emit(CONST, self.temp(), zero_value(t))  # Like falling off the end
+                self.emit(RET, self.temp_top - 1)
+            elif node.value is None:
+                self.emit(RETV)
+            else:
+                self.emit(RET, self.converted(node.value, self.function.symbol.type))
+        self.temp_top = mark
+
+    def counter(self, cond, step):
+        """
+        Register of i and the limit of a `i < limit` condition with an `i = i + 1` step on the
+        same local int, or None. Such loops close with a single increment-and-branch instruction.
+        """
+        if not (isinstance(cond, Binary) and cond.op == "<" and isinstance(cond.left, Var)
+                and isinstance(step, Assign) and isinstance(step.target, Var)
+                and isinstance(step.value, Binary) and step.value.op == "+" and isinstance(step.value.left, Var)
+                and isinstance(step.value.right, Const) and step.value.right.value == 1):
+            return None
+        i = cond.left.symbol
+        if (i.mem == MEM_GLOBAL or i.type.typeBase != TB_INT or i.type.nElements >= 0
+                or step.target.symbol is not i or step.value.left.symbol is not i):
+            return None
+        limit = cond.right
+        if isinstance(limit, Const) and isinstance(limit.value, int):
+            return self.slots[i], INCJLTK, limit.value
+        if isinstance(limit, Var) and limit.symbol.mem != MEM_GLOBAL and limit.symbol is not i \
+                and limit.type.typeBase == TB_INT and limit.type.nElements < 0:
+            return self.slots[i], INCJLT, self.slots[limit.symbol]
+        return None
+
+    def loop(self, init, cond, step, body):
+        """Loops are rotated: the condition is tested at the bottom, jumping back to the body"""
+        if init is not None:
+            self.expr(init)
+        start, test, end = Label(), Label(), Label()
+        forever = cond is None or isinstance(cond, Const) and not isinstance(cond.value, str) and bool(cond.value)
+        fused = self.counter(cond, step)
+        if fused is not None:
+            register, op, limit = fused
+            self.jump_if(cond, end, False)
+            self.place(start)
+            self.break_labels.append(end)
+            self.stm(body)
+            self.break_labels.pop()
+            self.line = step.line
+            self.emit(op, register, limit, start)
+            self.place(end)
+            return
+        if not forever:
+            self.emit(JMP, test)
+        self.place(start)
+        self.break_labels.append(end)
+        self.stm(body)
+        self.break_labels.pop()
+        if step is not None:
+            self.line = step.line
+            mark = self.temp_top
+            self.expr(step)
+            self.temp_top = mark
+        self.place(test)
+        if not forever:
+            self.line = cond.line
+            mark = self.temp_top
+            self.jump_if(cond, start, True)
+            self.temp_top = mark
+        else:
+            self.emit(JMP, start)
+        self.place(end)
+
+    def jump_if(self, node, label, sense):
+        """Jumps to label when the truth value of node equals sense, otherwise falls through"""
+        if isinstance(node, Const) and not isinstance(node.value, str):
+            if bool(node.value) == sense:  # Folded condition: unconditional jump or nothing
+                self.emit(JMP, label)
+            return
+        if isinstance(node, Binary) and node.op in JUMP_OPS and not is_aggregate(node.left.type):
+            op = node.op if sense else NEGATED[node.op]
+            left = self.expr(node.left)
+            if isinstance(node.right, Const) and not isinstance(node.right.value, str):
+                self.emit(JUMP_CONST_OPS[JUMP_OPS[op]], left, node.right.value, label)
+            else:
+                self.emit(JUMP_OPS[op], left, self.expr(node.right), label)
+        elif isinstance(node, Binary) and node.op in ("&&", "||"):
+            if (node.op == "&&") != sense:
+                # Either operand alone decides: false && / true ||
+                self.jump_if(node.left, label, sense)
+                self.jump_if(node.right, label, sense)
+            else:
+                skip = Label()
+                self.jump_if(node.left, skip, not sense)
+                self.jump_if(node.right, label, sense)
+                self.place(skip)
+        elif isinstance(node, Unary) and node.op == "!":
+            self.jump_if(node.operand, label, not sense)
+        else:
+            self.emit(JNZ if sense else JZ, self.expr(node), label)
+
+    # ---------- Expressions ----------
+
+    def target(self, dst):
+        return dst if dst is not None else self.temp()
+
+    def expr(self, node, dst=None):
+        """Compiles node and returns the register holding its value (dst when given)"""
+        self.line = node.line
+        if isinstance(node, Const):
+            dst = self.target(dst)
+            self.emit(CONST, dst, self.string(node.value) if isinstance(node.value, str) else node.value)
+            return dst
+
+        if isinstance(node, Var):
+            sym = node.symbol
+            if sym.mem == MEM_GLOBAL:
+                dst = self.target(dst)
+                slot = self.global_slot(node)
+                if is_aggregate(sym.type):
+                    self.emit(CONST, dst, self.program.globals[slot])  # Static address
+                else:
+                    self.emit(GETG, dst, slot)
+                return dst
+            register = self.slots[sym]
+            if dst is not None and dst != register:
+                self.emit(MOV, dst, register)
+                return dst
+            return register
+
+        if isinstance(node, Binary):
+            if node.op in ("&&", "||"):
+                mark = self.temp_top
+                result = self.temp()  # Not dst: an operand may read the variable assigned
+                end = Label()
+                self.emit(CONST, result, 0)
+                self.jump_if(node, end, False)
+                self.emit(CONST, result, 1)
+                self.place(end)
+                if dst is None:
+                    return result
+                self.temp_top = mark
+                self.emit(MOV, dst, result)
+                return dst
+            mark = self.temp_top
+            left = self.expr(node.left)
+            if node.op in REL_OPS:
+                right = self.expr(node.right)
+                self.temp_top = mark
+                dst = self.target(dst)
+                self.emit(REL_OPS[node.op], dst, left, right)
+                return dst
+            if node.type.typeBase == TB_DOUBLE:
+                op = DOUBLE_ARITH_OPS[node.op]
+            else:
+                op = DIVI if node.op == "/" else ARITH_OPS[node.op]
+            if op in ARITH_CONST_OPS and isinstance(node.right, Const):
+                self.temp_top = mark
+                dst = self.target(dst)
+                self.emit(ARITH_CONST_OPS[op], dst, left, node.right.value)
+                return dst
+            right = self.expr(node.right)
+            self.temp_top = mark
+            dst = self.target(dst)
+            self.emit(op, dst, left, right)
+            return dst
+
+        if isinstance(node, Unary):
+            mark = self.temp_top
+            operand = self.expr(node.operand)
+            self.temp_top = mark
+            dst = self.target(dst)
+            if node.op == "!":
+                self.emit(NOT, dst, operand)
+            else:
+                self.emit(NEGF if node.type.typeBase == TB_DOUBLE else NEG, dst, operand)
+            return dst
+
+        if isinstance(node, Cast):
+            return self.converted(node.operand, node.type, dst)
+
+        if isinstance(node, Index) and not is_aggregate(node.type) and not isinstance(node.index, Const):
+            mark = self.temp_top
+            base = self.base_address(node.base)
+            index = self.expr(node.index)
+            self.temp_top = mark
+            dst = self.target(dst)
+            self.emit(LOAD_OPS[node.type.typeBase], dst, base, index)
+            return dst
+
+        if isinstance(node, (Index, Member)):
+            mark = self.temp_top
+            base, offset = self.address(node)
+            self.temp_top = mark
+            if not is_aggregate(node.type):
+                dst = self.target(dst)
+                self.emit(LOAD_FIELD_OPS[node.type.typeBase], dst, base, offset)
+            elif offset:
+                dst = self.target(dst)
+                self.emit(ADDK, dst, base, offset)
+            elif dst is None:
+                return base
+            elif dst != base:
+                self.emit(MOV, dst, base)
+            return dst
+
+        if isinstance(node, Call):
+            return self.call(node, dst)
+
+        if isinstance(node, Assign):
+            return self.assign(node, dst)
+
+        raise SyntaxError(f"Line {node.line}: cannot generate code for {type(node).__name__}")
+
+    def global_slot(self, node):
+        """Index in Program.globals of the global read or written by a Var node"""
+        slot = self.global_slots.get(node.symbol)
+        if slot is None:
+            raise SyntaxError(f"Line {node.line}: {node.symbol.name} is imported, not defined in this unit")
+        return slot
+
+    def address(self, node):
+        """
+        (register, offset) such that node, an array or struct or an element or member of one,
+        is stored at the address in register plus the constant offset
+        """
+        if isinstance(node, Member):
+            base, offset = self.address(node.base)
+            return base, offset + self.layouts.offset(node)
+        if isinstance(node, Index):
+            base, offset = self.address(node.base)
+            size = self.layouts.element_size(node.type)
+            if isinstance(node.index, Const):
+                return base, offset + node.index.value * size
+            element = self.temp()
+            if size == 1:
+                self.emit(ADD, element, base, self.expr(node.index))
+            else:
+                self.emit(MULK, element, self.expr(node.index), size)
+                self.emit(ADD, element, base, element)
+            return element, offset
+        return self.expr(node), 0
+
+    def base_address(self, node):
+        """Register holding the address of an array or struct"""
+        base, offset = self.address(node)
+        if not offset:
+            return base
+        register = self.temp()
+        self.emit(ADDK, register, base, offset)
+        return register
+
+    def converted(self, node, t, dst=None):
+        """Compiles node and converts its value to type t"""
+        src = node.type
+        if is_aggregate(t) or t.typeBase == TB_VOID or t.typeBase == src.typeBase and not char_arithmetic(node):
+            return self.expr(node, dst)
+        mark = self.temp_top
+        value = self.expr(node)
+        self.temp_top = mark
+        dst = self.target(dst)
+        if t.typeBase == TB_DOUBLE:
+            self.emit(TODOUBLE, dst, value)
+        elif t.typeBase == TB_CHAR:
+            self.emit(TOCHAR, dst, value)
+        elif src.typeBase == TB_DOUBLE:
+            self.emit(TOINT, dst, value)
+        elif dst != value:
+            self.emit(MOV, dst, value)  # char -> int needs no conversion
+        return dst
+
+    def call(self, node, dst, copy=True):
+        """
+        A returned struct is the address of a value in the frame the callee released, which
+        the next call overwrites: unless copy is False it is copied to this frame at once
+        """
+        mark = self.temp_top
+        base = self.temp_top
+        registers = [self.temp() for _ in node.args]
+        for register, arg, param in zip(registers, node.args, node.symbol.args):
+            value = self.converted(arg, param.type, register)  # Struct arguments are copied by the callee
+            if value != register:
+                self.emit(MOV, register, value)
+        self.line = node.line
+        self.temp_top = mark
+        dst = self.target(dst)
+        copied = copy and is_struct_value(node.type)
+        result = self.temp() if copied else dst
+        if node.symbol.cls == CLS_EXTFUNC:
+            self.emit(EXT, result, (node.symbol.name, len(node.args)), base)
+        else:
+            function = self.program.functions.get(node.symbol.name)
+            if function is None:
+                raise SyntaxError(f"Line {node.line}: {node.symbol.name} is imported, not defined in this unit")
+            self.emit(CALL, result, function, base)
+        if copied:
+            self.emit(FRAME, dst, self.stack_slot(node.type))
+            self.emit(MEMCPY, dst, result, self.layouts.sizeof(node.type))
+        return dst
+
+    def assign(self, node, dst):
+        target = node.target
+        t = target.type
+
+        if is_struct_value(t):
+            address = self.base_address(target)
+            if isinstance(node.value, Call):
+                value = self.call(node.value, None, copy=False)  # Nothing runs before the copy below
+            else:
+                value = self.expr(node.value)
+            self.line = node.line
+            self.emit(MEMCPY, address, value, self.layouts.sizeof(t))
+            if dst is not None and dst != address:
+                self.emit(MOV, dst, address)
+                return dst
+            return address
+
+        if isinstance(target, Var) and target.symbol.mem != MEM_GLOBAL:
+            register = self.slots[target.symbol]
+            self.converted(node.value, t, register)
+            if dst is not None and dst != register:
+                self.emit(MOV, dst, register)
+                return dst
+            return register
+
+        if isinstance(target, Var):
+            value = self.converted(node.value, t, dst)
+            self.emit(SETG, self.global_slot(target), value)
+            return value
+
+        if isinstance(target, Index) and not isinstance(target.index, Const):
+            base = self.base_address(target.base)
+            key = self.expr(target.index)
+            store = STORE_OPS[t.typeBase]
+        else:
+            base, key = self.address(target)
+            store = STORE_FIELD_OPS[t.typeBase]
+        value = self.converted(node.value, t, dst)
+        self.line = node.line
+        self.emit(store, base, key, value)
+        return value
+
+
+def compile_unit(unit):
+    """Returns the Program for a Unit AST"""
+    return CodeGenerator(unit).compile()
+
+
+def disassemble(program):
+    lines = [f"; {len(program.data)} bytes of static data"]
+    starts = {function.entry: name for name, function in program.functions.items()}
+    for index, (op, a, b, c) in enumerate(program.code):
+        if index in starts:
+            lines.append(f"{starts[index]}:")
+        if op == CALL:
+            b = b.name
+        lines.append(f"  {index:5} {OPCODE_NAMES[op]:8} {a!r:>6} {b!r:>6} {c!r:>6}    ; line {program.lines[index]}")
+    return "\n".join(lines)
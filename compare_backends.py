@@ -0,0 +1,130 @@
+"""
+Runs AtomC programs on the VM and on the other backends and checks that they print the same
+output and fail with the same runtime errors.
+
+Usage: python compare_backends.py [--backends opt,jit,c] [--input FILE] [--cc CC] [--timeout SECONDS] [FILE ...]
+
+Without files, every program of the tests/ directory is compared. Each program reads the
+same standard input (DEFAULT_INPUT unless --input is given). Programs the compiler rejects
+are skipped. The VM and the JIT run in this process, and the C backend builds and runs an
+executable, which fails the comparison when it runs longer than --timeout (the C compiler
+may turn a recursion that overflows the VM's stack into a loop). The opt backend is the VM running the code of the optimizing pipeline
+(optimize.py).
+"""
+import argparse
+import glob
+import io
+import os
+import subprocess
+import sys
+import tempfile
+
+import c_backend
+import jit
+import optimize
+from lexical_analyzer import tokenize
+from syntactic_analyzer import Parser
+from vm import VM, AtomCRuntimeError, Runtime
+from codegen import compile_unit
+
+BACKENDS = ["opt", "jit", "c"]
+DEFAULT_INPUT = "5\n3\n2\n1\n4\n9\nx\n7\n"  # Enough numbers, then a word, for the programs of tests/
+DEFAULT_TIMEOUT = 10  # Seconds a C executable may run
+
+
+def run_in_process(machine, stdin):
+    """(stdout, stderr, exit status) of machine.run() the way vm.main reports it"""
+    machine.runtime.stdin = io.StringIO(stdin)
+    machine.runtime.stdout = io.StringIO()
+    try:
+        machine.run()
+    except AtomCRuntimeError as e:
+        return machine.runtime.stdout.getvalue(), f"\nruntime error: {e}\n", 1
+    return machine.runtime.stdout.getvalue(), "", 0
+
+
+def run_vm(unit, stdin, args):
+    return run_in_process(VM(compile_unit(unit)), stdin)
+
+
+def run_jit(unit, stdin, args):
+    return run_in_process(jit.JIT(jit.compile_python(unit)), stdin)
+
+
+def run_opt(unit, stdin, args):
+    return run_in_process(VM(optimize.compile_optimized(unit)[0]), stdin)
+
+
+def run_c(unit, stdin, args):
+    with tempfile.TemporaryDirectory() as directory:
+        executable = os.path.join(directory, "program")
+        c_backend.build(c_backend.emit_c(unit), executable, args.cc)
+        result = subprocess.run([executable], input=stdin, capture_output=True, text=True, timeout=args.timeout)
+    return result.stdout, result.stderr, result.returncode
+
+
+RUNNERS = {"opt": run_opt, "jit": run_jit, "c": run_c}
+
+
+def compare(path, backends, stdin, args):
+    """Differences of each backend with the VM for one program: [(backend, message)]; None if it does not compile"""
+    with open(path, 'r') as file:
+        code = file.read()
+    try:
+        parser = Parser(tokenize(code), build_ast=True)
+        parser.parse_unit()
+    except SyntaxError:  # Lexical errors included
+        return None
+    expected = run_vm(parser.unit, stdin, args)
+    differences = []
+    for backend in backends:
+        try:
+            actual = RUNNERS[backend](parser.unit, stdin, args)
+        except subprocess.CalledProcessError as e:
+            differences.append((backend, f"build failed:\n{e.stderr}"))
+            continue
+        except subprocess.TimeoutExpired as e:
+            differences.append((backend, f"timed out after {e.timeout} s"))
+            continue
+        for what, want, got in zip(("stdout", "stderr", "status"), expected, actual):
+            if want != got:
+                differences.append((backend, f"{what} {got!r}, the VM gives {want!r}"))
+    return differences
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compare the output of the AtomC backends with the VM")
+    arg_parser.add_argument("paths", nargs="*", help="AtomC source files (default: tests/*.c)")
+    arg_parser.add_argument("--backends", default=",".join(BACKENDS), help="comma separated backends to compare")
+    arg_parser.add_argument("--input", default=None, help="file given as standard input to every program")
+    arg_parser.add_argument("--cc", default=c_backend.DEFAULT_CC, help="C compiler of the c backend")
+    arg_parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                            help=f"seconds a C executable may run (default {DEFAULT_TIMEOUT})")
+    args = arg_parser.parse_args(argv)
+
+    backends = [name for name in args.backends.split(",") if name]
+    for name in backends:
+        if name not in RUNNERS:
+            arg_parser.error(f"unknown backend {name!r} (choose from {', '.join(BACKENDS)})")
+    paths = args.paths or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "*.c")))
+    stdin = DEFAULT_INPUT
+    if args.input:
+        with open(args.input, 'r') as file:
+            stdin = file.read()
+
+    failed = 0
+    for path in paths:
+        differences = compare(path, backends, stdin, args)
+        if differences is None:
+            print(f"SKIP   {path} (does not compile)")
+        elif differences:
+            failed += 1
+            for backend, message in differences:
+                print(f"DIFF   {path} [{backend}]: {message}")
+        else:
+            print(f"OK     {path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
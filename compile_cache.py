@@ -0,0 +1,109 @@
+"""
+Persistent cache of token streams and analysis outcomes, keyed by the hash of the source
+text and the compiler version, so unchanged files are not lexed and parsed again. The
+compiler version is a hash of the modules that produce the cached results, so editing any
+of them invalidates the old entries.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+SOURCES = ("lexical_analyzer.py", "syntactic_analyzer.py", "ast_nodes.py", "compile_cache.py")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = ".pickle"
+
+
+def compiler_version(directory=os.path.dirname(os.path.abspath(__file__))):
+    """Hash of the SOURCES in directory"""
+    digest = hashlib.sha256()
+    for name in SOURCES:
+        with open(os.path.join(directory, name), "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+COMPILER_VERSION = compiler_version()
+
+
+class CacheEntry:
+    def __init__(self, tokens, ok, error=None, symbols=None):
+        self.tokens = tokens  # Tokens of the source: a list, or the TokenBuffer of tokenize_buffer
+        self.ok = ok
+        self.error = error  # Diagnostic message when the unit failed
+        self.symbols = symbols  # SymbolTable of the unit when it passed
+
+
+class CompileCache:
+    """
+    Directory of pickled CacheEntry files named after their key. Reading an entry marks it as
+    recently used (mtime); when the directory grows past max_bytes the least recently used
+    entries are deleted. Several processes may share one directory.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())  # Estimate, refreshed on eviction
+
+    @staticmethod
+    def key(code):
+        return hashlib.sha256(f"{COMPILER_VERSION}\0{code}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def _entries(self):
+        """(mtime, path, size) of every entry in the directory"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # Evicted by another process meanwhile
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def get(self, code):
+        """Returns the CacheEntry stored for code, or None"""
+        path = self._path(self.key(code))
+        try:
+            with open(path, "rb") as file:
+                entry = pickle.load(file)
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        return entry
+
+    def put(self, code, entry):
+        path = self._path(self.key(code))
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)  # Atomic, so concurrent readers never see a partial entry
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._size += os.path.getsize(path)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes"""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            self.evictions += 1
@@ -0,0 +1,210 @@
+"""
+Long-lived compile server, so repeated compiles do not pay interpreter startup, imports and
+regex compilation every time, and a thin client for it.
+
+Usage:
+    python compile_server.py serve [--socket PATH] [-j WORKERS] [--cache-dir DIR]
+    python compile_server.py compile [--socket PATH] [--engine regex|dfa] FILE [FILE ...]
+    python compile_server.py stop [--socket PATH]
+
+The server listens on a Unix socket (default $ATOMC_SERVER_SOCKET or
+/tmp/atomc-compile-<uid>.sock). Each connection is served by its own thread; the compiles
+themselves run on a pool of pre-started worker processes. The protocol is one JSON object
+per line in both directions:
+
+    {"op": "compile", "path": "/abs/file.c", "engine": "regex"}
+    {"op": "compile", "source": "void main(){}", "name": "<stdin>"}
+    {"op": "ping"} / {"op": "shutdown"}
+
+and every request gets one response line, the fields of batch.CompileResult for compiles.
+When no server is running, the client compiles in its own process instead.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+
+# The client imports as little as possible: it runs once per compile
+DEFAULT_SOCKET = os.environ.get("ATOMC_SERVER_SOCKET") or \
+                 os.path.join(os.environ.get("TMPDIR", "/tmp"), f"atomc-compile-{os.getuid()}.sock")
+
+
+def handle_compile(request, cache_dir=None):
+    """Runs one compile request; executed in a worker process"""
+    import batch  # Workers import the compiler once and keep it for every later request
+
+    engine = request.get("engine", "regex")
+    if "source" in request:
+        result = batch.compile_code(request["source"], request.get("name", "<source>"), engine, cache_dir)
+    else:
+        result = batch.compile_file(request["path"], engine, cache_dir)
+    return vars(result)
+
+
+def warm_up():
+    """Worker initializer: pays imports, regex compilation and a first parse before any request"""
+    handle_compile({"source": "void main(){}"})
+
+
+def ping_worker():
+    return os.getpid()
+
+
+# ---------- Server ----------
+
+def serve(socket_path=DEFAULT_SOCKET, workers=None, cache_dir=None):
+    import socketserver
+    import threading
+    from concurrent.futures import ProcessPoolExecutor
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    op = request.get("op", "compile")
+                    if op == "compile":
+                        response = pool.submit(handle_compile, request, cache_dir).result()
+                    elif op == "ping":
+                        response = {"ok": True, "pid": os.getpid()}
+                    elif op == "shutdown":
+                        response = {"ok": True}
+                        threading.Thread(target=server.shutdown).start()
+                    else:
+                        response = {"ok": False, "error": f"unknown op {op!r}"}
+                except Exception as e:  # A bad request must not take the server down
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                self.wfile.write((json.dumps(response) + "\n").encode())
+                self.wfile.flush()
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    if os.path.exists(socket_path):
+        if ping(socket_path):
+            raise SystemExit(f"a compile server is already running on {socket_path}")
+        os.unlink(socket_path)  # Left behind by a server that did not shut down cleanly
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=warm_up) as pool:
+        # Start every worker now rather than on the first requests
+        for future in [pool.submit(ping_worker) for _ in range(workers)]:
+            future.result()
+        server = Server(socket_path, Handler)
+        try:
+            print(f"compile server listening on {socket_path} with {workers} workers", flush=True)
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+
+# ---------- Client ----------
+
+class Connection:
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=None):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        try:
+            self.socket.connect(socket_path)
+        except OSError:
+            self.socket.close()
+            raise
+        self.file = self.socket.makefile("rwb")
+
+    def request(self, request):
+        self.file.write((json.dumps(request) + "\n").encode())
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("compile server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+def ping(socket_path=DEFAULT_SOCKET):
+    """True when a server answers on socket_path"""
+    try:
+        connection = Connection(socket_path, timeout=2)
+    except OSError:
+        return False
+    try:
+        return connection.request({"op": "ping"}).get("ok", False)
+    except (OSError, ValueError):
+        return False
+    finally:
+        connection.close()
+
+
+def compile_paths(paths, socket_path=DEFAULT_SOCKET, engine="regex"):
+    """
+    Compiles the files through the server and returns (result dicts, served); falls back to
+    compiling in this process, with served False, when no server is listening.
+    """
+    try:
+        connection = Connection(socket_path)
+    except OSError:
+        import batch
+        return [vars(batch.compile_file(path, engine)) for path in paths], False
+    try:
+        results = []
+        for path in paths:
+            result = connection.request({"op": "compile", "path": os.path.abspath(path), "engine": engine})
+            result["path"] = path  # Report the name the caller used
+            results.append(result)
+        return results, True
+    finally:
+        connection.close()
+
+
+def print_results(results, out=sys.stdout):
+    for result in results:
+        if result["ok"]:
+            print(f"OK     {result['path']}: {result['tokens']} tokens, {result['symbols']} symbols", file=out)
+        else:
+            print(f"ERROR  {result['path']}: {result['error']}", file=out)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="AtomC compile server and client")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the server in the foreground")
+    serve_parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    serve_parser.add_argument("--cache-dir", default=None, help="on-disk result cache shared by the workers")
+    compile_parser = commands.add_parser("compile", help="compile files through the server")
+    compile_parser.add_argument("paths", nargs="+")
+    compile_parser.add_argument("--engine", choices=["regex", "dfa"], default="regex", help="lexer engine")
+    commands.add_parser("stop", help="shut the server down")
+    for command in commands.choices.values():
+        command.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.socket, args.workers, args.cache_dir)
+        return 0
+    if args.command == "stop":
+        try:
+            connection = Connection(args.socket)
+        except OSError:
+            print(f"no compile server on {args.socket}", file=sys.stderr)
+            return 1
+        try:
+            connection.request({"op": "shutdown"})
+        finally:
+            connection.close()
+        return 0
+
+    results, served = compile_paths(args.paths, args.socket, args.engine)
+    if not served:
+        print(f"no compile server on {args.socket}, compiled in-process", file=sys.stderr)
+    print_results(results)
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Worklist dataflow framework over the IR of ir.py, with liveness, reaching definitions and
+conditional constant propagation as its first analyses.
+
+Usage: python dataflow.py FILE.c [--no-ssa] [--analyses liveness,reaching,constants]
+
+An Analysis describes a lattice and the transfer function of a block; solve() iterates it
+to a fixed point. Facts flow along CFG edges through Analysis.edge, which is where the
+per-predecessor operands of phis are handled and where constant propagation drops the
+edges of branches it has decided. The analyses work on functions in and out of SSA form.
+"""
+import argparse
+import heapq
+import math
+import sys
+
+from ir import Constant, Temp, format_function, lower_unit, reverse_postorder
+from lexical_analyzer import tokenize
+from syntactic_analyzer import TB_CHAR, TB_DOUBLE, Parser
+from vm import int_div, wrap_int
+
+NAC = "NAC"  # Not a constant: a Temp whose value is unknown or differs between paths
+
+
+class Analysis:
+    """
+    Direction, lattice and transfer function of a dataflow problem. Values flow forward from
+    the entry, or backward from the exits when backward is True.
+    """
+    backward = False
+
+    def boundary(self, function):
+        """Value at the entry (forward) or at the exits (backward)"""
+        raise NotImplementedError
+
+    def top(self, function):
+        """Initial value of every other block, the identity of meet"""
+        raise NotImplementedError
+
+    def meet(self, values):
+        raise NotImplementedError
+
+    def transfer(self, block, value):
+        """Value at the other end of block given the value where the flow enters it"""
+        raise NotImplementedError
+
+    def edge(self, source, target, value):
+        """Value carried along the CFG edge source -> target, in the direction of the flow"""
+        return value
+
+
+class Result:
+    def __init__(self, before, after):
+        self.before = before  # Block -> value at its first instruction
+        self.after = after  # Block -> value after its terminator
+
+
+def solve(function, analysis):
+    """Result of analysis on a linked function"""
+    order = reverse_postorder(function)
+    if analysis.backward:
+        order.reverse()
+    position = {block: index for index, block in enumerate(order)}
+    top = analysis.top(function)
+    entering = {block: top for block in order}  # Value where the flow enters each block
+    leaving = {block: top for block in order}
+    exits = [block for block in order if not block.succs]
+
+    def inputs(block):
+        if analysis.backward:
+            values = [analysis.edge(succ, block, leaving[succ]) for succ in block.succs]
+            if block in exits:
+                values.append(analysis.boundary(function))
+        else:
+            values = [analysis.edge(pred, block, leaving[pred]) for pred in block.preds]
+            if block is function.entry:
+                values.append(analysis.boundary(function))
+        return analysis.meet(values)
+
+    # Blocks are taken in order, so loops converge quickly: the worklist is a heap of positions
+    work = list(range(len(order)))
+    queued = set(order)
+    while work:
+        block = order[heapq.heappop(work)]
+        queued.discard(block)
+        value = inputs(block)
+        entering[block] = value
+        result = analysis.transfer(block, value)
+        if result != leaving[block]:
+            leaving[block] = result
+            for other in block.preds if analysis.backward else block.succs:
+                if other not in queued:
+                    queued.add(other)
+                    heapq.heappush(work, position[other])
+
+    if analysis.backward:
+        return Result(leaving, entering)
+    return Result(entering, leaving)
+
+
+# ---------- Liveness ----------
+
+class Liveness(Analysis):
+    """Temps whose current value may still be read: frozensets of Temps"""
+    backward = True
+
+    def boundary(self, function):
+        return frozenset()
+
+    def top(self, function):
+        return frozenset()
+
+    def meet(self, values):
+        return frozenset().union(*values)
+
+    def transfer(self, block, value):
+        live = set(value)
+        for instr in reversed(block.instrs):
+            if instr.op == "phi":
+                continue  # Its operands are read on the incoming edges
+            if instr.dst is not None:
+                live.discard(instr.dst)
+            live.update(instr.uses())
+        return frozenset(live)
+
+    def edge(self, source, target, value):
+        """Live at the end of target, the predecessor of source: the phis of source read their operand there"""
+        phis = source.phis()
+        if not phis:
+            return value
+        live = set(value)
+        for phi in phis:
+            live.discard(phi.dst)
+        for phi in phis:
+            for pred, arg in zip(phi.attr, phi.args):
+                if pred is target and isinstance(arg, Temp):
+                    live.add(arg)
+        return frozenset(live)
+
+
+# ---------- Reaching definitions ----------
+
+class ReachingDefinitions(Analysis):
+    """Instructions whose assignment to their dst may reach a point unchanged: frozensets of Instrs"""
+
+    def boundary(self, function):
+        return frozenset()  # Arguments are defined before the entry, by no instruction
+
+    def top(self, function):
+        return frozenset()
+
+    def meet(self, values):
+        return frozenset().union(*values)
+
+    def transfer(self, block, value):
+        reaching = {}
+        for instr in value:
+            reaching.setdefault(instr.dst, set()).add(instr)
+        for instr in block.instrs:
+            if instr.dst is not None:
+                reaching[instr.dst] = {instr}
+        return frozenset(instr for instrs in reaching.values() for instr in instrs)
+
+
+# ---------- Constant propagation ----------
+
+class ConstantPropagation(Analysis):
+    """
+    Conditional constant propagation: a value is None while no path to the point is known to
+    execute, otherwise a dict Temp -> int or float constant, or NAC. Branches on a constant
+    only pass their taken edge, so code behind them stays unreachable and does not spoil the
+    phis it feeds. Folding follows the VM, so a division by zero is left to run.
+    """
+
+    def boundary(self, function):
+        return {param: NAC for param in function.params}
+
+    def top(self, function):
+        return None
+
+    def meet(self, values):
+        values = [value for value in values if value is not None]
+        if not values:
+            return None
+        merged = dict(values[0])
+        for value in values[1:]:
+            for temp in list(merged):
+                if value.get(temp, NAC) != merged[temp]:
+                    merged[temp] = NAC
+            for temp in value:
+                if temp not in merged:
+                    merged[temp] = NAC
+        return merged
+
+    def transfer(self, block, value):
+        if value is None:
+            return None
+        state = dict(value)
+        for instr in block.instrs:
+            if instr.dst is not None and instr.op != "phi":
+                state[instr.dst] = evaluate(instr, state)
+        return state
+
+    def edge(self, source, target, value):
+        if value is None:
+            return None
+        terminator = source.terminator
+        if terminator is not None and terminator.op == "branch":
+            condition = lookup(terminator.args[0], value)
+            if condition is not NAC and target is not terminator.attr[0 if condition else 1]:
+                return None
+        phis = target.phis()
+        if not phis:
+            return value
+        state = dict(value)
+        for phi in phis:
+            state[phi.dst] = next(lookup(arg, value) for pred, arg in zip(phi.attr, phi.args) if pred is source)
+        return state
+
+
+def lookup(value, state):
+    """Constant value of an operand in state, or NAC"""
+    if isinstance(value, Constant):
+        return NAC if isinstance(value.value, str) else value.value
+    return state.get(value, NAC)
+
+
+def evaluate(instr, state):
+    """Constant computed by instr in state, or NAC"""
+    if instr.op not in ("copy", "binary", "unary", "convert"):
+        return NAC
+    args = [lookup(arg, state) for arg in instr.args]
+    if NAC in args:
+        return NAC
+    op = instr.attr
+    try:
+        if instr.op == "copy":
+            result = args[0]
+        elif instr.op == "convert":
+            base = instr.dst.type.typeBase
+            if base == TB_DOUBLE:
+                result = float(args[0])
+            elif base == TB_CHAR:
+                result = int(args[0]) & 0xFF
+            else:
+                result = wrap_int(int(args[0]))
+        elif instr.op == "unary":
+            result = -args[0] if op == "-" else (0 if args[0] else 1)
+        else:
+            a, b = args
+            if op == "/":
+                if not b:
+                    return NAC  # The VM reports the division by zero
+                result = a / b if instr.dst.type.typeBase == TB_DOUBLE else int_div(a, b)
+            else:
+                result = BINARY[op](a, b)
+    except (OverflowError, ValueError):  # int() of an infinite or NaN double
+        return NAC
+    if isinstance(result, float) and math.isnan(result):
+        return NAC  # NaN != NaN would keep the lattice from settling
+    if isinstance(result, int) and instr.dst.type.typeBase != TB_DOUBLE:
+        return wrap_int(result)  # Like the VM's int arithmetic
+    return result
+
+
+BINARY = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "<": lambda a, b: 1 if a < b else 0,
+    "<=": lambda a, b: 1 if a <= b else 0,
+    ">": lambda a, b: 1 if a > b else 0,
+    ">=": lambda a, b: 1 if a >= b else 0,
+    "==": lambda a, b: 1 if a == b else 0,
+    "!=": lambda a, b: 1 if a != b else 0,
+}
+
+
+# ---------- Clients ----------
+
+def liveness(function):
+    """(live in, live out): Block -> frozenset of the Temps live at its start and its end"""
+    result = solve(function, Liveness())
+    return result.before, result.after
+
+
+def reaching_definitions(function):
+    """Block -> frozenset of the Instrs whose definition reaches its start"""
+    return solve(function, ReachingDefinitions()).before
+
+
+def constant_propagation(function):
+    """(constants, unreachable): Instr -> the constant it assigns to its dst, for every such Instr, and the blocks that never run"""
+    result = solve(function, ConstantPropagation())
+    constants = {}
+    unreachable = []
+    for block in function.blocks:
+        state = result.before[block]
+        if state is None:
+            unreachable.append(block)
+            continue
+        state = dict(state)
+        for instr in block.instrs:
+            if instr.dst is None:
+                continue
+            if instr.op != "phi":
+                state[instr.dst] = evaluate(instr, state)
+            if state.get(instr.dst, NAC) is not NAC:
+                constants[instr] = state[instr.dst]
+    return constants, unreachable
+
+
+def annotate(function, names):
+    """Block -> note lines with the results of the analyses named in names (liveness, reaching, constants)"""
+    notes = {block: [] for block in function.blocks}
+    for name in names:
+        ANNOTATORS[name](function, notes)
+    return notes
+
+
+def _temps(temps):
+    return ", ".join(sorted(repr(temp) for temp in temps)) or "-"
+
+
+def _annotate_liveness(function, notes):
+    live_in, live_out = liveness(function)
+    for block in function.blocks:
+        notes[block].append(f"live in: {_temps(live_in[block])}")
+        notes[block].append(f"live out: {_temps(live_out[block])}")
+
+
+def _annotate_reaching(function, notes):
+    reaching = reaching_definitions(function)
+    for block in function.blocks:
+        definitions = sorted(f"{instr.dst!r}@{instr.line}" for instr in reaching[block])
+        notes[block].append(f"reaching: {', '.join(definitions) or '-'}")
+
+
+def _annotate_constants(function, notes):
+    constants, unreachable = constant_propagation(function)
+    for block in function.blocks:
+        if block in unreachable:
+            notes[block].append("unreachable")
+            continue
+        found = [f"{instr.dst!r} = {constants[instr]!r}" for instr in block.instrs if instr in constants]
+        if found:
+            notes[block].append(f"constants: {', '.join(found)}")
+
+
+ANNOTATORS = {"liveness": _annotate_liveness, "reaching": _annotate_reaching, "constants": _annotate_constants}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Print the IR of an AtomC program with dataflow facts")
+    arg_parser.add_argument("path", help="AtomC source file")
+    arg_parser.add_argument("--no-ssa", action="store_true", help="analyse the IR before SSA construction")
+    arg_parser.add_argument("--analyses", default=",".join(ANNOTATORS),
+                            help=f"comma separated analyses among {', '.join(ANNOTATORS)} (default: all)")
+    args = arg_parser.parse_args(argv)
+
+    names = [name for name in args.analyses.split(",") if name]
+    for name in names:
+        if name not in ANNOTATORS:
+            arg_parser.error(f"unknown analysis {name!r} (choose from {', '.join(ANNOTATORS)})")
+    with open(args.path, 'r') as file:
+        code = file.read()
+    parser = Parser(tokenize(code), build_ast=True)
+    try:
+        parser.parse_unit()
+    except SyntaxError as e:
+        print(e, file=sys.stderr)
+        return 1
+    module = lower_unit(parser.unit, ssa=not args.no_ssa)
+    print("\n\n".join(format_function(function, annotate(function, names)) for function in module.functions.values()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
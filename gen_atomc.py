@@ -0,0 +1,178 @@
+"""
+Generator of valid AtomC programs of configurable size and shape, used by bench_scaling.py
+to measure how the compiler scales with its input.
+
+Usage: python gen_atomc.py SHAPE SIZE [SEED] > program.c
+
+Shapes (SIZE is the number of units of the shape):
+    globals      SIZE global variable declarations of every type
+    nesting      SIZE nested if/while blocks inside one function
+    expressions  statements made of expressions with SIZE operands each
+    structs      SIZE structs with several members, globals of those types and member accesses
+    functions    SIZE functions, each calling the previous one
+    mixed        a bit of everything, scaled by SIZE
+
+Every program defines main() and only uses the grammar accepted by syntactic_analyzer;
+programs terminate when run with vm.py.
+"""
+import random
+import sys
+
+SHAPES = ["globals", "nesting", "expressions", "structs", "functions", "mixed"]
+INT_OPS = ["+", "-", "*", "<", "<=", ">", ">=", "==", "!=", "&&", "||"]
+SCALAR_TYPES = ["int", "double", "char"]
+
+
+class ProgramBuilder:
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.lines = []
+
+    def emit(self, line, indent=0):
+        self.lines.append("\t" * indent + line)
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+    def expr(self, names, operands):
+        """Random int expression with `operands` leaves, over the int variables in names"""
+        if operands <= 1:
+            if not names or self.random.random() < 0.3:
+                return str(self.random.randint(0, 99))
+            return self.random.choice(names)
+        left = self.random.randint(max(1, operands // 3), max(1, operands - operands // 3 - 1))
+        text = f"{self.expr(names, left)} {self.random.choice(INT_OPS)} {self.expr(names, operands - left)}"
+        return f"({text})" if self.random.random() < 0.4 else text
+
+    # ---------- Shapes ----------
+
+    def globals(self, count):
+        names = []
+        for i in range(count):
+            t = SCALAR_TYPES[i % 3]
+            if i % 4 == 3:
+                self.emit(f"{t} ga{i}[{i % 16 + 1}];")
+            else:
+                self.emit(f"{t} g{i};")
+                if t == "int":
+                    names.append(f"g{i}")
+        self.emit("void main()")
+        self.emit("{")
+        for name in names[:50]:
+            self.emit(f"{name} = {self.expr(names[:50], 4)};", 1)
+        self.emit("put_i(0);", 1)
+        self.emit("}")
+
+    def nesting(self, depth):
+        self.emit("void main()")
+        self.emit("{")
+        self.emit("int v0;", 1)
+        self.emit("v0 = 0;", 1)
+        for level in range(1, depth + 1):
+            if level % 2:
+                self.emit(f"if (v{level - 1} >= 0) {{", level)
+                self.emit(f"int v{level};", level + 1)
+                self.emit(f"v{level} = v{level - 1} + 1;", level + 1)
+            else:
+                self.emit(f"int v{level};", level)
+                self.emit(f"v{level} = 0;", level)
+                self.emit(f"while (v{level} < 1) {{", level)
+                self.emit(f"v{level} = v{level} + 1;", level + 1)
+        self.emit(f"put_i(v{depth});", depth + 1)
+        for level in range(depth, 0, -1):
+            self.emit("}", level)
+        self.emit("}")
+
+    def expressions(self, operands, statements=8):
+        names = [f"x{i}" for i in range(16)]
+        self.emit("void main()")
+        self.emit("{")
+        self.emit(f"int {', '.join(names)};", 1)
+        for i, name in enumerate(names):
+            self.emit(f"{name} = {i};", 1)
+        for i in range(statements):
+            self.emit(f"{names[i % len(names)]} = {self.expr(names, operands)};", 1)
+        self.emit("put_i(x0);", 1)
+        self.emit("}")
+
+    def structs(self, count):
+        for i in range(count):
+            self.emit(f"struct S{i} {{")
+            self.emit("int id;", 1)
+            self.emit("double weight;", 1)
+            self.emit("char tag[8];", 1)
+            self.emit(f"int values[{i % 8 + 2}];", 1)
+            if i % 8:  # Chains of at most 8 nested structs, so the data size stays linear in count
+                self.emit(f"struct S{i - 1} inner;", 1)
+            self.emit("};")
+            self.emit(f"struct S{i} s{i};")
+        self.emit("void main()")
+        self.emit("{")
+        for i in range(count):
+            self.emit(f"s{i}.id = {i};", 1)
+            self.emit(f"s{i}.values[1] = s{i}.id * 2;", 1)
+            if i % 8:
+                self.emit(f"s{i}.inner.weight = s{i - 1}.weight + 0.5;", 1)
+        self.emit(f"put_i(s{count - 1}.values[1]);" if count else "put_i(0);", 1)
+        self.emit("}")
+
+    def function(self, name, callee, body_operands=6):
+        self.emit(f"int {name}(int a, double b, char c)")
+        self.emit("{")
+        self.emit("int i, r, t[4];", 1)
+        self.emit("r = a;", 1)
+        self.emit("for (i = 0; i < 4; i = i + 1) {", 1)
+        self.emit(f"t[i] = {self.expr(['a', 'i', 'r'], body_operands)};", 2)
+        self.emit("r = r + t[i];", 2)
+        self.emit("}", 1)
+        self.emit("if (b > 1.5) r = r - 1;", 1)
+        self.emit("else r = r + c;", 1)
+        if callee:
+            self.emit(f"return {callee}(r, b / 2, c) + 1;", 1)
+        else:
+            self.emit("return r;", 1)
+        self.emit("}")
+
+    def functions(self, count):
+        for i in range(count):
+            self.function(f"f{i}", f"f{i - 1}" if i else None)
+        self.emit("void main()")
+        self.emit("{")
+        self.emit(f"put_i(f{count - 1}(1, 3.0, 'a'));" if count else "put_i(0);", 1)
+        self.emit("}")
+
+    def mixed(self, size):
+        for i in range(max(1, size // 10)):
+            self.emit(f"struct M{i} {{ int id; double w; int v[4]; }};")
+            self.emit(f"struct M{i} m{i};")
+        for i in range(max(1, size // 4)):
+            self.emit(f"{SCALAR_TYPES[i % 3]} mg{i};")
+        functions = max(1, size // 10)
+        for i in range(functions):
+            self.function(f"mf{i}", f"mf{i - 1}" if i % 8 else None, 12)
+        self.emit("void main()")
+        self.emit("{")
+        self.emit("int k, acc;", 1)
+        self.emit("acc = 0;", 1)
+        self.emit(f"for (k = 0; k < {max(1, size // 10)}; k = k + 1) {{", 1)
+        self.emit("if (k / 2 * 2 == k) acc = acc + k;", 2)
+        self.emit("else { while (acc > 100) acc = acc - 100; }", 2)
+        self.emit("}", 1)
+        self.emit(f"m0.v[1] = mf{functions - 1}(acc, 2.5, 'x');", 1)
+        self.emit("put_i(m0.v[1]);", 1)
+        self.emit("}")
+
+
+def generate(shape, size, seed=0):
+    """Source text of a valid AtomC program of the given shape and size"""
+    if shape not in SHAPES:
+        raise ValueError(f"unknown shape {shape!r}, expected one of {', '.join(SHAPES)}")
+    builder = ProgramBuilder(seed)
+    getattr(builder, shape)(size)
+    return builder.text()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        raise SystemExit(__doc__)
+    sys.stdout.write(generate(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) > 3 else 0))
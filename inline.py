@@ -0,0 +1,241 @@
+"""
+Inlining of small AtomC functions into their callers, on the SSA IR of ir.py.
+
+A call is replaced by a copy of the callee's blocks when the callee is defined in the unit,
+is not recursive (it is not on a cycle of the call graph), and its size, the number of
+instructions other than phis and jumps, fits the budget. Calls in loops are the hot ones,
+so their budget is HOT_FACTOR times larger. A caller stops inlining once it has grown
+GROWTH_FACTOR times, so chains of small calls cannot blow up code size.
+
+The copy gets fresh Temps named after the callee and the inlined call (sum#1.i for the i
+of the first call of sum), so the locals of different calls, or of the caller, never
+clash. Arguments replace the callee's parameters. Every return becomes a jump to the code
+after the call, with a phi for the result when there are several. The callee's allocas
+move to the caller's entry block, since their address is the same for the whole call,
+and a zero instruction clears their storage where the callee's frame started zeroed.
+
+Usage: python optimize.py FILE.c [--budget N] prints the decisions of every call site.
+"""
+from ir import Block, Instr, Temp, dominators, natural_loops, successors
+from syntactic_analyzer import CLS_FUNC
+
+DEFAULT_BUDGET = 24  # Largest callee inlined at a call outside loops
+HOT_FACTOR = 3  # Budget multiplier for calls in loops
+GROWTH_FACTOR = 4  # A caller does not grow by inlining beyond this multiple of its size
+GROWTH_MIN = 200  # ... unless it stays below this size
+
+
+class Decision:
+    __slots__ = ("caller", "callee", "line", "inlined", "reason")
+
+    def __init__(self, caller, callee, line, inlined, reason):
+        self.caller = caller
+        self.callee = callee
+        self.line = line
+        self.inlined = inlined
+        self.reason = reason
+
+    def __repr__(self):
+        verdict = "inlined" if self.inlined else "kept"
+        return f"{self.caller}:{self.line}: call of {self.callee} {verdict} ({self.reason})"
+
+
+def size(function):
+    """Cost of a function: instructions other than phis and jumps"""
+    return sum(1 for instr in function.instructions() if instr.op not in ("phi", "jump"))
+
+
+def call_graph(module):
+    """Name -> names of the functions of the module it calls"""
+    return {name: {instr.attr.name for instr in function.instructions()
+                   if instr.op == "call" and instr.attr.name in module.functions}
+            for name, function in module.functions.items()}
+
+
+def recursive_functions(graph):
+    """Names of the functions on a cycle of the call graph, by Tarjan's strongly connected components"""
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    recursive = set()
+    counter = 0
+    for root in graph:
+        if root in index:
+            continue
+        work = [(root, iter(sorted(graph[root])))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            name, callees = work[-1]
+            for callee in callees:
+                if callee not in index:
+                    index[callee] = low[callee] = counter
+                    counter += 1
+                    stack.append(callee)
+                    on_stack.add(callee)
+                    work.append((callee, iter(sorted(graph[callee]))))
+                    break
+                if callee in on_stack:
+                    low[name] = min(low[name], index[callee])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[name])
+                if low[name] == index[name]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == name:
+                            break
+                    if len(component) > 1 or name in graph[name]:
+                        recursive.update(component)
+    return recursive
+
+
+def bottom_up(module):
+    """Functions of the module, each after the functions it calls except along cycles"""
+    graph = call_graph(module)
+    order = []
+    visited = set()
+    for root in module.functions:
+        if root in visited:
+            continue
+        visited.add(root)
+        work = [(root, iter(sorted(graph[root])))]
+        while work:
+            name, callees = work[-1]
+            for callee in callees:
+                if callee not in visited:
+                    visited.add(callee)
+                    work.append((callee, iter(sorted(graph[callee]))))
+                    break
+            else:
+                work.pop()
+                order.append(module.functions[name])
+    return order
+
+
+class Inliner:
+    def __init__(self, module, budget=DEFAULT_BUDGET):
+        self.module = module
+        self.budget = budget
+        self.recursive = recursive_functions(call_graph(module))
+        self.counts = {}  # Callee name -> calls inlined so far, numbering the copies
+
+    def inline_calls(self, function, decisions):
+        """Inlines the calls of function that qualify, appending a Decision per call site; True if any was"""
+        limit = max(size(function) * GROWTH_FACTOR, GROWTH_MIN)
+        hot = self.hot_blocks(function)
+        sites = [(block, instr) for block in function.blocks for instr in block.instrs
+                 if instr.op == "call" and instr.attr.cls == CLS_FUNC]
+        inlined = False
+        for block, call in sites:
+            callee = self.module.functions.get(call.attr.name)
+            in_loop = block in hot
+            decision = self.decide(function, callee, call, in_loop, limit)
+            decisions.append(decision)
+            if decision.inlined:
+                block = next(block for block in function.blocks if call in block.instrs)
+                self.inline(function, block, call, callee)
+                inlined = True
+        return inlined
+
+    def hot_blocks(self, function):
+        """Blocks in a loop"""
+        hot = set()
+        for body in natural_loops(function, dominators(function)).values():
+            hot.update(body)
+        return hot
+
+    def decide(self, function, callee, call, in_loop, limit):
+        name = call.attr.name
+        if callee is None:
+            return Decision(function.name, name, call.line, False, "not defined in this unit")
+        if name in self.recursive:
+            return Decision(function.name, name, call.line, False, "recursive")
+        cost = size(callee)
+        budget = self.budget * HOT_FACTOR if in_loop else self.budget
+        where = "in a loop" if in_loop else "outside loops"
+        if cost > budget:
+            return Decision(function.name, name, call.line, False, f"size {cost} > budget {budget} {where}")
+        if size(function) + cost > limit:
+            return Decision(function.name, name, call.line, False, f"caller would grow beyond {limit}")
+        return Decision(function.name, name, call.line, True, f"size {cost} <= budget {budget} {where}")
+
+    def inline(self, function, block, call, callee):
+        """Replaces call, an instruction of block, by a copy of callee's blocks"""
+        number = self.counts[callee.name] = self.counts.get(callee.name, 0) + 1
+        prefix = f"{callee.name}#{number}."
+        values = dict(zip(callee.params, call.args))
+
+        def value(arg):
+            if not isinstance(arg, Temp):
+                return arg
+            if arg not in values:
+                values[arg] = Temp(prefix + arg.name, arg.type, arg.symbol, arg.version)
+            return values[arg]
+
+        # The code after the call moves to a block of its own, which the returns jump to
+        position = block.instrs.index(call)
+        after = function.new_block()
+        after.instrs = block.instrs[position + 1:]
+        del block.instrs[position:]
+        for succ in successors(after):
+            for phi in succ.phis():
+                phi.attr = [after if pred is block else pred for pred in phi.attr]
+
+        copies = {original: function.new_block() for original in callee.blocks}
+        returns = []
+        allocas = []
+        for original, copy in copies.items():
+            for position, instr in enumerate(original.instrs):
+                if instr.op == "ret":
+                    returns.append((copy, value(instr.args[0]) if instr.args else None))
+                    copy.instrs.append(Instr("jump", attr=[after], line=instr.line))
+                    continue
+                attr = instr.attr
+                if instr.op in ("jump", "branch", "phi"):
+                    attr = [copies[target] for target in attr]
+                dst = value(instr.dst) if instr.dst is not None else None
+                if instr.op == "alloca":
+                    allocas.append(Instr("alloca", dst, attr=attr, line=instr.line))
+                    nbytes = self.module.layouts.sizeof(attr)
+                    following = original.instrs[position + 1]
+                    if not (following.op == "memcpy" and following.args[0] is instr.dst and following.attr == nbytes):
+                        copy.instrs.append(Instr("zero", args=[dst], attr=nbytes, line=instr.line))
+                    continue
+                copy.instrs.append(Instr(instr.op, dst, [value(arg) for arg in instr.args], attr, instr.line))
+        function.entry.instrs[-1:-1] = allocas
+        block.instrs.append(Instr("jump", attr=[copies[callee.entry]], line=call.line))
+
+        if call.dst is not None:
+            if len(returns) == 1:
+                source, result = returns[0]
+                source.instrs.insert(-1, Instr("copy", call.dst, [result], line=call.line))
+            else:
+                after.instrs.insert(0, Instr("phi", call.dst, [result for _, result in returns],
+                                             [source for source, _ in returns], call.line))
+        function.link()
+
+
+def format_report(decisions):
+    """Text of the inlining decisions, grouped by caller"""
+    if not decisions:
+        return "no calls to inline"
+    lines = []
+    caller = None
+    for decision in decisions:
+        if decision.caller != caller:
+            caller = decision.caller
+            lines.append(f"{caller}:")
+        verdict = "inlined" if decision.inlined else "kept"
+        lines.append(f"  line {decision.line:<5} {decision.callee:20} {verdict:8} {decision.reason}")
+    inlined = sum(1 for decision in decisions if decision.inlined)
+    lines.append(f"{inlined} of {len(decisions)} calls inlined")
+    return "\n".join(lines)
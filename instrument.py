@@ -0,0 +1,152 @@
+"""
+Opt-in timing of the compiler: wall time and call counts of the phases (tokenize, parse),
+of every grammar rule and of the semantic checks.
+
+Nothing is wrapped unless a Profiler is attached, so an uninstrumented compile runs the
+plain functions. attach(parser) wraps the rule and check methods of that Parser instance
+only; the module-level checks of syntactic_analyzer (cast, getArithType, constant folding,
+the BINARY_OPS checks) are shared, so checks() patches them for the duration of a with
+block and they count calls from every thread meanwhile.
+
+For each name the report keeps calls, total time (including nested calls, so recursive
+rules can exceed the phase that contains them) and self time (excluding timed callees,
+which adds up to the phase time).
+"""
+import contextlib
+import json
+import time
+
+import syntactic_analyzer
+
+GRAMMAR_RULES = ["parse_unit", "declTyped", "declStruct", "declVar", "declFunc", "funcArg", "parse_type_base",
+                 "typeName", "arrayDecl", "parseConstExpr", "stmCompound", "stm", "expr", "exprAssign", "exprBinary",
+                 "exprCast", "exprUnary", "exprPostfix", "exprPrimary"]
+SEMANTIC_METHODS = ["findSymbol", "importSymbol", "addSymbol", "addVar", "addExtFuncs", "foldResult"]
+SEMANTIC_FUNCTIONS = ["cast", "getArithType", "foldBinary", "foldCast", "unescape"]
+
+PHASE, RULE, CHECK = "phase", "rule", "check"
+
+
+class Stat:
+    __slots__ = ("kind", "calls", "total", "self_time")
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.calls = 0
+        self.total = 0.0
+        self.self_time = 0.0
+
+
+class Profiler:
+    def __init__(self):
+        self.stats = {}  # Name -> Stat
+        self._children = []  # Time spent in timed callees, one slot per active timed call
+
+    def _stat(self, name, kind):
+        stat = self.stats.get(name)
+        if stat is None:
+            stat = self.stats[name] = Stat(kind)
+        return stat
+
+    def wrap(self, name, fn, kind):
+        """fn, timed under name"""
+        stat = self._stat(name, kind)
+        children = self._children
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            children.append(0.0)
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                inner = children.pop()
+                stat.calls += 1
+                stat.total += elapsed
+                stat.self_time += elapsed - inner
+                if children:
+                    children[-1] += elapsed
+
+        timed.__wrapped__ = fn
+        return timed
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Times the body of a with block as a phase"""
+        stat = self._stat(name, PHASE)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stat.calls += 1
+            stat.total += time.perf_counter() - start
+            stat.self_time = stat.total
+
+    def attach(self, parser):
+        """Times the grammar rules and semantic methods of one Parser instance"""
+        for name in GRAMMAR_RULES:
+            setattr(parser, name, self.wrap(name, getattr(parser, name), RULE))
+        for name in SEMANTIC_METHODS:
+            setattr(parser, name, self.wrap(name, getattr(parser, name), CHECK))
+        return parser
+
+    @contextlib.contextmanager
+    def checks(self):
+        """Times the module-level semantic checks of syntactic_analyzer inside a with block"""
+        saved = {name: getattr(syntactic_analyzer, name) for name in SEMANTIC_FUNCTIONS}
+        saved_ops = {op: binary.check for op, binary in syntactic_analyzer.BINARY_OPS.items()}
+        try:
+            for name, fn in saved.items():
+                setattr(syntactic_analyzer, name, self.wrap(name, fn, CHECK))
+            wrapped = {}
+            for op, binary in syntactic_analyzer.BINARY_OPS.items():
+                fn = saved_ops[op]
+                if fn not in wrapped:
+                    wrapped[fn] = self.wrap(fn.__name__, fn, CHECK)
+                binary.check = wrapped[fn]
+            yield self
+        finally:
+            for name, fn in saved.items():
+                setattr(syntactic_analyzer, name, fn)
+            for op, fn in saved_ops.items():
+                syntactic_analyzer.BINARY_OPS[op].check = fn
+
+    # ---------- Reports ----------
+
+    def report(self):
+        """Plain dict of the measurements, grouped by kind: {kind: {name: {calls, total, self}}}"""
+        result = {PHASE: {}, RULE: {}, CHECK: {}}
+        for name, stat in self.stats.items():
+            if stat.calls:
+                result[stat.kind][name] = {"calls": stat.calls, "total": stat.total, "self": stat.self_time}
+        return result
+
+
+def merge_reports(reports):
+    """Sums reports of several compiles (e.g. from batch workers) into one"""
+    merged = {PHASE: {}, RULE: {}, CHECK: {}}
+    for report in reports:
+        for kind, entries in report.items():
+            for name, entry in entries.items():
+                total = merged[kind].setdefault(name, {"calls": 0, "total": 0.0, "self": 0.0})
+                total["calls"] += entry["calls"]
+                total["total"] += entry["total"]
+                total["self"] += entry["self"]
+    return merged
+
+
+def to_json(report):
+    return json.dumps(report, indent=2, sort_keys=True)
+
+
+def format_table(report):
+    """Human readable table, phases first, then rules and checks by decreasing self time"""
+    lines = [f"{'kind':6} {'name':18} {'calls':>10} {'total ms':>11} {'self ms':>11} {'us/call':>9}"]
+    for kind in (PHASE, RULE, CHECK):
+        entries = sorted(report.get(kind, {}).items(), key=lambda item: -item[1]["self"])
+        for name, entry in entries:
+            per_call = entry["self"] / entry["calls"] * 1e6 if entry["calls"] else 0.0
+            lines.append(f"{kind:6} {name:18} {entry['calls']:>10} {entry['total'] * 1000:>11.3f} "
+                         f"{entry['self'] * 1000:>11.3f} {per_call:>9.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,325 @@
+"""
+Binary interface files: the global symbols of a unit (variables, function signatures and
+structs with their layout), so other units can use its declarations without parsing its
+source, and so the predefined functions need not be rebuilt for every compile.
+
+Usage:
+    python interface.py write FILE.c [-o FILE.atomi]
+    python interface.py dump FILE.atomi
+
+Format (little endian), made of fixed-size records so any one of them is read in place:
+
+    header   magic "ATMI", version, symbol/struct/field counts and section offsets
+    symbols  one record per global symbol, sorted by name: name, class, type, fields
+    structs  size and alignment of each struct and the index of its symbol record
+    fields   struct members (name, type, offset) and function arguments (name, type)
+    strings  UTF-8 names, referenced by (offset, length)
+
+A type is (base, nElements, struct index). InterfaceFile maps the file and decodes only
+what a lookup touches: find() binary searches the sorted symbol names and builds the
+Symbol of the match, and of the structs its type refers to, on first use.
+"""
+import argparse
+import hashlib
+import mmap
+import struct
+import sys
+
+from layout import Layouts, StructLayout
+from syntactic_analyzer import (CLS_EXTFUNC, CLS_FUNC, CLS_STRUCT, CLS_VAR, MEM_ARG, MEM_GLOBAL, TB_CHAR, TB_DOUBLE,
+                                TB_INT, TB_STRUCT, TB_VOID, Parser, Symbol, SymbolTable, Type)
+
+MAGIC = b"ATMI"
+VERSION = 1
+SUFFIX = ".atomi"
+
+HEADER = struct.Struct("<4sHHIIIIIII")  # magic, version, reserved, counts, section offsets
+SYMBOL = struct.Struct("<IHBBBiiIH")  # name offset/length, class, mem, type, first field, field count
+STRUCT = struct.Struct("<IIH")  # symbol index, size, align
+FIELD = struct.Struct("<IHBiiI")  # name offset/length, type, offset inside the struct
+
+TYPE_BASES = [TB_INT, TB_DOUBLE, TB_CHAR, TB_STRUCT, TB_VOID]
+CLASSES = [CLS_VAR, CLS_FUNC, CLS_EXTFUNC, CLS_STRUCT]
+MEMS = [None, MEM_GLOBAL]
+
+
+def exported_symbols(symbols, builtins=False):
+    """
+    The global symbols of a unit's SymbolTable, except its main (every program defines one, so
+    importing two units would clash); the predefined functions only with builtins
+    """
+    return [sym for sym in symbols if sym.mem in MEMS and (sym.cls != CLS_EXTFUNC) != builtins
+            and not (sym.cls == CLS_FUNC and sym.name == "main")]
+
+
+# ---------- Writing ----------
+
+def encode(symbols):
+    """Bytes of the interface file of the given global symbols"""
+    symbols = sorted(symbols, key=lambda sym: sym.name.encode())
+    structs = [sym for sym in symbols if sym.cls == CLS_STRUCT]
+    struct_indexes = {sym: index for index, sym in enumerate(structs)}
+    symbol_indexes = {sym: index for index, sym in enumerate(symbols)}
+    layouts = Layouts()
+    strings = bytearray()
+    string_offsets = {}
+
+    def string(text):
+        data = text.encode()
+        if data not in string_offsets:
+            string_offsets[data] = len(strings)
+            strings.extend(data)
+        return string_offsets[data], len(data)
+
+    def type_fields(t):
+        if t.typeBase == TB_STRUCT and t.structSymbol not in struct_indexes:
+            raise ValueError(f"struct {t.structSymbol.name} is not among the exported symbols")
+        return TYPE_BASES.index(t.typeBase), t.nElements, struct_indexes[t.structSymbol] if t.structSymbol else -1
+
+    symbol_records = []
+    field_records = []
+    for sym in symbols:
+        first = len(field_records)
+        if sym.cls == CLS_STRUCT:
+            offsets = layouts.struct(sym).offsets
+            for member in sym.members:
+                field_records.append(FIELD.pack(*string(member.name), *type_fields(member.type), offsets[member.name]))
+        elif sym.cls in (CLS_FUNC, CLS_EXTFUNC):
+            for arg in sym.args:
+                field_records.append(FIELD.pack(*string(arg.name), *type_fields(arg.type), 0))
+        symbol_records.append(SYMBOL.pack(*string(sym.name), CLASSES.index(sym.cls), MEMS.index(sym.mem),
+                                          *type_fields(sym.type), first, len(field_records) - first))
+    struct_records = [STRUCT.pack(symbol_indexes[sym], layouts.struct(sym).size, layouts.struct(sym).align)
+                      for sym in structs]
+
+    symbols_offset = HEADER.size
+    structs_offset = symbols_offset + SYMBOL.size * len(symbol_records)
+    fields_offset = structs_offset + STRUCT.size * len(struct_records)
+    strings_offset = fields_offset + FIELD.size * len(field_records)
+    header = HEADER.pack(MAGIC, VERSION, 0, len(symbol_records), len(struct_records), len(field_records),
+                         symbols_offset, structs_offset, fields_offset, strings_offset)
+    return b"".join([header, *symbol_records, *struct_records, *field_records, bytes(strings)])
+
+
+def write_interface(path, symbols):
+    with open(path, "wb") as file:
+        file.write(encode(symbols))
+
+
+# ---------- Reading ----------
+
+class InterfaceFile:
+    """
+    Lazily decoded view of an interface file's bytes (a mapped file, or any buffer). Symbols
+    are built on first use and kept, so every lookup of a name returns the same Symbol.
+    """
+
+    def __init__(self, data, name="<interface>"):
+        self.data = data
+        self.name = name
+        if len(data) < HEADER.size:
+            raise ValueError(f"{name}: not an AtomC interface file")
+        (magic, version, _, self.symbol_count, self.struct_count, self.field_count,
+         self.symbols_offset, self.structs_offset, self.fields_offset, self.strings_offset) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{name}: not an AtomC interface file of version {VERSION}")
+        self._symbols = {}  # Record index -> decoded Symbol
+        self._digest = None
+
+    @classmethod
+    def open(cls, path):
+        """Maps the file at path read-only; nothing is decoded yet. Use in a with to unmap it"""
+        with open(path, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(data, path)
+        except ValueError:
+            data.close()
+            raise
+
+    def close(self):
+        """Unmaps a mapped file; the Symbols decoded so far stay usable"""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def digest(self):
+        """Hash of the file content, to key results that depend on it"""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+        return self._digest
+
+    def __len__(self):
+        return self.symbol_count
+
+    def _string(self, offset, length):
+        start = self.strings_offset + offset
+        return bytes(self.data[start:start + length]).decode()
+
+    def _name_bytes(self, index):
+        offset, length = struct.unpack_from("<IH", self.data, self.symbols_offset + index * SYMBOL.size)
+        start = self.strings_offset + offset
+        return self.data[start:start + length]
+
+    def index(self, name):
+        """Record index of the symbol called name, or None"""
+        key = name.encode()
+        low, high = 0, self.symbol_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._name_bytes(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.symbol_count and self._name_bytes(low) == key else None
+
+    def find(self, name):
+        """The global symbol called name, or None"""
+        index = self.index(name)
+        return self.symbol(index) if index is not None else None
+
+    def symbols(self):
+        """Every symbol, in name order"""
+        return [self.symbol(index) for index in range(self.symbol_count)]
+
+    def symbol(self, index):
+        sym = self._symbols.get(index)
+        if sym is not None:
+            return sym
+        (name_offset, name_length, cls, mem, base, n_elements, struct_index, first,
+         count) = SYMBOL.unpack_from(self.data, self.symbols_offset + index * SYMBOL.size)
+        cls = CLASSES[cls]
+        sym = Symbol(self._string(name_offset, name_length), cls, None, MEMS[mem], 0)
+        self._symbols[index] = sym  # Before decoding the type, which may refer back to this struct
+        if cls == CLS_STRUCT:
+            sym.type = Type(TB_STRUCT, -1, sym)
+            sym.members = SymbolTable()
+            for name, t, _ in self._fields(first, count):
+                sym.members.add(Symbol(name, CLS_VAR, t, None, 1))
+        else:
+            sym.type = self._type(base, n_elements, struct_index)
+            if cls in (CLS_FUNC, CLS_EXTFUNC):
+                sym.args = [Symbol(name, CLS_VAR, t, MEM_ARG, 1) for name, t, _ in self._fields(first, count)]
+        return sym
+
+    def _type(self, base, n_elements, struct_index):
+        struct_symbol = self.struct_symbol(struct_index) if struct_index >= 0 else None
+        return Type(TYPE_BASES[base], n_elements, struct_symbol)
+
+    def _fields(self, first, count):
+        """(name, type, offset) of count field records"""
+        fields = []
+        for index in range(first, first + count):
+            name_offset, name_length, base, n_elements, struct_index, offset = \
+                FIELD.unpack_from(self.data, self.fields_offset + index * FIELD.size)
+            fields.append((self._string(name_offset, name_length), self._type(base, n_elements, struct_index), offset))
+        return fields
+
+    def struct_symbol(self, struct_index):
+        symbol_index = STRUCT.unpack_from(self.data, self.structs_offset + struct_index * STRUCT.size)[0]
+        return self.symbol(symbol_index)
+
+    def struct_layout(self, name):
+        """The StructLayout stored for struct name, or None"""
+        index = self.index(name)
+        if index is None:
+            return None
+        _, _, cls, _, _, _, struct_index, first, count = \
+            SYMBOL.unpack_from(self.data, self.symbols_offset + index * SYMBOL.size)
+        if CLASSES[cls] != CLS_STRUCT:
+            return None
+        _, size, align = STRUCT.unpack_from(self.data, self.structs_offset + struct_index * STRUCT.size)
+        layout = StructLayout(name)
+        layout.size = size
+        layout.align = align
+        layout.offsets = {member: offset for member, _, offset in self._fields(first, count)}
+        return layout
+
+
+_builtins = None
+
+
+def builtins():
+    """Interface of the predefined functions, encoded once per process"""
+    global _builtins
+    if _builtins is None:
+        parser = Parser([])
+        parser.addExtFuncs()
+        _builtins = InterfaceFile(encode(exported_symbols(parser.symbols, builtins=True)), "<builtins>")
+    return _builtins
+
+
+def load_imports(paths):
+    """
+    Parser imports for the interface files at paths, the predefined functions first. They stay
+    mapped while in use; if one file cannot be opened, those already mapped are closed.
+    """
+    imports = [builtins()]
+    try:
+        for path in paths:
+            imports.append(InterfaceFile.open(path))
+    except (OSError, ValueError):
+        for interface in imports:
+            interface.close()
+        raise
+    return imports
+
+
+# ---------- Command line ----------
+
+def format_type(t):
+    text = t.typeBase if t.typeBase != TB_STRUCT else f"struct {t.structSymbol.name}"
+    return text + (f"[{t.nElements}]" if t.nElements > 0 else "[]" if t.nElements == 0 else "")
+
+
+def dump(interface, out=sys.stdout):
+    for sym in interface.symbols():
+        if sym.cls == CLS_STRUCT:
+            layout = interface.struct_layout(sym.name)
+            print(f"struct {sym.name}  size {layout.size}, align {layout.align}", file=out)
+            for member in sym.members:
+                print(f"  {layout.offsets[member.name]:6} {format_type(member.type)} {member.name}", file=out)
+        elif sym.cls in (CLS_FUNC, CLS_EXTFUNC):
+            args = ", ".join(f"{format_type(arg.type)} {arg.name}" for arg in sym.args)
+            print(f"{sym.cls:7} {format_type(sym.type)} {sym.name}({args})", file=out)
+        else:
+            print(f"{sym.cls:7} {format_type(sym.type)} {sym.name}", file=out)
+
+
+def main(argv=None):
+    from lexical_analyzer import tokenize
+
+    arg_parser = argparse.ArgumentParser(description="Write or inspect AtomC interface files")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    write_parser = commands.add_parser("write", help="write the interface of a unit")
+    write_parser.add_argument("path", help="AtomC source file")
+    write_parser.add_argument("-o", "--output", default=None, help=f"interface file (default: source with {SUFFIX})")
+    dump_parser = commands.add_parser("dump", help="print the declarations of an interface file")
+    dump_parser.add_argument("path")
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "dump":
+        with InterfaceFile.open(args.path) as interface:
+            dump(interface)
+        return 0
+    with open(args.path, 'r') as file:
+        code = file.read()
+    parser = Parser(tokenize(code))
+    try:
+        parser.parse_unit()
+    except SyntaxError as e:
+        print(e, file=sys.stderr)
+        return 1
+    output = args.output or (args.path[:-2] if args.path.endswith(".c") else args.path) + SUFFIX
+    write_interface(output, exported_symbols(parser.symbols))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,792 @@
+"""
+Mid-level IR of AtomC functions: basic blocks of three-address instructions linked into a
+control-flow graph, lowered from the checked AST (Parser(tokens, build_ast=True)), and SSA
+construction for the arguments, locals and temporaries of each function.
+
+Usage: python ir.py FILE.c [--no-ssa]
+
+Values are Temps (virtual registers: one per argument or local, plus the temporaries of
+expressions) and Constants. Globals and memory stay out of SSA form: scalar globals are
+read and written by getg/setg, arrays and structs through addresses with load/store, in the
+memory model of codegen. Each Instr has an op, a dst Temp (or None), operand args and an
+op-specific attr:
+
+    copy      dst = args[0]
+    binary    dst = args[0] OP args[1]              attr: + - * / < <= > >= == !=
+              int arithmetic wraps to 32 bits; on chars it is done on ints, masked by convert
+    unary     dst = OP args[0]                      attr: - or !
+    convert   dst = args[0] converted to dst.type
+    getg      dst = global                          attr: its Symbol
+    setg      global = args[0]                      attr: its Symbol
+    addr      dst = address of a global array or struct   attr: its Symbol
+    alloca    dst = address of storage of its own in the frame, zeroed when the call starts
+              attr: its Type
+    load      dst = memory[base + index * size]  or  memory[base + offset]
+              args: base, index or None             attr: offset
+    store     memory[base + index * size]  or  memory[base + offset] = args[2]
+              args: base, index or None, value      attr: (Type, offset)
+    memcpy    copies attr bytes from address args[1] to address args[0]
+    zero      clears attr bytes at address args[0]
+    call      dst = function(*args)                 attr: Symbol; dst is None for void
+    phi       dst = args[i] when control came from the block attr[i]
+    jump      attr: [target]
+    branch    args: [cond]                          attr: [target if true, target if false]
+    ret       args: [value] or []
+
+size is the size of the loaded or stored type, as for the VM's LDI/STI. Like codegen,
+locals start at zero, struct arguments are copied by the callee and struct results by the
+caller, and falling off the end of a function returns zero.
+"""
+import argparse
+import math
+import sys
+
+from ast_nodes import Assign, Binary, Block as BlockNode, Break, Call, Cast, Const, ExprStm, For, FuncDecl, If, Index, \
+    Member, Return, Unary, Var, VarDecl, While
+from codegen import char_arithmetic, is_aggregate, is_struct_value, zero_value
+from layout import layout_unit
+from lexical_analyzer import tokenize
+from syntactic_analyzer import MEM_GLOBAL, TB_DOUBLE, TB_INT, TB_VOID, Parser, createType
+
+TERMINATORS = {"jump", "branch", "ret"}
+SIDE_EFFECTS = {"setg", "store", "memcpy", "zero", "call"}  # Ops whose effect is not only their dst
+PURE_OPS = {"copy", "binary", "unary", "convert", "getg", "addr", "alloca", "phi"}  # Ops that only compute their dst
+INT = createType(TB_INT)
+
+
+class Temp:
+    __slots__ = ("name", "type", "symbol", "version")
+
+    def __init__(self, name, type_, symbol=None, version=None):
+        self.name = name
+        self.type = type_  # Type of the value; an array or struct type for an address
+        self.symbol = symbol  # Argument or local it holds, None for a temporary
+        self.version = version  # SSA version, None before SSA construction
+
+    def __repr__(self):
+        return self.name if self.version is None else f"{self.name}.{self.version}"
+
+
+class Constant:
+    __slots__ = ("value", "type")
+
+    def __init__(self, value, type_):
+        self.value = value  # int, float, or str for the address of a string constant
+        self.type = type_
+
+    def __repr__(self):
+        return f'"{self.value}"' if isinstance(self.value, str) else repr(self.value)
+
+
+class Instr:
+    __slots__ = ("op", "dst", "args", "attr", "line")
+
+    def __init__(self, op, dst=None, args=(), attr=None, line=0):
+        self.op = op
+        self.dst = dst
+        self.args = list(args)
+        self.attr = attr
+        self.line = line
+
+    def uses(self):
+        """Temps read by the instruction"""
+        return [arg for arg in self.args if isinstance(arg, Temp)]
+
+    def __repr__(self):
+        return format_instr(self)
+
+
+class Block:
+    __slots__ = ("label", "instrs", "preds", "succs")
+
+    def __init__(self, label):
+        self.label = label
+        self.instrs = []
+        self.preds = []  # Predecessor blocks, in the order of phi operands
+        self.succs = []
+
+    @property
+    def terminator(self):
+        return self.instrs[-1] if self.instrs and self.instrs[-1].op in TERMINATORS else None
+
+    def phis(self):
+        return [instr for instr in self.instrs if instr.op == "phi"]
+
+    def __repr__(self):
+        return self.label
+
+
+class Function:
+    def __init__(self, symbol):
+        self.name = symbol.name
+        self.symbol = symbol
+        self.params = []  # Temp of each argument
+        self.blocks = []  # Entry block first
+        self.ssa = False
+        self.temp_count = 0
+        self.block_count = 0
+
+    @property
+    def entry(self):
+        return self.blocks[0]
+
+    def new_block(self):
+        block = Block(f"b{self.block_count}")
+        self.block_count += 1
+        self.blocks.append(block)
+        return block
+
+    def temp(self, type_):
+        temp = Temp(f"t{self.temp_count}", type_)
+        self.temp_count += 1
+        return temp
+
+    def instructions(self):
+        for block in self.blocks:
+            yield from block.instrs
+
+    def link(self):
+        """
+        Rebuilds the edges from the terminators, drops the blocks the entry cannot reach and
+        orders and numbers the others in reverse postorder
+        """
+        self.blocks = reverse_postorder(self)
+        for index, block in enumerate(self.blocks):
+            block.label = f"b{index}"
+            block.succs = list(successors(block))
+        self.block_count = len(self.blocks)
+        for block in self.blocks:
+            block.preds = []
+        for block in self.blocks:
+            for succ in block.succs:
+                succ.preds.append(block)
+
+
+class Module:
+    def __init__(self, unit):
+        self.unit = unit
+        self.functions = {}  # Name -> Function, in source order
+        self.layouts = layout_unit(unit)
+
+
+def is_pure(instr):
+    """
+    True when instr only computes its dst and cannot fail, so it may be dropped when the dst
+    is unused or run where it would not have run
+    """
+    if instr.op not in PURE_OPS:
+        return False
+    if instr.op == "binary" and instr.attr == "/":
+        divisor = instr.args[1]
+        return isinstance(divisor, Constant) and divisor.value != 0  # Otherwise it may divide by zero
+    if instr.op == "convert" and instr.args[0].type.typeBase == TB_DOUBLE and instr.dst.type.typeBase != TB_DOUBLE:
+        source = instr.args[0]
+        return isinstance(source, Constant) and math.isfinite(source.value)  # int() of inf or NaN fails
+    return True
+
+
+def replace_uses(function, values):
+    """Replaces every operand found in values by its value there; True if any was"""
+    def resolve(arg):
+        while isinstance(arg, Temp) and arg in values:
+            arg = values[arg]
+        return arg
+
+    replaced = False
+    for instr in function.instructions():
+        if any(arg in values for arg in instr.uses()):
+            instr.args = [resolve(arg) for arg in instr.args]
+            replaced = True
+    return replaced
+
+
+# ---------- Lowering ----------
+
+class Builder:
+    """Lowers the FuncDecls of a unit to Functions"""
+
+    def __init__(self, module):
+        self.module = module
+        self.layouts = module.layouts
+        self.function = None
+        self.decl = None
+        self.block = None  # Block receiving instructions; None after a jump, branch or ret
+        self.variables = {}  # Argument or local Symbol -> its Temp
+        self.break_targets = []
+        self.line = 0
+
+    def emit(self, op, dst=None, args=(), attr=None):
+        if self.block is None:
+            self.block = self.function.new_block()  # Unreachable code, dropped by link()
+        instr = Instr(op, dst, args, attr, self.line)
+        self.block.instrs.append(instr)
+        if op in TERMINATORS:
+            self.block = None
+        return instr
+
+    def jump(self, target):
+        self.emit("jump", attr=[target])
+
+    def close(self, target):
+        """Ends the current block with a jump to target, unless it has already ended"""
+        if self.block is not None:
+            self.jump(target)
+
+    def start(self, block):
+        """Continues in block, falling through from the current block"""
+        self.close(block)
+        self.block = block
+
+    def function_decl(self, decl):
+        function = self.function = Function(decl.symbol)
+        self.decl = decl
+        self.line = decl.line
+        self.variables = {}
+        self.block = function.new_block()
+        for sym in decl.symbol.args:
+            temp = self.variables[sym] = Temp(sym.name, sym.type, sym)
+            function.params.append(temp)
+        # Struct arguments arrive as the address of the caller's value and are copied into the frame
+        for sym in decl.symbol.args:
+            if is_struct_value(sym.type):
+                copy = function.temp(sym.type)
+                self.emit("alloca", copy, attr=sym.type)
+                self.emit("memcpy", args=[copy, self.variables[sym]], attr=self.layouts.sizeof(sym.type))
+                self.emit("copy", self.variables[sym], [copy])
+        for sym in decl.locals:
+            temp = self.variables[sym] = Temp(sym.name, sym.type, sym)
+            if is_aggregate(sym.type):
+                self.emit("alloca", temp, attr=sym.type)
+            else:
+                self.emit("copy", temp, [Constant(zero_value(sym.type), sym.type)])
+        self.stm(decl.body)
+        if self.block is not None:
+            self.line = decl.line
+            t = decl.symbol.type
+            self.emit("ret", args=[] if t.typeBase == TB_VOID else [Constant(zero_value(t), t)])
+        function.link()
+        return function
+
+    # ---------- Statements ----------
+
+    def stm(self, node):
+        self.line = node.line
+        if isinstance(node, BlockNode):
+            for item in node.items:
+                if not isinstance(item, VarDecl):
+                    self.stm(item)
+        elif isinstance(node, ExprStm):
+            self.expr(node.expr)
+        elif isinstance(node, If):
+            then, end = self.function.new_block(), self.function.new_block()
+            orelse = self.function.new_block() if node.orelse is not None else end
+            self.cond(node.cond, then, orelse)
+            self.block = then
+            self.stm(node.then)
+            self.close(end)
+            if node.orelse is not None:
+                self.block = orelse
+                self.stm(node.orelse)
+                self.close(end)
+            self.block = end
+        elif isinstance(node, While):
+            self.loop(None, node.cond, None, node.body)
+        elif isinstance(node, For):
+            self.loop(node.init, node.cond, node.step, node.body)
+        elif isinstance(node, Break):
+            self.jump(self.break_targets[-1])
+        elif isinstance(node, Return):
+            t = self.decl.symbol.type
+            if node.value is not None:
+                self.emit("ret", args=[self.converted(node.value, t)])
+            else:  # Like falling off the end, return; in a non-void function returns zero
+                self.emit("ret", args=[] if t.typeBase == TB_VOID else [Constant(zero_value(t), t)])
+
+    def loop(self, init, cond, step, body):
+        """
+        Loops are rotated, as in codegen: the condition is tested before the first iteration,
+        then by latch, after the step, which goes back to first, the header of the loop
+        """
+        if init is not None:
+            self.expr(init)
+        first, latch, end = (self.function.new_block() for _ in range(3))
+        self.test(cond, first, end)
+        self.block = first
+        self.break_targets.append(end)
+        self.stm(body)
+        self.break_targets.pop()
+        self.start(latch)
+        if step is not None:
+            self.line = step.line
+            self.expr(step)
+        self.test(cond, first, end)
+        self.block = end
+
+    def test(self, cond, first, end):
+        """Goes on with the loop at first while cond, a loop condition or None for none, holds"""
+        if cond is not None:
+            self.line = cond.line
+            self.cond(cond, first, end)
+        else:
+            self.jump(first)
+
+    def cond(self, node, true, false):
+        """Branches to true or false on the truth value of node"""
+        if isinstance(node, Binary) and node.op in ("&&", "||"):
+            middle = self.function.new_block()
+            if node.op == "&&":
+                self.cond(node.left, middle, false)
+            else:
+                self.cond(node.left, true, middle)
+            self.block = middle
+            self.cond(node.right, true, false)
+        elif isinstance(node, Unary) and node.op == "!":
+            self.cond(node.operand, false, true)
+        else:
+            self.emit("branch", args=[self.expr(node)], attr=[true, false])
+
+    # ---------- Expressions ----------
+
+    def expr(self, node):
+        """Lowers node and returns the Temp or Constant of its value"""
+        self.line = node.line
+        function = self.function
+        if isinstance(node, Const):
+            return Constant(node.value, node.type)
+
+        if isinstance(node, Var):
+            sym = node.symbol
+            if sym.mem != MEM_GLOBAL:
+                return self.variables[sym]
+            dst = function.temp(sym.type)
+            self.emit("addr" if is_aggregate(sym.type) else "getg", dst, attr=sym)
+            return dst
+
+        if isinstance(node, Binary):
+            if node.op in ("&&", "||"):
+                dst = function.temp(INT)
+                true, false, end = function.new_block(), function.new_block(), function.new_block()
+                self.cond(node, true, false)
+                for block, value in ((true, 1), (false, 0)):
+                    self.block = block
+                    self.emit("copy", dst, [Constant(value, INT)])
+                    self.jump(end)
+                self.block = end
+                return dst
+            left = self.expr(node.left)
+            right = self.expr(node.right)
+            dst = function.temp(node.type)
+            self.emit("binary", dst, [left, right], node.op)
+            return dst
+
+        if isinstance(node, Unary):
+            operand = self.expr(node.operand)
+            dst = function.temp(node.type)
+            self.emit("unary", dst, [operand], node.op)
+            return dst
+
+        if isinstance(node, Cast):
+            return self.converted(node.operand, node.type)
+
+        if isinstance(node, Index) and not is_aggregate(node.type) and not isinstance(node.index, Const):
+            base = self.base_address(node.base)
+            index = self.expr(node.index)
+            dst = function.temp(node.type)
+            self.emit("load", dst, [base, index], 0)
+            return dst
+
+        if isinstance(node, (Index, Member)):
+            base, offset = self.address(node)
+            if not is_aggregate(node.type):
+                dst = function.temp(node.type)
+                self.emit("load", dst, [base, None], offset)
+                return dst
+            return self.offset_address(base, offset, node.type)
+
+        if isinstance(node, Call):
+            return self.call(node)
+
+        if isinstance(node, Assign):
+            return self.assign(node)
+
+        raise SyntaxError(f"Line {node.line}: cannot lower {type(node).__name__}")
+
+    def converted(self, node, t):
+        """Lowers node and converts its value to type t"""
+        value = self.expr(node)
+        if is_aggregate(t) or t.typeBase == TB_VOID or t.typeBase == node.type.typeBase and not char_arithmetic(node):
+            return value
+        if t.typeBase == TB_INT and node.type.typeBase != TB_DOUBLE:
+            return value  # char -> int needs no conversion
+        dst = self.function.temp(t)
+        self.emit("convert", dst, [value])
+        return dst
+
+    def offset_address(self, base, offset, t):
+        if not offset:
+            return base
+        dst = self.function.temp(t)
+        self.emit("binary", dst, [base, Constant(offset, INT)], "+")
+        return dst
+
+    def address(self, node):
+        """(value, offset): node, an array or struct or a part of one, is at the address value + offset"""
+        if isinstance(node, Member):
+            base, offset = self.address(node.base)
+            return base, offset + self.layouts.offset(node)
+        if isinstance(node, Index):
+            base, offset = self.address(node.base)
+            size = self.layouts.element_size(node.type)
+            if isinstance(node.index, Const):
+                return base, offset + node.index.value * size
+            index = self.expr(node.index)
+            if size != 1:
+                scaled = self.function.temp(INT)
+                self.emit("binary", scaled, [index, Constant(size, INT)], "*")
+                index = scaled
+            element = self.function.temp(node.type)
+            self.emit("binary", element, [base, index], "+")
+            return element, offset
+        return self.expr(node), 0
+
+    def base_address(self, node):
+        base, offset = self.address(node)
+        return self.offset_address(base, offset, node.type)
+
+    def call(self, node, copy=True):
+        """Unless copy is False, a returned struct is copied to this frame before anything else runs"""
+        args = [self.converted(arg, param.type) for arg, param in zip(node.args, node.symbol.args)]
+        self.line = node.line
+        dst = self.function.temp(node.type) if node.type.typeBase != TB_VOID else None
+        self.emit("call", dst, args, node.symbol)
+        if copy and is_struct_value(node.type):
+            result = self.function.temp(node.type)
+            self.emit("alloca", result, attr=node.type)
+            self.emit("memcpy", args=[result, dst], attr=self.layouts.sizeof(node.type))
+            return result
+        return dst
+
+    def assign(self, node):
+        target = node.target
+        t = target.type
+
+        if is_struct_value(t):
+            address = self.base_address(target)
+            value = self.call(node.value, copy=False) if isinstance(node.value, Call) else self.expr(node.value)
+            self.line = node.line
+            self.emit("memcpy", args=[address, value], attr=self.layouts.sizeof(t))
+            return address
+
+        if isinstance(target, Var) and target.symbol.mem != MEM_GLOBAL:
+            value = self.converted(node.value, t)
+            self.line = node.line
+            self.emit("copy", self.variables[target.symbol], [value])
+            return value
+
+        if isinstance(target, Var):
+            value = self.converted(node.value, t)
+            self.line = node.line
+            self.emit("setg", args=[value], attr=target.symbol)
+            return value
+
+        if isinstance(target, Index) and not isinstance(target.index, Const):
+            base = self.base_address(target.base)
+            index = self.expr(target.index)
+            offset = 0
+        else:
+            (base, offset), index = self.address(target), None
+        value = self.converted(node.value, t)
+        self.line = node.line
+        self.emit("store", args=[base, index, value], attr=(t, offset))
+        return value
+
+
+def lower_unit(unit, ssa=True):
+    """Module with the IR of every function of a Unit AST, in SSA form unless ssa is False"""
+    module = Module(unit)
+    builder = Builder(module)
+    for decl in unit.decls:
+        if isinstance(decl, FuncDecl):
+            function = builder.function_decl(decl)
+            if ssa:
+                to_ssa(function)
+            module.functions[function.name] = function
+    return module
+
+
+# ---------- Control flow ----------
+
+def reverse_postorder(function):
+    """
+    Blocks reachable from the entry, each before its successors except along back edges.
+    Successors are visited last to first, so a block is followed by its first successor
+    when possible: the then-branch of an if, the body of a loop.
+    """
+    order = []
+    visited = {function.entry}
+    stack = [(function.entry, reversed(successors(function.entry)))]
+    while stack:
+        block, succs = stack[-1]
+        for succ in succs:
+            if succ not in visited:
+                visited.add(succ)
+                stack.append((succ, reversed(successors(succ))))
+                break
+        else:
+            stack.pop()
+            order.append(block)
+    order.reverse()
+    return order
+
+
+def successors(block):
+    terminator = block.terminator
+    return terminator.attr if terminator is not None and terminator.op != "ret" else []
+
+
+def dominators(function):
+    """Immediate dominator of each block (the entry's is itself), by Cooper, Harvey and Kennedy"""
+    order = reverse_postorder(function)
+    position = {block: index for index, block in enumerate(order)}
+    entry = function.entry
+    idom = {entry: entry}
+
+    def intersect(a, b):
+        while a is not b:
+            while position[a] > position[b]:
+                a = idom[a]
+            while position[b] > position[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for block in order[1:]:
+            new = None
+            for pred in block.preds:
+                if pred in idom:
+                    new = pred if new is None else intersect(pred, new)
+            if idom.get(block) is not new:
+                idom[block] = new
+                changed = True
+    return idom
+
+
+def dominator_tree(idom):
+    """Children of each block in the dominator tree"""
+    children = {block: [] for block in idom}
+    for block, parent in idom.items():
+        if block is not parent:
+            children[parent].append(block)
+    return children
+
+
+def dominates(idom, a, b):
+    """True when every path from the entry to b goes through a"""
+    while True:
+        if a is b:
+            return True
+        if idom[b] is b:
+            return False
+        b = idom[b]
+
+
+def natural_loops(function, idom):
+    """Header -> set of the blocks of its natural loop, the loops of all back edges to a header merged"""
+    loops = {}
+    for block in function.blocks:
+        for succ in block.succs:
+            if dominates(idom, succ, block):  # Back edge block -> succ
+                body = loops.setdefault(succ, {succ})
+                work = [block]
+                while work:
+                    member = work.pop()
+                    if member not in body:
+                        body.add(member)
+                        work.extend(member.preds)
+    return loops
+
+
+def dominance_frontiers(function, idom):
+    frontiers = {block: set() for block in function.blocks}
+    for block in function.blocks:
+        if len(block.preds) >= 2:
+            for pred in block.preds:
+                runner = pred
+                while runner is not idom[block]:
+                    frontiers[runner].add(block)
+                    runner = idom[runner]
+    return frontiers
+
+
+# ---------- SSA ----------
+
+def to_ssa(function):
+    """
+    Rewrites a linked function in semi-pruned SSA form: phis are placed on the iterated
+    dominance frontier of the definitions of every Temp that is read in some block before it
+    is written there, then every definition gets a new version along the dominator tree
+    """
+    idom = dominators(function)
+    frontiers = dominance_frontiers(function, idom)
+    entry = function.entry
+
+    definitions = {param: {entry} for param in function.params}
+    exposed = set()  # Temps read in a block before any write in that block
+    for block in function.blocks:
+        written = set()
+        for instr in block.instrs:
+            exposed.update(temp for temp in instr.uses() if temp not in written)
+            if instr.dst is not None:
+                written.add(instr.dst)
+                definitions.setdefault(instr.dst, set()).add(block)
+
+    phi_temps = {}  # phi Instr -> the Temp it merges
+    for temp, blocks in definitions.items():
+        if temp not in exposed:
+            continue
+        placed = set()
+        work = list(blocks)
+        while work:
+            for frontier in frontiers[work.pop()]:
+                if frontier not in placed:
+                    placed.add(frontier)
+                    line = frontier.instrs[0].line if frontier.instrs else 0
+                    phi = Instr("phi", temp, [temp] * len(frontier.preds), list(frontier.preds), line)
+                    frontier.instrs.insert(0, phi)
+                    phi_temps[phi] = temp
+                    if frontier not in blocks:
+                        work.append(frontier)
+
+    versions = {}
+    stacks = {}
+
+    def define(temp):
+        version = versions.get(temp, 0)
+        versions[temp] = version + 1
+        renamed = Temp(temp.name, temp.type, temp.symbol, version)
+        stacks.setdefault(temp, []).append(renamed)
+        return renamed
+
+    def current(value):
+        if isinstance(value, Temp) and value in stacks and stacks[value]:
+            return stacks[value][-1]
+        if isinstance(value, Temp) and value.version is None:
+            return Constant(zero_value(value.type), value.type)  # Read before any write on this path
+        return value
+
+    function.params = [define(param) for param in function.params]
+    children = dominator_tree(idom)
+    work = [(entry, None)]
+    while work:
+        block, pushed = work.pop()
+        if pushed is not None:  # Leaving the block's dominator subtree
+            for temp in pushed:
+                stacks[temp].pop()
+            continue
+        pushed = []
+        for instr in block.instrs:
+            if instr.op != "phi":
+                instr.args = [current(arg) for arg in instr.args]
+            if instr.dst is not None:
+                pushed.append(instr.dst)
+                instr.dst = define(instr.dst)
+        for succ in block.succs:
+            for phi in succ.phis():
+                for index, pred in enumerate(phi.attr):
+                    if pred is block:
+                        phi.args[index] = current(phi_temps[phi])
+        work.append((block, pushed))
+        work.extend((child, None) for child in reversed(children[block]))
+    function.ssa = True
+
+
+# ---------- Printing ----------
+
+def format_instr(instr):
+    dst = f"{instr.dst!r} = " if instr.dst is not None else ""
+    args = instr.args
+    op = instr.op
+    if op == "copy":
+        return f"{dst}{args[0]!r}"
+    if op == "binary":
+        return f"{dst}{args[0]!r} {instr.attr} {args[1]!r}"
+    if op == "unary":
+        return f"{dst}{instr.attr}{args[0]!r}"
+    if op == "convert":
+        return f"{dst}({instr.dst.type.typeBase}) {args[0]!r}"
+    if op in ("getg", "addr"):
+        return f"{dst}{op} {instr.attr.name}"
+    if op == "setg":
+        return f"setg {instr.attr.name}, {args[0]!r}"
+    if op == "alloca":
+        return f"{dst}alloca {format_type(instr.attr)}"
+    if op == "load":
+        return f"{dst}load {format_address(args[0], args[1], instr.attr)}"
+    if op == "store":
+        t, offset = instr.attr
+        return f"store.{t.typeBase} {format_address(args[0], args[1], offset)}, {args[2]!r}"
+    if op == "memcpy":
+        return f"memcpy {args[0]!r}, {args[1]!r}, {instr.attr}"
+    if op == "zero":
+        return f"zero {args[0]!r}, {instr.attr}"
+    if op == "call":
+        return f"{dst}call {instr.attr.name}({', '.join(repr(arg) for arg in args)})"
+    if op == "phi":
+        return f"{dst}phi " + ", ".join(f"[{pred.label}: {arg!r}]" for pred, arg in zip(instr.attr, args))
+    if op == "jump":
+        return f"jump {instr.attr[0].label}"
+    if op == "branch":
+        return f"branch {args[0]!r}, {instr.attr[0].label}, {instr.attr[1].label}"
+    if op == "ret":
+        return f"ret {args[0]!r}" if args else "ret"
+    return f"{dst}{op} {args!r} {instr.attr!r}"
+
+
+def format_type(t):
+    name = t.typeBase if t.structSymbol is None else f"struct {t.structSymbol.name}"
+    return name if t.nElements < 0 else f"{name}[{t.nElements}]"
+
+
+def format_address(base, index, offset):
+    if index is not None:
+        return f"[{base!r} + {index!r}]"
+    return f"[{base!r} + {offset}]" if offset else f"[{base!r}]"
+
+
+def format_function(function, notes=None):
+    """Text of a function; notes maps a block to comment lines printed under its label"""
+    params = ", ".join(f"{format_type(param.type)} {param!r}" for param in function.params)
+    lines = [f"function {function.name}({params}):"]
+    for block in function.blocks:
+        preds = f"  ; preds {', '.join(pred.label for pred in block.preds)}" if block.preds else ""
+        lines.append(f"  {block.label}:{preds}")
+        for note in (notes or {}).get(block, ()):
+            lines.append(f"    ; {note}")
+        for instr in block.instrs:
+            lines.append(f"    {format_instr(instr)}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Print the IR of an AtomC program")
+    arg_parser.add_argument("path", help="AtomC source file")
+    arg_parser.add_argument("--no-ssa", action="store_true", help="print the IR before SSA construction")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.path, 'r') as file:
+        code = file.read()
+    parser = Parser(tokenize(code), build_ast=True)
+    try:
+        parser.parse_unit()
+    except SyntaxError as e:
+        print(e, file=sys.stderr)
+        return 1
+    module = lower_unit(parser.unit, ssa=not args.no_ssa)
+    print("\n\n".join(format_function(function) for function in module.functions.values()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
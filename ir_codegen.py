@@ -0,0 +1,399 @@
+"""
+Compilation of the IR of ir.py to the bytecode of vm.VM, the last step of optimize.py.
+
+IRCodeGenerator reuses CodeGenerator for globals, static data, strings, frame slots and
+labels, and replaces the translation of function bodies:
+
+1. destruct_ssa() leaves SSA form: critical edges into blocks with phis are split, and the
+   phis become parallel copies at the end of each predecessor, sequenced so that cycles
+   (swaps) go through a temporary.
+2. allocate_registers() gives each Temp a register. Temps that interfere (one is live
+   where the other is defined) get different ones; copies are coalesced when their two
+   sides do not interfere, so most of them vanish, and so do the blocks split for them.
+   Arguments keep registers 0 to nargs-1.
+3. Blocks are laid out in reverse postorder. A branch falls through to the next block when
+   it can, a compare used only by the branch after it becomes one fused jump (JLT, JEQK...),
+   and a jump to a small block ending in a branch or a return gets a copy of that block
+   instead. An increment by one
+   followed by a < jump on the same register becomes INCJLT/INCJLTK.
+
+The zero instruction is a MEMCPY from a zeroed area of the static data.
+"""
+from codegen import (ADDK, ARITH_CONST_OPS, ARITH_OPS, CALL, CONST, DIVI, DOUBLE_ARITH_OPS, EXT, FRAME, GETG, INCJLT,
+                     INCJLTK, JLT, JLTK, JMP, JNZ, JUMP_CONST_OPS, JUMP_OPS, JZ, LOAD_FIELD_OPS, LOAD_OPS, MEMCPY, MOV, NEG,
+                     NEGATED, NEGF, NOT, REL_OPS, RET, RETV, SETG,
+                     STORE_FIELD_OPS, STORE_OPS, TOCHAR, TODOUBLE, TOINT, CodeGenerator, Label)
+from dataflow import liveness
+from ir import Constant, Instr, Temp
+from layout import MAX_ALIGN, align_up
+from syntactic_analyzer import CLS_EXTFUNC, TB_CHAR, TB_DOUBLE
+
+MIRRORED = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "==": "==", "!=": "!="}  # a OP b is b MIRRORED[OP] a
+DUPLICABLE_OPS = {"copy", "binary", "unary", "getg"}  # Ops a jump target may repeat when it is copied
+DUPLICATE_SIZE = 3  # Largest jump target copied in place of the jump
+INCREMENT_JUMPS = {JLT: INCJLT, JLTK: INCJLTK}
+
+
+# ---------- Out of SSA ----------
+
+def destruct_ssa(function):
+    """Replaces the phis of a linked SSA function by copies in the predecessors"""
+    for block in list(function.blocks):
+        terminator = block.terminator
+        if len(block.succs) < 2:
+            continue
+        for succ in set(block.succs):
+            if len(succ.preds) > 1 and succ.phis():
+                middle = function.new_block()
+                middle.instrs.append(Instr("jump", attr=[succ], line=terminator.line))
+                terminator.attr = [middle if target is succ else target for target in terminator.attr]
+                for phi in succ.phis():
+                    phi.attr = [middle if pred is block else pred for pred in phi.attr]
+    function.link()
+
+    for block in function.blocks:
+        phis = block.phis()
+        if not phis:
+            continue
+        for pred in dict.fromkeys(block.preds):
+            copies = [(phi.dst, phi.args[phi.attr.index(pred)]) for phi in phis]
+            pred.instrs[-1:-1] = sequence_copies(function, copies, pred.terminator.line)
+        block.instrs = [instr for instr in block.instrs if instr.op != "phi"]
+    function.ssa = False
+
+
+def sequence_copies(function, copies, line):
+    """Copy instructions with the effect of the parallel assignment copies, [(dst, source)]"""
+    pending = [(dst, source) for dst, source in copies if source is not dst]
+    instrs = []
+    while pending:
+        sources = {source for _, source in pending}
+        for index, (dst, source) in enumerate(pending):
+            if dst not in sources:  # Nothing still reads dst: assign it now
+                instrs.append(Instr("copy", dst, [source], line=line))
+                del pending[index]
+                break
+        else:
+            # Every dst is still read by another copy: a cycle, broken by saving one of them
+            dst = pending[0][0]
+            saved = function.temp(dst.type)
+            instrs.append(Instr("copy", saved, [dst], line=line))
+            pending = [(target, saved if source is dst else source) for target, source in pending]
+    return instrs
+
+
+# ---------- Registers ----------
+
+def allocate_registers(function):
+    """(Temp -> register, number of registers) for a function out of SSA form"""
+    live_in, live_out = liveness(function)
+    edges = {param: set() for param in function.params}
+
+    def interfere(a, b):
+        edges.setdefault(a, set()).add(b)
+        edges.setdefault(b, set()).add(a)
+
+    copies = []
+    for block in function.blocks:
+        live = set(live_out[block])
+        for instr in reversed(block.instrs):
+            if instr.dst is not None:
+                edges.setdefault(instr.dst, set())
+                source = None
+                if instr.op == "copy" and isinstance(instr.args[0], Temp):
+                    source = instr.args[0]
+                    copies.append((instr.dst, source))
+                for other in live:
+                    if other is not instr.dst and other is not source:
+                        interfere(instr.dst, other)
+                live.discard(instr.dst)
+            for temp in instr.uses():
+                edges.setdefault(temp, set())
+                live.add(temp)
+    for param in function.params:
+        for other in live_in[function.entry] | set(function.params):
+            if other is not param:
+                interfere(param, other)
+
+    # Coalescing: union-find classes of Temps that can share a register
+    parent = {temp: temp for temp in edges}
+    members = {temp: [temp] for temp in edges}
+    neighbors = {temp: set(adjacent) for temp, adjacent in edges.items()}
+    fixed = {param: index for index, param in enumerate(function.params)}
+
+    def find(temp):
+        while parent[temp] is not temp:
+            parent[temp] = parent[parent[temp]]
+            temp = parent[temp]
+        return temp
+
+    for dst, source in reversed(copies):  # Program order, roughly
+        a, b = find(dst), find(source)
+        if a is b or a in fixed and b in fixed or any(member in neighbors[a] for member in members[b]):
+            continue
+        if b in fixed:
+            a, b = b, a
+        parent[b] = a
+        members[a] += members.pop(b)
+        neighbors[a] |= neighbors.pop(b)
+
+    colors = dict(fixed)
+    order = list(function.params) + [temp for temp in edges if temp not in fixed]
+    for temp in order:
+        root = find(temp)
+        if root in colors:
+            continue
+        taken = {colors[find(other)] for other in neighbors[root] if find(other) in colors}
+        color = 0
+        while color in taken:
+            color += 1
+        colors[root] = color
+    registers = {temp: colors[find(temp)] for temp in edges}
+    count = max(registers.values(), default=-1) + 1
+    return registers, max(count, len(function.params))
+
+
+# ---------- Code generation ----------
+
+class IRCodeGenerator(CodeGenerator):
+    def __init__(self, module):
+        super().__init__(module.unit)
+        self.module = module
+        self.layouts = self.program.layouts = module.layouts
+        self.registers = {}  # Temp -> register of the current function
+        self.labels = {}  # Block -> Label
+        self.uses = {}  # Temp -> number of instructions reading it
+        self.scratch = 0  # Two registers for constant operands, then the arguments of calls
+        self.label_position = 0  # Position of the last label placed: no instruction before it may merge with one after
+        self.zero_address = 0  # Zeroed static storage that clears allocas
+        self.zero_size = 0
+
+    def function_decl(self, decl):
+        function = self.program.functions[decl.symbol.name]
+        ir_function = self.module.functions[decl.symbol.name]
+        self.function = decl
+        self.line = decl.line
+        self.frame_size = 0
+        if ir_function.ssa:
+            destruct_ssa(ir_function)
+        self.registers, count = allocate_registers(ir_function)
+        for block in ir_function.blocks:
+            # Coalesced copies move nothing: without them, blocks that only held phi copies only jump
+            block.instrs = [instr for instr in block.instrs if not self.coalesced(instr)]
+        self.scratch = count
+        self.uses = {}
+        for instr in ir_function.instructions():
+            for temp in instr.uses():
+                self.uses[temp] = self.uses.get(temp, 0) + 1
+        self.labels = {block: Label() for block in ir_function.blocks}
+        args_max = max((len(instr.args) for instr in ir_function.instructions() if instr.op == "call"), default=0)
+
+        function.entry = len(self.program.code)
+        # Blocks that only jump are never a target once jumps are resolved past them
+        blocks = [block for block in ir_function.blocks if block is ir_function.entry or self.resolve(block) is block]
+        for index, block in enumerate(blocks):
+            self.place(self.labels[block])
+            self.emit_block(block, blocks[index + 1] if index + 1 < len(blocks) else None)
+        function.end = len(self.program.code)
+        function.frame_size = align_up(self.frame_size, MAX_ALIGN)
+        function.frame_zero = bytes(function.frame_size)
+        function.frame = [0] * (count + 2 + args_max)
+
+    def emit_block(self, block, following):
+        """Code of block, which the block following is placed after"""
+        instrs = block.instrs[:-1]
+        terminator = block.instrs[-1]
+        fused = None
+        if terminator.op == "branch" and instrs:
+            last = instrs[-1]
+            if last.op == "binary" and last.attr in JUMP_OPS and last.dst is terminator.args[0] \
+                    and self.uses[last.dst] == 1 and last.args[0].type.nElements < 0:
+                fused = instrs.pop()
+        for instr in instrs:
+            self.instruction(instr)
+        self.line = terminator.line
+        if terminator.op == "jump":
+            target = self.resolve(terminator.attr[0])
+            if target is following:
+                return
+            if self.duplicable(target):
+                self.emit_block(target, following)
+            else:
+                self.emit(JMP, self.labels[target])
+        elif terminator.op == "branch":
+            true, false = (self.resolve(target) for target in terminator.attr)
+            if fused is not None:
+                operator, left, right = fused.attr, fused.args[0], fused.args[1]
+                if true is following:
+                    operator, true, false = NEGATED[operator], false, true
+                self.line = fused.line
+                self.jump_if(operator, left, right, self.labels[true])
+            else:
+                condition = self.operand(terminator.args[0], self.scratch)
+                if true is following:
+                    self.emit(JZ, condition, self.labels[false])
+                    return
+                self.emit(JNZ, condition, self.labels[true])
+            if false is not following:
+                self.emit(JMP, self.labels[false])
+        else:
+            self.instruction(terminator)
+
+    def coalesced(self, instr):
+        source = instr.args[0] if instr.op == "copy" else None
+        return isinstance(source, Temp) and self.registers[source] == self.registers[instr.dst]
+
+    def resolve(self, block):
+        """The block control really goes to after jumping to block, past blocks that only jump"""
+        seen = set()
+        while len(block.instrs) == 1 and block.instrs[0].op == "jump" and block not in seen:
+            seen.add(block)
+            block = block.instrs[0].attr[0]
+        return block
+
+    def duplicable(self, block):
+        instrs = block.instrs
+        return (len(instrs) <= DUPLICATE_SIZE and instrs[-1].op in ("branch", "ret")
+                and all(instr.op in DUPLICABLE_OPS and instr.attr != "/" for instr in instrs[:-1]))
+
+    def jump_if(self, operator, left, right, label):
+        if isinstance(left, Constant) and not isinstance(right, Constant):
+            operator, left, right = MIRRORED[operator], right, left
+        op = JUMP_OPS[operator]
+        if isinstance(right, Constant) and not isinstance(right.value, str):
+            op, right = JUMP_CONST_OPS[op], right.value
+        else:
+            right = self.operand(right, self.scratch + 1)
+        left = self.operand(left, self.scratch)
+        code = self.program.code
+        if op in INCREMENT_JUMPS and len(code) > self.label_position and code[-1] == [ADDK, left, left, 1]:
+            # i = i + 1 then i < limit: one increment-and-branch, as codegen closes counted loops
+            code[-1] = [INCREMENT_JUMPS[op], left, right, label]
+            return
+        self.emit(op, left, right, label)
+
+    def place(self, label):
+        super().place(label)
+        self.label_position = label.position
+
+    def operand(self, value, scratch):
+        """Register holding value; a constant is loaded into the scratch register first"""
+        if isinstance(value, Temp):
+            return self.registers[value]
+        self.emit(CONST, scratch, self.string(value.value) if isinstance(value.value, str) else value.value)
+        return scratch
+
+    def global_symbol_slot(self, instr):
+        slot = self.global_slots.get(instr.attr)
+        if slot is None:
+            raise SyntaxError(f"Line {instr.line}: {instr.attr.name} is imported, not defined in this unit")
+        return slot
+
+    def instruction(self, instr):
+        self.line = instr.line
+        op = instr.op
+        args = instr.args
+        dst = self.registers[instr.dst] if instr.dst is not None else self.scratch
+        first, second = self.scratch, self.scratch + 1
+
+        if op == "copy":
+            source = args[0]
+            if isinstance(source, Constant):
+                self.operand(source, dst)
+            elif self.registers[source] != dst:
+                self.emit(MOV, dst, self.registers[source])
+        elif op == "binary":
+            left, right = args
+            operator = instr.attr
+            double = instr.dst.type.typeBase == TB_DOUBLE
+            if operator in REL_OPS or operator == "/" or double:
+                if operator in REL_OPS:
+                    code = REL_OPS[operator]
+                else:
+                    code = DOUBLE_ARITH_OPS[operator] if double else DIVI
+                self.emit(code, dst, self.operand(left, first), self.operand(right, second))
+                return
+            if isinstance(left, Constant) and not isinstance(right, Constant) and operator != "-":
+                left, right = right, left
+            code = ARITH_OPS[operator]
+            if isinstance(right, Constant) and not isinstance(right.value, str):
+                self.emit(ARITH_CONST_OPS[code], dst, self.operand(left, first), right.value)
+            else:
+                self.emit(code, dst, self.operand(left, first), self.operand(right, second))
+        elif op == "unary":
+            if instr.attr == "!":
+                code = NOT
+            else:
+                code = NEGF if instr.dst.type.typeBase == TB_DOUBLE else NEG
+            self.emit(code, dst, self.operand(args[0], first))
+        elif op == "convert":
+            base = instr.dst.type.typeBase
+            code = TODOUBLE if base == TB_DOUBLE else TOCHAR if base == TB_CHAR else TOINT
+            self.emit(code, dst, self.operand(args[0], first))
+        elif op == "getg":
+            self.emit(GETG, dst, self.global_symbol_slot(instr))
+        elif op == "setg":
+            self.emit(SETG, self.global_symbol_slot(instr), self.operand(args[0], first))
+        elif op == "addr":
+            self.emit(CONST, dst, self.program.globals[self.global_symbol_slot(instr)])  # Static address
+        elif op == "alloca":
+            self.emit(FRAME, dst, self.stack_slot(instr.attr))
+        elif op == "zero":
+            self.emit(CONST, first, self.zeros(instr.attr))
+            self.emit(MEMCPY, self.operand(args[0], second), first, instr.attr)
+        elif op == "load":
+            base, index = args
+            t = instr.dst.type.typeBase
+            if index is None or isinstance(index, Constant):
+                offset = instr.attr if index is None else index.value * self.layouts.sizeof(instr.dst.type)
+                self.emit(LOAD_FIELD_OPS[t], dst, self.operand(base, first), offset)
+            else:
+                self.emit(LOAD_OPS[t], dst, self.operand(base, first), self.registers[index])
+        elif op == "store":
+            base, index, value = args
+            t, offset = instr.attr
+            if index is None or isinstance(index, Constant):
+                offset = offset if index is None else index.value * self.layouts.sizeof(t)
+                self.emit(STORE_FIELD_OPS[t.typeBase], self.operand(base, first), offset, self.operand(value, second))
+            else:
+                self.emit(STORE_OPS[t.typeBase], self.operand(base, first), self.registers[index],
+                          self.operand(value, second))
+        elif op == "memcpy":
+            self.emit(MEMCPY, self.operand(args[0], first), self.operand(args[1], second), instr.attr)
+        elif op == "call":
+            base = self.scratch + 2
+            for position, arg in enumerate(args):
+                if isinstance(arg, Constant):
+                    self.operand(arg, base + position)
+                else:
+                    self.emit(MOV, base + position, self.registers[arg])
+            self.line = instr.line
+            symbol = instr.attr
+            if symbol.cls == CLS_EXTFUNC:
+                self.emit(EXT, dst, (symbol.name, len(args)), base)
+            else:
+                function = self.program.functions.get(symbol.name)
+                if function is None:
+                    raise SyntaxError(f"Line {instr.line}: {symbol.name} is imported, not defined in this unit")
+                self.emit(CALL, dst, function, base)
+        elif op == "ret":
+            if args:
+                self.emit(RET, self.operand(args[0], first))
+            else:
+                self.emit(RETV)
+        else:
+            raise SyntaxError(f"Line {instr.line}: cannot generate code for the IR op {op}")
+
+    def zeros(self, size):
+        """Static address of size zero bytes"""
+        if size > self.zero_size:
+            data = self.program.data
+            self.zero_address = align_up(len(data), MAX_ALIGN)
+            data.extend(bytes(self.zero_address + size - len(data)))
+            self.zero_size = size
+        return self.zero_address
+
+
+def compile_module(module):
+    """Program for the functions of a Module; leaves them out of SSA form"""
+    return IRCodeGenerator(module).compile()
@@ -0,0 +1,637 @@
+"""
+Backend that translates a checked AtomC unit to Python source and runs it through compile(),
+so CPython's own eval loop executes the program instead of the vm.VM dispatch loop.
+
+Usage: python jit.py FILE.c [--source]
+
+Every AtomC function becomes a Python function and every scalar argument, local and global
+a Python variable (v_name, g_name), holding the same values as a VM register: Python ints
+for int and char, floats for double. Like the VM's, int arithmetic wraps to 32 bits, once
+at the root of each tree of + - * (wrapping distributes over them), and char arithmetic is
+done on ints and masked to 0..255 when converted to char. Arrays and structs use the VM's
+Memory and layout: globals and strings in the static data, locals in a frame that each call
+takes from the memory stack, so memory accesses, struct copies and the external functions
+behave exactly as under the VM. Counted
+loops `for(i=a; i<n; i=i+1)` whose body assigns neither i nor n become range() loops.
+
+Each generated line records the AtomC line it came from, so runtime errors report AtomC
+lines like the VM does.
+"""
+import argparse
+import math
+import sys
+
+from ast_nodes import Assign, Binary, Block, Break, Call, Cast, Const, ExprStm, For, FuncDecl, If, Index, Member, \
+    Return, Unary, Var, VarDecl, While, walk
+from codegen import char_arithmetic, is_aggregate, is_struct_value, zero_value
+from layout import MAX_ALIGN, align_up, layout_unit
+from lexical_analyzer import tokenize
+from syntactic_analyzer import CLS_EXTFUNC, MEM_GLOBAL, TB_CHAR, TB_DOUBLE, TB_INT, TB_VOID, Parser
+from vm import DEFAULT_STACK_SIZE, AtomCRuntimeError, Memory, Runtime, int_div, wrap_int
+
+FILENAME = "<atomc>"  # File name of the generated code, to find its frames in tracebacks
+RECURSION_LIMIT = 100000  # AtomC calls are Python calls; the memory stack still bounds frames with storage
+INDENT = "    "
+
+SHIFTS = {TB_INT: 2, TB_DOUBLE: 3, TB_CHAR: 0}  # log2 of the element size
+VIEWS = {TB_INT: "mi", TB_DOUBLE: "md", TB_CHAR: "mem"}
+STORE_HELPERS = {TB_INT: "store_int", TB_DOUBLE: "store_double", TB_CHAR: "store_char"}
+CONDITIONS = {"<", "<=", ">", ">=", "==", "!="}
+WRAPPING = {"+", "-", "*"}  # int operators whose result wrap() reduces to 32 bits
+
+
+class StackOverflow(AtomCRuntimeError):
+    """Raised by the prologue of a function whose frame does not fit the memory stack"""
+
+
+class PythonProgram:
+    def __init__(self):
+        self.source = ""
+        self.code = None  # source compiled by compile()
+        self.lines = []  # AtomC line of each line of source
+        self.functions = {}  # AtomC name -> Python name
+        self.externals = set()  # Names of the external functions called
+        self.data = bytearray()  # Static memory, as in codegen.Program
+        self.frame_max = 0  # Largest frame of a function, in bytes
+        self.layouts = None
+
+
+def pure(node):
+    """True when evaluating node has no side effect, so it may be reordered or repeated"""
+    return not any(isinstance(n, (Call, Assign)) for n in walk(node))
+
+
+def simple(text):
+    """True for a name or a number, which is cheaper to repeat than to keep in a temporary"""
+    return text.isidentifier() or text.isdigit()
+
+
+def plus(base, offset):
+    if not offset:
+        return base
+    if base.isdigit():
+        return str(int(base) + offset)
+    return f"({base} + {offset})"
+
+
+def wrap(value):
+    """Python expression of an int value reduced to 32 bits, like vm.wrap_int"""
+    return f"(({value} + 0x80000000 & 0xFFFFFFFF) - 0x80000000)"
+
+
+def shift(address, bits):
+    if not bits:
+        return address
+    if address.isdigit():
+        return str(int(address) >> bits)
+    return f"({address} >> {bits})"
+
+
+class PythonGenerator:
+    def __init__(self, unit):
+        self.unit = unit
+        self.program = PythonProgram()
+        self.layouts = self.program.layouts = layout_unit(unit)
+        self.out = []  # (text, AtomC line) of each generated line
+        self.indent = 0
+        self.line = 0
+        self.strings = {}  # Text of a string constant -> its address in the static data
+        self.global_names = {}  # Global Symbol -> Python name, or static address of an aggregate
+        self.names = {}  # Argument or local Symbol -> Python name, in the current function
+        self.function = None
+        self.frame_size = 0
+        self.temps = 0
+        self.returns = []  # Index in out of each return line of the current function
+
+    # ---------- Output ----------
+
+    def emit(self, text):
+        self.out.append((INDENT * self.indent + text, self.line))
+
+    def temp(self, text):
+        """Name of a new variable set to text, or text itself when it is simple"""
+        if simple(text):
+            return text
+        name = f"t{self.temps}"
+        self.temps += 1
+        self.emit(f"{name} = {text}")
+        return name
+
+    # ---------- Memory ----------
+
+    def static(self, t):
+        data = self.program.data
+        address = align_up(len(data), self.layouts.alignof(t))
+        data.extend(bytes(address + self.layouts.sizeof(t) - len(data)))
+        return address
+
+    def string(self, text):
+        address = self.strings.get(text)
+        if address is None:
+            address = self.strings[text] = len(self.program.data)
+            self.program.data.extend(bytes(ord(c) & 0xFF for c in text) + b"\0")
+        return address
+
+    def stack_slot(self, t):
+        offset = align_up(self.frame_size, self.layouts.alignof(t))
+        self.frame_size = offset + self.layouts.sizeof(t)
+        return offset
+
+    # ---------- Declarations ----------
+
+    def compile(self):
+        for decl in self.unit.decls:
+            if isinstance(decl, VarDecl):
+                sym = decl.symbol
+                self.line = decl.line
+                if is_aggregate(sym.type):
+                    self.global_names[sym] = str(self.static(sym.type))
+                else:
+                    self.global_names[sym] = f"g_{sym.name}"
+                    self.emit(f"g_{sym.name} = {zero_value(sym.type)!r}")
+        for decl in self.unit.decls:
+            if isinstance(decl, FuncDecl):
+                self.program.functions[decl.symbol.name] = f"f_{decl.symbol.name}"
+        for decl in self.unit.decls:
+            if isinstance(decl, FuncDecl):
+                self.function_decl(decl)
+
+        data = self.program.data
+        data.extend(bytes(align_up(len(data), MAX_ALIGN) - len(data)))
+        self.program.source = "".join(text + "\n" for text, _ in self.out)
+        self.program.lines = [line for _, line in self.out]
+        try:
+            self.program.code = compile(self.program.source, FILENAME, "exec")
+        except SyntaxError as e:  # Reported like the errors of the parser, at the AtomC line
+            raise SyntaxError(f"Line {self.program.lines[e.lineno - 1]}: {e.msg}") from None
+        return self.program
+
+    def function_decl(self, decl):
+        self.function = decl
+        self.line = decl.line
+        self.frame_size = 0
+        self.temps = 0
+        self.returns = []
+        self.names = {}
+        taken = set()
+        for sym in list(decl.symbol.args) + list(decl.locals):
+            name = f"v_{sym.name}"
+            while name in taken:  # A local of an inner block with the name of an outer one
+                name += "_"
+            taken.add(name)
+            self.names[sym] = name
+
+        # The body is generated first: the prologue needs the frame size it ends up with
+        outer = self.out
+        self.out = []
+        self.indent = 1
+        struct_args = [(sym, self.stack_slot(sym.type)) for sym in decl.symbol.args if is_struct_value(sym.type)]
+        aggregates = [(sym, self.stack_slot(sym.type)) for sym in decl.locals if is_aggregate(sym.type)]
+        self.stm(decl.body)
+        self.line = decl.line
+        if not (decl.body.items and isinstance(decl.body.items[-1], Return)):
+            if decl.symbol.type.typeBase != TB_VOID:
+                self.ret(repr(zero_value(decl.symbol.type)))  # Falling off the end returns 0
+            elif self.frame_size:
+                self.ret()
+        body = self.out
+        self.out = outer
+        frame_size = align_up(self.frame_size, MAX_ALIGN)
+        if frame_size:  # Each return gives the frame back
+            for index in self.returns:
+                text, line = body[index]
+                indent = text[:len(text) - len(text.lstrip())]
+                body[index] = (f"{indent}sp = fp; {text.lstrip()}", line)
+        self.program.frame_max = max(self.program.frame_max, frame_size)
+
+        args = ", ".join(self.names[sym] for sym in decl.symbol.args)
+        self.indent = 0
+        self.emit("")
+        self.emit(f"def {self.program.functions[decl.symbol.name]}({args}):")
+        self.indent = 1
+        written = sorted({self.global_names[node.target.symbol] for node in walk(decl.body)
+                          if isinstance(node, Assign) and isinstance(node.target, Var)
+                          and node.target.symbol.mem == MEM_GLOBAL and not is_aggregate(node.target.type)})
+        if frame_size:
+            written.insert(0, "sp")
+        if written:
+            self.emit(f"global {', '.join(written)}")
+        if frame_size:
+            self.emit("fp = sp")
+            self.emit(f"sp = fp + {frame_size}")
+            self.emit("if sp > limit:")
+            self.emit(f"{INDENT}raise StackOverflow('stack overflow')")
+            self.emit(f"view[fp:sp] = zeros[:{frame_size}]")
+        # Struct arguments arrive as the address of the caller's value and are copied into the frame
+        for sym, offset in struct_args:
+            name = self.names[sym]
+            size = self.layouts.sizeof(sym.type)
+            self.emit(f"view[fp + {offset}:fp + {offset + size}] = view[{name}:{name} + {size}]")
+            self.emit(f"{name} = fp + {offset}")
+        for sym in decl.locals:
+            if not is_aggregate(sym.type):
+                self.emit(f"{self.names[sym]} = {zero_value(sym.type)!r}")
+        for sym, offset in aggregates:
+            self.emit(f"{self.names[sym]} = {plus('fp', offset)}")
+        self.out.extend(body)
+
+    def ret(self, value=None):
+        self.returns.append(len(self.out))
+        self.emit("return" if value is None else f"return {value}")
+
+    # ---------- Statements ----------
+
+    def stm(self, node):
+        self.line = node.line
+        if isinstance(node, Block):
+            start = len(self.out)
+            for item in node.items:
+                if not isinstance(item, VarDecl):
+                    self.stm(item)
+            if len(self.out) == start:
+                self.emit("pass")
+        elif isinstance(node, ExprStm):
+            if isinstance(node.expr, Assign):
+                self.assign_stm(node.expr)
+            else:
+                self.emit(self.expr(node.expr))
+        elif isinstance(node, If) and isinstance(node.cond, Const) and not isinstance(node.cond.value, str):
+            branch = node.then if node.cond.value else node.orelse  # Folded condition: only one branch is live
+            if branch is not None:
+                self.stm(branch)
+        elif isinstance(node, If):
+            self.emit(f"if {self.cond(node.cond)}:")
+            self.block(node.then)
+            if node.orelse is not None:
+                self.line = node.orelse.line
+                self.emit("else:")
+                self.block(node.orelse)
+        elif isinstance(node, While):
+            self.emit(f"while {self.cond(node.cond)}:")
+            self.block(node.body)
+        elif isinstance(node, For):
+            self.for_stm(node)
+        elif isinstance(node, Break):
+            self.emit("break")
+        elif isinstance(node, Return):
+            if node.value is None and self.function.symbol.type.typeBase != TB_VOID:
+                self.ret(repr(zero_value(self.function.symbol.type)))  # Like falling off the end
+            elif node.value is None:
+                self.ret()
+            else:
+                value = self.converted(node.value, self.function.symbol.type)
+                if not pure(node.value):
+                    value = self.temp(value)  # Calls in the value still need the frame given back by the return
+                self.ret(value)
+
+    def block(self, node):
+        """node as an indented block"""
+        self.indent += 1
+        self.stm(node)
+        self.indent -= 1
+
+    def counter(self, node):
+        """(i, limit) of a `for(i=a; i<limit; i=i+1)` loop that can run over a range, or None"""
+        cond, step = node.cond, node.step
+        if not (isinstance(cond, Binary) and cond.op == "<" and isinstance(cond.left, Var)
+                and isinstance(step, Assign) and isinstance(step.target, Var)
+                and isinstance(step.value, Binary) and step.value.op == "+" and isinstance(step.value.left, Var)
+                and isinstance(step.value.right, Const) and step.value.right.value == 1):
+            return None
+        i = cond.left.symbol
+        if (i.mem == MEM_GLOBAL or i.type.typeBase != TB_INT or i.type.nElements >= 0
+                or step.target.symbol is not i or step.value.left.symbol is not i):
+            return None
+        limit = cond.right
+        if isinstance(limit, Var) and limit.symbol.mem != MEM_GLOBAL and limit.symbol is not i:
+            fixed = limit.type.typeBase in (TB_INT, TB_CHAR) and limit.type.nElements < 0
+        else:
+            fixed = isinstance(limit, Const) and isinstance(limit.value, int)
+        assigned = {n.target.symbol for n in walk(node.body) if isinstance(n, Assign) and isinstance(n.target, Var)}
+        if not fixed or i in assigned or getattr(limit, "symbol", None) in assigned:
+            return None
+        return self.names[i], self.expr(limit)
+
+    def for_stm(self, node):
+        if node.init is not None:
+            self.expr_stm(node.init)
+        counted = self.counter(node)
+        if counted is not None:
+            # After a complete run C leaves i at the limit, when the loop ran at all
+            i, limit = counted
+            self.line = node.line
+            self.emit(f"for {i} in range({i}, {limit}):")
+            self.block(node.body)
+            self.line = node.line
+            self.emit("else:")
+            self.emit(f"{INDENT}if {i} < {limit}:")
+            self.emit(f"{INDENT * 2}{i} = {limit}")
+            return
+        self.line = node.line
+        self.emit(f"while {self.cond(node.cond) if node.cond is not None else 'True'}:")
+        self.block(node.body)
+        if node.step is not None:
+            self.indent += 1
+            self.line = node.step.line
+            self.expr_stm(node.step)
+            self.indent -= 1
+
+    def expr_stm(self, node):
+        if isinstance(node, Assign):
+            self.assign_stm(node)
+        else:
+            self.emit(self.expr(node))
+
+    def assign_stm(self, node):
+        target = node.target
+        t = target.type
+        self.line = node.line
+
+        if is_struct_value(t):
+            dst = self.temp(self.address_expr(target))
+            src = self.temp(self.call(node.value, copy=False) if isinstance(node.value, Call) else self.expr(node.value))
+            size = self.layouts.sizeof(t)
+            self.emit(f"view[{dst}:{dst} + {size}] = view[{src}:{src} + {size}]")
+            return
+        if isinstance(target, Var):
+            self.emit(f"{self.variable(target)} = {self.converted(node.value, t)}")
+            return
+
+        key = self.store_key(target)
+        value = self.converted(node.value, t)
+        if not (pure(target) and pure(node.value)):
+            key = self.temp(key)  # The VM computes the address before the value
+            value = self.temp(value)
+        view = VIEWS[t.typeBase]
+        if t.typeBase == TB_INT:
+            self.emit("try:")
+            self.emit(f"{INDENT}{view}[{key}] = {value}")
+            self.emit("except ValueError:")
+            self.emit(f"{INDENT}{view}[{key}] = wrap_int({value})")
+        else:
+            self.emit(f"{view}[{key}] = {value}")
+
+    # ---------- Expressions ----------
+
+    def variable(self, node):
+        """Python name of the scalar variable of a Var node"""
+        sym = node.symbol
+        if sym.mem != MEM_GLOBAL:
+            return self.names[sym]
+        name = self.global_names.get(sym)
+        if name is None:
+            raise SyntaxError(f"Line {node.line}: {sym.name} is imported, not defined in this unit")
+        return name
+
+    def expr(self, node):
+        """Python expression with the value of node"""
+        if isinstance(node, Const):
+            if isinstance(node.value, str):
+                return str(self.string(node.value))
+            if isinstance(node.value, float) and not math.isfinite(node.value):
+                return f"float('{node.value!r}')"
+            return repr(node.value)
+        if isinstance(node, Var):
+            return self.variable(node)
+        if self.wraps(node):
+            return wrap(self.unwrapped(node))
+        if isinstance(node, Binary):
+            if node.op in ("&&", "||") or node.op in CONDITIONS:
+                return f"(1 if {self.cond(node)} else 0)"
+            left, right = self.expr(node.left), self.expr(node.right)
+            if node.op == "/" and node.type.typeBase == TB_DOUBLE:
+                return f"({left} / {right})"
+            if node.op == "/":
+                return f"wrap_int(int_div({left}, {right}))"  # INT_MIN / -1
+            return f"({left} {node.op} {right})"
+        if isinstance(node, Unary):
+            operand = self.expr(node.operand)
+            return f"(-{operand})" if node.op == "-" else f"(0 if {operand} else 1)"
+        if isinstance(node, Cast):
+            return self.converted(node.operand, node.type)
+        if isinstance(node, (Index, Member)):
+            if is_aggregate(node.type):
+                return self.address_expr(node)
+            return f"{VIEWS[node.type.typeBase]}[{self.store_key(node)}]"
+        if isinstance(node, Call):
+            return self.call(node)
+        if isinstance(node, Assign):
+            return self.assign_expr(node)
+        raise SyntaxError(f"Line {node.line}: cannot generate code for {type(node).__name__}")
+
+    def wraps(self, node):
+        """True for int + - * and unary -, whose value wrap() reduces to 32 bits"""
+        return ((isinstance(node, Binary) and node.op in WRAPPING or isinstance(node, Unary) and node.op == "-")
+                and node.type.typeBase != TB_DOUBLE)
+
+    def unwrapped(self, node):
+        """Python expression of a tree of int + - *, without the wrap() its root needs"""
+        if isinstance(node, Unary):
+            operand = self.unwrapped(node.operand) if self.wraps(node.operand) else self.expr(node.operand)
+            return f"(-{operand})"
+        left = self.unwrapped(node.left) if self.wraps(node.left) else self.expr(node.left)
+        right = self.unwrapped(node.right) if self.wraps(node.right) else self.expr(node.right)
+        return f"({left} {node.op} {right})"
+
+    def cond(self, node):
+        """Python expression with the truth value of node"""
+        if isinstance(node, Const) and not isinstance(node.value, str):
+            return "True" if node.value else "False"
+        if isinstance(node, Binary) and node.op in CONDITIONS:
+            return f"{self.expr(node.left)} {node.op} {self.expr(node.right)}"
+        if isinstance(node, Binary) and node.op in ("&&", "||"):
+            return f"({self.cond(node.left)} {'and' if node.op == '&&' else 'or'} {self.cond(node.right)})"
+        if isinstance(node, Unary) and node.op == "!":
+            return f"(not {self.cond(node.operand)})"
+        return self.expr(node)
+
+    def converted(self, node, t):
+        """Python expression with the value of node converted to type t"""
+        src = node.type
+        if self.wraps(node) and t.typeBase == TB_CHAR and src.typeBase != TB_DOUBLE:
+            return f"({self.unwrapped(node)} & 0xFF)"  # The low byte does not need the wrap
+        value = self.expr(node)
+        if is_aggregate(t) or t.typeBase == TB_VOID or t.typeBase == src.typeBase and not char_arithmetic(node):
+            return value
+        if t.typeBase == TB_DOUBLE:
+            return f"float({value})"
+        if t.typeBase == TB_CHAR:
+            return f"(int({value}) & 0xFF)" if src.typeBase == TB_DOUBLE else f"({value} & 0xFF)"
+        if src.typeBase == TB_DOUBLE:
+            return f"wrap_int(int({value}))"
+        return value  # char -> int needs no conversion
+
+    def address(self, node):
+        """
+        (expression, offset) such that node, an array or struct or an element or member of one,
+        is stored at the address the expression computes plus the constant offset
+        """
+        if isinstance(node, Member):
+            base, offset = self.address(node.base)
+            return base, offset + self.layouts.offset(node)
+        if isinstance(node, Index):
+            base, offset = self.address(node.base)
+            size = self.layouts.element_size(node.type)
+            if isinstance(node.index, Const):
+                return base, offset + node.index.value * size
+            index = self.expr(node.index)
+            return f"({base} + {index})" if size == 1 else f"({base} + {index} * {size})", offset
+        return self.expr(node), 0
+
+    def address_expr(self, node):
+        return plus(*self.address(node))
+
+    def store_key(self, node):
+        """Index into the typed view of the scalar element or member a node reads or writes"""
+        bits = SHIFTS[node.type.typeBase]
+        if isinstance(node, Index) and not isinstance(node.index, Const):
+            base = shift(self.address_expr(node.base), bits)  # Like LDI: (base >> 2) + index
+            index = self.expr(node.index)
+            return f"{base} + {index}"
+        return shift(self.address_expr(node), bits)
+
+    def call(self, node, copy=True):
+        """A returned struct lives in the callee's released frame: unless copy is False it is copied here"""
+        args = ", ".join(self.converted(arg, param.type) for arg, param in zip(node.args, node.symbol.args))
+        if node.symbol.cls == CLS_EXTFUNC:
+            self.program.externals.add(node.symbol.name)
+            return f"{node.symbol.name}({args})"
+        name = self.program.functions.get(node.symbol.name)
+        if name is None:
+            raise SyntaxError(f"Line {node.line}: {node.symbol.name} is imported, not defined in this unit")
+        if copy and is_struct_value(node.type):
+            offset = self.stack_slot(node.type)
+            return f"copy({plus('fp', offset)}, {name}({args}), {self.layouts.sizeof(node.type)})"
+        return f"{name}({args})"
+
+    def assign_expr(self, node):
+        """An assignment used for its value, which is the converted value stored"""
+        target = node.target
+        t = target.type
+        if is_struct_value(t):
+            value = self.call(node.value, copy=False) if isinstance(node.value, Call) else self.expr(node.value)
+            return f"copy({self.address_expr(target)}, {value}, {self.layouts.sizeof(t)})"
+        if isinstance(target, Var):
+            return f"({self.variable(target)} := {self.converted(node.value, t)})"
+        return f"{STORE_HELPERS[t.typeBase]}({self.store_key(target)}, {self.converted(node.value, t)})"
+
+
+def compile_python(unit):
+    """Returns the PythonProgram for a Unit AST"""
+    return PythonGenerator(unit).compile()
+
+
+class JIT:
+    """Runs a PythonProgram; the counterpart of vm.VM"""
+
+    def __init__(self, program, runtime=None, stack_size=DEFAULT_STACK_SIZE):
+        self.program = program
+        self.runtime = runtime if runtime is not None else Runtime()
+        self.memory = self.runtime.memory = Memory(program.data, stack_size)
+        self.namespace = self.environment()
+        exec(program.code, self.namespace)
+
+    def environment(self):
+        """Globals of the generated code: memory views, helpers and the external functions"""
+        memory = self.memory
+        mem, mi, md, view = memory.bytes, memory.ints, memory.doubles, memory.view
+
+        def store_int(index, value):
+            try:
+                mi[index] = value
+            except ValueError:
+                mi[index] = wrap_int(value)
+            return value
+
+        def store_double(index, value):
+            md[index] = value
+            return value
+
+        def store_char(index, value):
+            mem[index] = value
+            return value
+
+        def copy(dst, src, size):
+            view[dst:dst + size] = view[src:src + size]
+            return dst
+
+        namespace = {"mem": mem, "mi": mi, "md": md, "view": view, "zeros": memoryview(bytes(self.program.frame_max)),
+                     "sp": memory.stack_base, "limit": len(mem), "StackOverflow": StackOverflow,
+                     "int_div": int_div, "wrap_int": wrap_int, "store_int": store_int, "store_double": store_double,
+                     "store_char": store_char, "copy": copy}
+        for name in self.program.externals:
+            namespace[name] = getattr(self.runtime, name)
+        return namespace
+
+    def line_of(self, tb, outer=0):
+        """AtomC line of the innermost generated frame of a traceback, or of the outer-th one around it"""
+        lines = [None]
+        while tb is not None:
+            if tb.tb_frame.f_code.co_filename == FILENAME:
+                lines.append(self.program.lines[tb.tb_lineno - 1])
+            tb = tb.tb_next
+        return lines[max(len(lines) - 1 - outer, 0)]
+
+    def run(self, entry="main"):
+        """Runs entry() to completion and returns its result"""
+        name = self.program.functions.get(entry)
+        if name is None:
+            raise AtomCRuntimeError(f"no {entry} function")
+        self.namespace["sp"] = self.memory.stack_base
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+        try:
+            return self.namespace[name]()
+        except StackOverflow as e:  # Like the VM, at the line of the call
+            raise AtomCRuntimeError(str(e), self.line_of(e.__traceback__, outer=1)) from None
+        except AtomCRuntimeError as e:
+            if e.line is None:
+                raise AtomCRuntimeError(str(e), self.line_of(e.__traceback__)) from None
+            raise
+        except RecursionError as e:
+            raise AtomCRuntimeError("stack overflow", self.line_of(e.__traceback__)) from None
+        except ZeroDivisionError as e:
+            raise AtomCRuntimeError("division by zero", self.line_of(e.__traceback__)) from None
+        except IndexError as e:
+            raise AtomCRuntimeError("memory access out of bounds", self.line_of(e.__traceback__)) from None
+        except (TypeError, ValueError, OverflowError) as e:
+            raise AtomCRuntimeError(str(e), self.line_of(e.__traceback__)) from None
+        finally:
+            sys.setrecursionlimit(limit)
+
+
+def compile_source(code):
+    """Lexes, parses and translates AtomC source to a PythonProgram"""
+    parser = Parser(tokenize(code), build_ast=True)
+    parser.parse_unit()
+    return compile_python(parser.unit)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compile an AtomC program to Python and run it")
+    arg_parser.add_argument("path", help="AtomC source file")
+    arg_parser.add_argument("--source", action="store_true", help="print the generated Python instead of running it")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.path, 'r') as file:
+        code = file.read()
+    try:
+        program = compile_source(code)
+    except SyntaxError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.source:
+        print(program.source, end="")
+        return 0
+    try:
+        JIT(program).run()
+    except AtomCRuntimeError as e:
+        sys.stdout.flush()
+        print(f"\nruntime error: {e}", file=sys.stderr)
+        return 1
+    sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Storage layout of AtomC types, following the C rules: char is 1 byte, int 4 and double 8,
+each aligned to its own size. Struct members are placed in declaration order, each at the
+next offset aligned for its type, and a struct is padded to a multiple of its largest
+member alignment so the elements of an array of structs stay aligned. An array is its
+elements back to back.
+"""
+from ast_nodes import StructDecl
+from syntactic_analyzer import TB_CHAR, TB_DOUBLE, TB_INT, TB_STRUCT
+
+SCALAR_SIZES = {TB_CHAR: 1, TB_INT: 4, TB_DOUBLE: 8}
+MAX_ALIGN = 8  # Alignment that suits every type
+
+
+def align_up(offset, align):
+    return (offset + align - 1) // align * align
+
+
+class StructLayout:
+    def __init__(self, name):
+        self.name = name
+        self.size = 0  # Bytes, including the trailing padding
+        self.align = 1
+        self.offsets = {}  # Member name -> byte offset, in declaration order
+
+
+class Layouts:
+    """Computes struct layouts on demand and keeps them by struct symbol"""
+
+    def __init__(self):
+        self.structs = {}  # Struct Symbol -> StructLayout
+
+    def struct(self, sym):
+        layout = self.structs.get(sym)
+        if layout is None:
+            layout = StructLayout(sym.name)
+            offset = 0
+            for member in sym.members:
+                align = self.alignof(member.type)
+                offset = align_up(offset, align)
+                layout.offsets[member.name] = offset
+                offset += self.sizeof(member.type)
+                layout.align = max(layout.align, align)
+            layout.size = align_up(offset, layout.align)
+            self.structs[sym] = layout
+        return layout
+
+    def element_size(self, t):
+        """Size of one element of t, or of t itself when it is not an array"""
+        if t.typeBase == TB_STRUCT:
+            return self.struct(t.structSymbol).size
+        return SCALAR_SIZES[t.typeBase]
+
+    def sizeof(self, t):
+        """Size of a variable of type t; arrays without a size take no storage of their own"""
+        size = self.element_size(t)
+        return size * t.nElements if t.nElements >= 0 else size
+
+    def alignof(self, t):
+        if t.typeBase == TB_STRUCT:
+            return self.struct(t.structSymbol).align
+        return SCALAR_SIZES[t.typeBase]
+
+    def offset(self, member_node):
+        """Byte offset of the member read by a Member node inside its struct"""
+        return self.struct(member_node.base.type.structSymbol).offsets[member_node.field.name]
+
+
+def layout_unit(unit, layouts=None):
+    """Lays out every struct of a Unit AST in declaration order; returns the Layouts"""
+    layouts = layouts if layouts is not None else Layouts()
+    for decl in unit.decls:
+        if isinstance(decl, StructDecl):
+            layouts.struct(decl.symbol)
+    return layouts
+
+
+def format_layouts(layouts):
+    """Text of the struct layouts, one `offset name` line per member"""
+    lines = []
+    for layout in layouts.structs.values():
+        lines.append(f"struct {layout.name}: size {layout.size}, align {layout.align}")
+        for name, offset in layout.offsets.items():
+            lines.append(f"  {offset:6} {name}")
+    return "\n".join(lines)
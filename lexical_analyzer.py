@@ -1,4 +1,8 @@
+import codecs
+import io
+import mmap
 import re
+from array import array
 
 # Define token types
 TOKEN_SPECIFICATIONS = [
@@ -19,10 +23,16 @@ TOKEN_SPECIFICATIONS = [
 TOKEN_REGEX = '|'.join(f'(?P<{name}>{pattern})' for name, pattern in TOKEN_SPECIFICATIONS)
 TOKEN_PATTERN = re.compile(TOKEN_REGEX, re.DOTALL)
 
-def tokenize(code):
+def tokenize(code, engine="regex"):
     """
     Lexical analyzer function that scans the given Atomic code and generates tokens.
+    engine selects the scanner: "regex" (TOKEN_PATTERN) or "dfa" (tokenize_dfa); both produce the same tokens.
     """
+    if engine == "dfa":
+        return tokenize_dfa(code)
+    if engine != "regex":
+        raise ValueError(f"Unknown lexer engine: {engine}")
+
     tokens = []
     line_number = 1
 
@@ -41,4 +51,397 @@ def tokenize(code):
         tokens.append((token_type, token_value, line_number))
     tokens.append(('EOF', '', line_number))
 
-    return tokens
\ No newline at end of file
+    return tokens
+
+
+# ---------- Table-driven lexer ----------
+
+KEYWORDS = {"break", "char", "double", "else", "for", "if", "int", "return", "struct", "void", "while"}
+
+# States of the DFA that reads one token; S_DEAD is where no token continues
+(S_DEAD, S_START, S_SPACE, S_WORD, S_ZERO, S_OCTAL, S_DECIMAL, S_DIGITS, S_HEX_PREFIX, S_HEX,
+ S_POINT, S_FRACTION, S_FRACTION_E, S_FRACTION_SIGN, S_FRACTION_EXPONENT, S_E, S_E_SIGN, S_EXPONENT,
+ S_SLASH, S_LINE_COMMENT, S_LINE_COMMENT_END, S_BLOCK_COMMENT, S_BLOCK_COMMENT_STAR, S_BLOCK_COMMENT_END,
+ S_STRING, S_STRING_ESCAPE, S_STRING_END, S_CHAR, S_CHAR_ESCAPE, S_CHAR_BODY, S_CHAR_END,
+ S_OPERATOR, S_OPERATOR_EQ, S_AMPERSAND, S_BAR, S_DELIMITER) = range(36)
+STATE_COUNT = 36
+
+# Token formed by the characters read when the DFA is in a state, None if they form none
+_ACCEPTED = {S_SPACE: "WHITESPACE", S_WORD: "IDENTIFIER", S_ZERO: "CT_INT", S_OCTAL: "CT_INT", S_DECIMAL: "CT_INT",
+             S_HEX: "CT_INT", S_FRACTION: "CT_REAL", S_FRACTION_EXPONENT: "CT_REAL", S_EXPONENT: "CT_REAL",
+             S_SLASH: "OPERATOR", S_LINE_COMMENT: "COMMENT", S_LINE_COMMENT_END: "COMMENT",
+             S_BLOCK_COMMENT_END: "COMMENT", S_STRING_END: "CT_STRING", S_CHAR_END: "CT_CHAR",
+             S_OPERATOR: "OPERATOR", S_OPERATOR_EQ: "OPERATOR", S_DELIMITER: "DELIMITER"}
+ACCEPTS = [_ACCEPTED.get(state) for state in range(STATE_COUNT)]
+
+# Numbers whose pattern ends in \b: they are not tokens when a word character follows, e.g. "12ab"
+BOUNDED = {S_ZERO, S_OCTAL, S_DECIMAL, S_EXPONENT}
+
+DIGITS = "0123456789"
+HEX_DIGITS = DIGITS + "abcdefABCDEF"
+LETTERS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_"
+WORD_CHARS = LETTERS + DIGITS
+SPACES = "".join(chr(code) for code in range(128) if chr(code).isspace())
+WORD_BYTES = frozenset(WORD_CHARS.encode())
+
+# Characters are read as bytes of their latin-1 encoding, every character above it as 0x80
+NON_ASCII_ERRORS = "atomc-non-ascii"
+codecs.register_error(NON_ASCII_ERRORS, lambda error: ("\x80" * (error.end - error.start), error.end))
+
+
+def _build_transitions():
+    """TRANSITIONS[state][byte]: the state after reading byte; bytes from 0x80 up are all non-ASCII"""
+    table = [[S_DEAD] * 256 for _ in range(STATE_COUNT)]
+
+    def on(state, chars, target):
+        for ch in chars:
+            table[state][ord(ch)] = target
+
+    def otherwise(state, target, but=""):
+        """Every character without a transition yet, non-ASCII ones too, except those in but"""
+        row = table[state]
+        for code in range(256):
+            if row[code] == S_DEAD and chr(code) not in but:
+                row[code] = target
+
+    on(S_START, SPACES, S_SPACE)
+    on(S_START, LETTERS, S_WORD)
+    on(S_START, "0", S_ZERO)
+    on(S_START, DIGITS[1:], S_DECIMAL)
+    on(S_START, "/", S_SLASH)
+    on(S_START, '"', S_STRING)
+    on(S_START, "'", S_CHAR)
+    on(S_START, "+-*.", S_OPERATOR)
+    on(S_START, "=!<>", S_OPERATOR_EQ)
+    on(S_START, "&", S_AMPERSAND)
+    on(S_START, "|", S_BAR)
+    on(S_START, ";,{}()[]", S_DELIMITER)
+    on(S_SPACE, SPACES, S_SPACE)
+    on(S_WORD, WORD_CHARS, S_WORD)
+
+    # CT_INT: 0x1F, 017, 0 or 42; CT_REAL: 1.5, 1.5e-3 or 1e3, where the digits may start with 0
+    on(S_ZERO, "xX", S_HEX_PREFIX)
+    for state in (S_ZERO, S_OCTAL):
+        on(state, "01234567", S_OCTAL)
+        on(state, "89", S_DIGITS)  # 018 is no CT_INT, but 018.5 is a CT_REAL
+    on(S_DECIMAL, DIGITS, S_DECIMAL)
+    on(S_DIGITS, DIGITS, S_DIGITS)
+    for state in (S_ZERO, S_OCTAL, S_DECIMAL, S_DIGITS):
+        on(state, ".", S_POINT)
+        on(state, "eE", S_E)
+    on(S_HEX_PREFIX, HEX_DIGITS, S_HEX)
+    on(S_HEX, HEX_DIGITS, S_HEX)
+    on(S_POINT, DIGITS, S_FRACTION)
+    on(S_FRACTION, DIGITS, S_FRACTION)
+    on(S_FRACTION, "eE", S_FRACTION_E)
+    on(S_FRACTION_E, "+-", S_FRACTION_SIGN)
+    for state in (S_FRACTION_E, S_FRACTION_SIGN, S_FRACTION_EXPONENT):
+        on(state, DIGITS, S_FRACTION_EXPONENT)
+    on(S_E, "+-", S_E_SIGN)
+    for state in (S_E, S_E_SIGN, S_EXPONENT):
+        on(state, DIGITS, S_EXPONENT)
+
+    on(S_SLASH, "/", S_LINE_COMMENT)
+    on(S_SLASH, "*", S_BLOCK_COMMENT)
+    on(S_LINE_COMMENT, "\n", S_LINE_COMMENT_END)
+    otherwise(S_LINE_COMMENT, S_LINE_COMMENT)
+    on(S_BLOCK_COMMENT, "*", S_BLOCK_COMMENT_STAR)
+    otherwise(S_BLOCK_COMMENT, S_BLOCK_COMMENT)
+    on(S_BLOCK_COMMENT_STAR, "*", S_BLOCK_COMMENT_STAR)
+    on(S_BLOCK_COMMENT_STAR, "/", S_BLOCK_COMMENT_END)
+    otherwise(S_BLOCK_COMMENT_STAR, S_BLOCK_COMMENT)
+
+    on(S_STRING, '"', S_STRING_END)
+    on(S_STRING, "\\", S_STRING_ESCAPE)
+    otherwise(S_STRING, S_STRING)
+    on(S_STRING_ESCAPE, "abfnrtv'\"?\\0", S_STRING)
+    on(S_CHAR, "\\", S_CHAR_ESCAPE)
+    otherwise(S_CHAR, S_CHAR_BODY, but="'")
+    on(S_CHAR_ESCAPE, "abfnrtv'\"\\0", S_CHAR_BODY)
+    on(S_CHAR_BODY, "'", S_CHAR_END)
+
+    on(S_OPERATOR_EQ, "=", S_OPERATOR)
+    on(S_AMPERSAND, "&", S_OPERATOR)
+    on(S_BAR, "|", S_OPERATOR)
+    return [tuple(row) for row in table]
+
+
+TRANSITIONS = _build_transitions()
+
+
+def _is_word_char(ch):
+    """Same definition as the regex \\w used by the KEYWORD boundaries"""
+    return ch.isalnum() or ch == '_'
+
+
+def _last_accepted(data, start, stop):
+    """(state, end) of the longest token in data[start:stop], which the DFA reads without stopping"""
+    accepted, end = S_DEAD, start
+    state = S_START
+    for index in range(start, stop):
+        state = TRANSITIONS[state][data[index]]
+        if ACCEPTS[state] is not None:
+            accepted, end = state, index + 1
+    return accepted, end
+
+
+def tokenize_dfa(code):
+    """
+    Table-driven lexer: from the first character of a token, the DFA of TRANSITIONS reads
+    characters while it has a transition for them, and the longest prefix it accepted is the
+    token. Keywords are identifiers found in KEYWORDS. Produces the same tokens as
+    tokenize(code, "regex"); when the DFA stops at a non-ASCII character, TOKEN_PATTERN, whose
+    \\s, \\d and \\b take Unicode into account, scans that token instead.
+    """
+    tokens = []
+    append = tokens.append
+    transitions = TRANSITIONS
+    accepts = ACCEPTS
+    data = code.encode("latin-1", NON_ASCII_ERRORS)  # One byte per character
+    line_number = 1
+    pos = 0
+    end = len(data)
+
+    while pos < end:
+        state = S_START
+        index = pos
+        while index < end:
+            following = transitions[state][data[index]]
+            if following == S_DEAD:
+                break
+            state = following
+            index += 1
+        if index < end and data[index] >= 0x80:
+            match = TOKEN_PATTERN.match(code, pos)
+            token_type = match.lastgroup
+            stop = match.end()
+            if token_type == "UNKNOWN":
+                raise SyntaxError(f"LEXICAL ERROR: Line {line_number}: Unexpected character '{code[pos]}'")
+        else:
+            accepted, stop = state, index
+            if accepts[state] is None:
+                accepted, stop = _last_accepted(data, pos, index)
+            token_type = accepts[accepted]
+            # A bounded number is followed by an ASCII character here, the others ended the scan
+            if token_type is None or accepted in BOUNDED and stop < end and data[stop] in WORD_BYTES:
+                raise SyntaxError(f"LEXICAL ERROR: Line {line_number}: Unexpected character '{code[pos]}'")
+            # KEYWORD needs a \b on both sides, e.g. "0x1int" lexes as CT_INT then IDENTIFIER
+            if token_type == "IDENTIFIER" and code[pos:stop] in KEYWORDS and \
+                    (pos == 0 or not _is_word_char(code[pos - 1])):
+                token_type = "KEYWORD"
+
+        if token_type == "WHITESPACE" or token_type == "COMMENT":
+            line_number += code.count('\n', pos, stop)
+        else:
+            append((token_type, code[pos:stop], line_number))
+        pos = stop
+
+    append(('EOF', '', line_number))
+    return tokens
+
+
+# ---------- Compact token storage ----------
+
+TOKEN_KINDS = ["KEYWORD", "IDENTIFIER", "CT_REAL", "CT_INT", "CT_CHAR", "CT_STRING", "OPERATOR", "DELIMITER", "EOF"]
+KIND_CODES = {kind: code for code, kind in enumerate(TOKEN_KINDS)}
+
+
+class TokenBuffer:
+    """
+    Struct-of-arrays token list: kind codes, start/end offsets into the source and line
+    numbers are kept in array columns, and lexeme strings are only sliced when a token is read.
+    tokens[i] returns the same (type, value, line) tuple as tokenize, so the parser can use it as is.
+    """
+    __slots__ = ("source", "kinds", "starts", "ends", "lines")
+
+    def __init__(self, source):
+        offset_code = 'I' if len(source) < 2 ** 32 else 'Q'
+        self.source = source
+        self.kinds = array('B')
+        self.starts = array(offset_code)
+        self.ends = array(offset_code)
+        self.lines = array('I')
+
+    def append(self, token_type, start, end, line):
+        self.kinds.append(KIND_CODES[token_type])
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        return (TOKEN_KINDS[self.kinds[index]], self.source[self.starts[index]:self.ends[index]], self.lines[index])
+
+    def kind(self, index):
+        return TOKEN_KINDS[self.kinds[index]]
+
+    def value(self, index):
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def line(self, index):
+        return self.lines[index]
+
+    def nbytes(self):
+        """Memory used by the columns, not counting the shared source string"""
+        return sum(len(column) * column.itemsize for column in (self.kinds, self.starts, self.ends, self.lines))
+
+
+def tokenize_buffer(code):
+    """
+    Same tokens as tokenize(code), stored in a TokenBuffer. Scans match spans directly,
+    so no per-token tuple or lexeme string is created.
+    """
+    tokens = TokenBuffer(code)
+    append = tokens.append
+    line_number = 1
+
+    for match in TOKEN_PATTERN.finditer(code):
+        token_type = match.lastgroup
+        start, end = match.span()
+
+        if token_type == "WHITESPACE" or token_type == "COMMENT":
+            line_number += code.count('\n', start, end)
+            continue
+        if token_type == "UNKNOWN":
+            raise SyntaxError(f"LEXICAL ERROR: Line {line_number}: Unexpected character '{code[start:end]}'")
+        append(token_type, start, end, line_number)
+    append('EOF', len(code), len(code), line_number)
+
+    return tokens
+
+
+# ---------- Streaming tokenizer ----------
+
+DEFAULT_CHUNK_SIZE = 64 * 1024  # Characters decoded per chunk when streaming a file
+STREAM_LOOKAHEAD = 8  # Characters that must follow a match before it is final (e.g. "1." -> "1.5e+3")
+DEFAULT_TOKEN_HISTORY = 256  # Tokens kept behind the parser position for backtracking
+
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, encoding="utf-8"):
+    """
+    Yields the text of the file at path in chunks, memory-mapping it instead of reading it whole.
+    Newlines are translated the same way open(path, 'r') does.
+    """
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+    with open(path, "rb") as file:
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty files cannot be mapped
+            data = b""
+        try:
+            for start in range(0, len(data), chunk_size):
+                text = decoder.decode(data[start:start + chunk_size])
+                if text:
+                    yield text
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def _is_incomplete(buffer, match, end):
+    """True if more input could still change the token matched at the end of the buffer."""
+    if end - match.end() < STREAM_LOOKAHEAD:
+        return True
+    token_type = match.lastgroup
+    token_value = match.group(token_type)
+    if token_type == "OPERATOR" and token_value == "/" and buffer[match.end()] == "*":
+        return True  # Block comment whose '*/' has not been read yet
+    if token_type == "UNKNOWN" and token_value in "\"'":
+        return True  # String or char literal whose closing quote has not been read yet
+    return False
+
+
+def tokenize_stream(chunks):
+    """
+    Streaming variant of tokenize: takes any iterable of text chunks (see read_chunks, or
+    iter(lambda: file.read(n), "")) and lazily yields the same tokens, ending with EOF.
+    Tokens, comments and literals may span chunk boundaries.
+    """
+    buffer = ""
+    pos = 0
+    line_number = 1
+    final = False
+    chunks = iter(chunks)
+
+    while not final:
+        chunk = next(chunks, None)
+        if chunk is None:
+            final = True
+        else:
+            keep = max(pos - 1, 0)  # Keep one character before pos so \b sees the previous token
+            buffer = buffer[keep:] + chunk
+            pos -= keep
+
+        end = len(buffer)
+        while pos < end:
+            match = TOKEN_PATTERN.match(buffer, pos)
+            if not final and _is_incomplete(buffer, match, end):
+                break  # Wait for the next chunk
+            token_type = match.lastgroup
+            token_value = match.group(token_type)
+            pos = match.end()
+
+            if token_type == "WHITESPACE" or token_type == "COMMENT":
+                line_number += token_value.count('\n')
+                continue
+            if token_type == "UNKNOWN":
+                raise SyntaxError(f"LEXICAL ERROR: Line {line_number}: Unexpected character '{token_value}'")
+            yield (token_type, token_value, line_number)
+    yield ('EOF', '', line_number)
+
+
+def tokenize_file(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lazily tokenizes the file at path without loading it into memory."""
+    return tokenize_stream(read_chunks(path, chunk_size))
+
+
+class TokenWindow:
+    """
+    Lets the parser index a token generator like a list while only keeping a small
+    window of tokens: everything from `history` tokens behind the furthest requested
+    index onward. Indexing a token that already left the window raises IndexError.
+
+    len() reports one more than the tokens read so far until the generator is exhausted,
+    which is all the parser's `current_index < len(tokens)` checks need.
+    """
+
+    def __init__(self, tokens, history=DEFAULT_TOKEN_HISTORY):
+        self._source = iter(tokens)
+        self._buffer = []
+        self._offset = 0  # Absolute index of self._buffer[0]
+        self._furthest = -1  # Highest index requested so far
+        self._history = history
+        self._exhausted = False
+
+    def _fill(self, index):
+        while not self._exhausted and self._offset + len(self._buffer) <= index:
+            token = next(self._source, None)
+            if token is None:
+                self._exhausted = True
+            else:
+                self._buffer.append(token)
+
+    def __getitem__(self, index):
+        if index < 0:
+            raise IndexError("TokenWindow does not support negative indices")
+        if index > self._furthest:
+            self._furthest = index
+            # Drop old tokens in batches so trimming stays amortized O(1) per token
+            drop = index - self._offset - self._history
+            if drop > self._history:
+                del self._buffer[:drop]
+                self._offset += drop
+        self._fill(index)
+        if index < self._offset:
+            raise IndexError(f"token {index} is no longer buffered")
+        return self._buffer[index - self._offset]
+
+    def __len__(self):
+        self._fill(self._furthest + 1)  # Peek one token past the parser to know if the stream ended
+        read = self._offset + len(self._buffer)
+        return read if self._exhausted else read + 1
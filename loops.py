@@ -0,0 +1,427 @@
+"""
+Loop optimizations on the SSA IR of ir.py, run by optimize.py after inlining.
+
+The Builder lowers loops rotated: the condition is tested once before the loop and again
+by the latch at its bottom, which jumps back to the first block of the body, the header of
+a natural loop (ir.natural_loops). Loops are optimized innermost first, so whatever leaves
+an inner loop may leave the loop around it too:
+
+    insert_preheader   gives the loop a preheader, the one block outside it that enters it
+    hoist_invariants   moves to the preheader the instructions whose operands the loop does
+                       not change; one that may fail only from the start of the header, which
+                       runs whenever the preheader does, and loads only from loops that do not
+                       write memory; those that compute a value the preheader already has,
+                       such as the address of a global used by both loops of a nest, are merged
+    merge_inductions   keeps one of the induction variables that start and step alike
+    reduce_strength    replaces multiples of an induction variable, i * 12 or base + i * 12
+                       for the address of a struct in an array, by variables of their own
+                       stepped by an addition next to the step of i
+    count_loop         recognises counted loops, i stepped by one while below a limit the loop
+                       does not change, and puts their test in the form i = i + 1; i < limit
+                       at the end of the latch, which ir_codegen compiles to INCJLT or INCJLTK
+
+Usage: python optimize.py FILE.c prints the loops of every function and what was done to them.
+"""
+from codegen import NEGATED
+from ir import INT, Constant, Instr, Temp, dominates, dominators, is_pure, natural_loops, replace_uses
+from ir_codegen import MIRRORED
+from syntactic_analyzer import CLS_FUNC, TB_DOUBLE, TB_INT
+from vm import wrap_int
+
+INT_MAX = 0x7FFFFFFF
+
+INVARIANT_OPS = {"copy", "binary", "unary", "convert", "getg", "addr", "alloca", "load"}
+MERGED_OPS = INVARIANT_OPS - {"alloca"}  # Each alloca is storage of its own
+MEMORY_WRITES = {"store", "memcpy", "zero", "call"}  # External functions such as get_s write memory too
+
+
+class Induction:
+    """Basic induction variable: a phi of the header, init on entry, then update = phi + step"""
+    __slots__ = ("phi", "init", "step", "update")
+
+    def __init__(self, phi, init, step, update):
+        self.phi = phi
+        self.init = init
+        self.step = step
+        self.update = update
+
+
+class Loop:
+    __slots__ = ("function", "header", "blocks", "preheader", "latch", "depth", "line",
+                 "hoisted", "merged", "reduced", "counter")
+
+    def __init__(self, function, header, blocks, depth):
+        self.function = function
+        self.header = header
+        self.blocks = blocks
+        self.preheader = next(pred for pred in header.preds if pred not in blocks)
+        latches = [pred for pred in header.preds if pred in blocks]
+        self.latch = latches[0] if len(latches) == 1 else None  # None for several back edges
+        self.depth = depth
+        self.line = header.instrs[0].line
+        self.hoisted = 0
+        self.merged = 0
+        self.reduced = 0
+        self.counter = None  # (Induction, limit) of a counted loop
+
+    def instructions(self):
+        """Instructions of the loop, in the order of the function's blocks"""
+        for block in self.function.blocks:
+            if block in self.blocks:
+                yield from block.instrs
+
+
+def is_int_constant(value):
+    return isinstance(value, Constant) and isinstance(value.value, int)
+
+
+def same_value(a, b):
+    return a is b or isinstance(a, Constant) and isinstance(b, Constant) and a.value == b.value
+
+
+def find_loops(function):
+    """Loops of a linked SSA function, innermost first, after giving each a preheader"""
+    for header, blocks in natural_loops(function, dominators(function)).items():
+        if header is not function.entry:
+            insert_preheader(function, header, blocks)
+    bodies = natural_loops(function, dominators(function))
+    loops = []
+    for header, blocks in bodies.items():
+        if header is not function.entry:  # Nothing can run before the entry
+            depth = sum(1 for other in bodies.values() if header in other)
+            loops.append(Loop(function, header, blocks, depth))
+    loops.sort(key=lambda loop: -loop.depth)
+    return loops
+
+
+def insert_preheader(function, header, blocks):
+    """Sends the edges entering the loop of header through one block that only jumps to it"""
+    outside = list(dict.fromkeys(pred for pred in header.preds if pred not in blocks))
+    if len(outside) == 1 and len(outside[0].succs) == 1:
+        return
+    line = header.instrs[0].line
+    preheader = function.new_block()
+    for pred in outside:
+        terminator = pred.terminator
+        terminator.attr = [preheader if target is header else target for target in terminator.attr]
+    for phi in header.phis():
+        entering = [(pred, arg) for pred, arg in zip(phi.attr, phi.args) if pred in outside]
+        looping = [(pred, arg) for pred, arg in zip(phi.attr, phi.args) if pred not in outside]
+        value = entering[0][1]
+        if any(not same_value(arg, value) for _, arg in entering):
+            value = function.temp(phi.dst.type)
+            preheader.instrs.append(Instr("phi", value, [arg for _, arg in entering],
+                                          [pred for pred, _ in entering], line))
+        phi.attr = [preheader] + [pred for pred, _ in looping]
+        phi.args = [value] + [arg for _, arg in looping]
+    preheader.instrs.append(Instr("jump", attr=[header], line=line))
+    function.link()
+
+
+# ---------- Invariants ----------
+
+def hoist_invariants(function, loop):
+    instrs = list(loop.instructions())
+    defined = {instr.dst for instr in instrs if instr.dst is not None}
+    writes_memory = any(instr.op in MEMORY_WRITES for instr in instrs)
+    written = {instr.attr for instr in instrs if instr.op == "setg"}
+    calls = any(instr.op == "call" and instr.attr.cls == CLS_FUNC for instr in instrs)  # May set any global
+
+    def invariant(instr):
+        if instr.op not in INVARIANT_OPS or any(arg in defined for arg in instr.uses()):
+            return False
+        if instr.op == "getg":
+            return instr.attr not in written and not calls
+        if instr.op == "load":
+            return not writes_memory
+        return True
+
+    hoisted = []
+    for block in function.blocks:
+        if block not in loop.blocks:
+            continue
+        first = block is loop.header  # Still at the start of the header: as if right after the preheader
+        kept = []
+        for instr in block.instrs:
+            if invariant(instr) and (first or is_pure(instr)):
+                hoisted.append(instr)
+                defined.discard(instr.dst)
+            else:
+                kept.append(instr)
+                first = first and is_pure(instr)
+        block.instrs = kept
+    loop.preheader.instrs[-1:-1] = merge_hoisted(function, loop.preheader, hoisted)
+    loop.hoisted += len(hoisted)
+
+
+def value_key(instr):
+    """What instr computes, the same for instructions that compute the same value"""
+    args = [(type(arg.value), arg.value, arg.type.typeBase) if isinstance(arg, Constant) else arg
+            for arg in instr.args]
+    t = instr.dst.type
+    return instr.op, t.typeBase, t.nElements, t.structSymbol, instr.attr, tuple(args)
+
+
+def merge_hoisted(function, preheader, hoisted):
+    """
+    The hoisted instructions that compute a value neither the preheader nor an earlier one of
+    them has; the others, such as the addr of one global hoisted from both loops of a nest, are
+    dropped and their uses replaced
+    """
+    available = {}  # value_key -> the instruction that computes it
+    for instr in preheader.instrs:
+        if instr.op in MEMORY_WRITES or instr.op == "setg":
+            available = {key: found for key, found in available.items() if found.op not in ("load", "getg")}
+        elif instr.op in MERGED_OPS:
+            available.setdefault(value_key(instr), instr)
+    values = {}
+    kept = []
+    for instr in hoisted:
+        instr.args = [values.get(arg, arg) for arg in instr.args]  # Not in the function yet
+        if instr.op in MERGED_OPS:
+            key = value_key(instr)
+            if key in available:
+                values[instr.dst] = available[key].dst
+                continue
+            available[key] = instr
+        kept.append(instr)
+    if values:
+        replace_uses(function, values)
+    return kept
+
+
+# ---------- Induction variables ----------
+
+def inductions(function, loop):
+    """Basic induction variables of loop: header phis of ints stepped by a constant once an iteration"""
+    if loop.latch is None:
+        return []
+    defining = {instr.dst: instr for instr in loop.instructions() if instr.dst is not None}
+    found = []
+    for phi in loop.header.phis():
+        t = phi.dst.type
+        if t.typeBase != TB_INT or t.nElements >= 0 or len(phi.attr) != 2:
+            continue
+        init = phi.args[phi.attr.index(loop.preheader)]
+        update = defining.get(phi.args[phi.attr.index(loop.latch)])
+        if update is None or update.op != "binary" or update.attr not in ("+", "-"):
+            continue
+        left, right = update.args
+        if update.attr == "+" and right is phi.dst:
+            left, right = right, left
+        if left is phi.dst and is_int_constant(right):
+            found.append(Induction(phi, init, right.value if update.attr == "+" else -right.value, update))
+    return found
+
+
+def merge_inductions(function, loop):
+    """
+    Replaces an induction variable that starts and steps like an earlier one by it; of their
+    updates, the one that runs first replaces the other
+    """
+    idom = dominators(function)
+    places = {instr: (block, index) for block in loop.blocks for index, instr in enumerate(block.instrs)}
+
+    def precedes(a, b):
+        (block_a, index_a), (block_b, index_b) = places[a], places[b]
+        return index_a < index_b if block_a is block_b else dominates(idom, block_a, block_b)
+
+    kept = {}
+    values = {}
+    dropped = set()
+    for induction in inductions(function, loop):
+        init = induction.init
+        key = (init.value if isinstance(init, Constant) else init, induction.step)
+        other = kept.get(key)
+        if other is None:
+            kept[key] = induction
+            continue
+        values[induction.phi.dst] = other.phi.dst
+        dropped.add(induction.phi)
+        if precedes(other.update, induction.update):
+            values[induction.update.dst] = other.update.dst
+            dropped.add(induction.update)
+        elif precedes(induction.update, other.update):
+            values[other.update.dst] = induction.update.dst
+            dropped.add(other.update)
+            other.update = induction.update
+    if values:
+        for block in loop.blocks:
+            block.instrs = [instr for instr in block.instrs if instr not in dropped]
+        replace_uses(function, values)
+        loop.merged += sum(1 for instr in dropped if instr.op == "phi")
+
+
+def linear_forms(function, loop, found):
+    """
+    Temp -> (Induction, scale, base, offset) for the values of the loop that are linear in an
+    induction variable i: scale * i + base + offset, base an invariant Temp or None
+    """
+    defined = {instr.dst for instr in loop.instructions() if instr.dst is not None}
+    forms = {induction.phi.dst: (induction, 1, None, 0) for induction in found}
+    for instr in loop.instructions():
+        if instr.op == "copy" and instr.args[0] in forms:
+            forms[instr.dst] = forms[instr.args[0]]
+        if instr.op != "binary" or instr.dst.type.typeBase == TB_DOUBLE:
+            continue
+        left, right = instr.args
+        if instr.attr in ("+", "*") and right in forms and left not in forms:
+            left, right = right, left
+        if left not in forms:
+            continue
+        induction, scale, base, offset = forms[left]
+        if is_int_constant(right):
+            k = right.value
+            if instr.attr == "+":
+                forms[instr.dst] = (induction, scale, base, offset + k)
+            elif instr.attr == "-":
+                forms[instr.dst] = (induction, scale, base, offset - k)
+            elif instr.attr == "*" and base is None:
+                forms[instr.dst] = (induction, scale * k, None, offset * k)
+        elif instr.attr == "+" and isinstance(right, Temp) and right not in defined and base is None:
+            forms[instr.dst] = (induction, scale, right, offset)
+    return forms
+
+
+def reduce_strength(function, loop):
+    """
+    Replaces the multiples of an induction variable read by anything but the arithmetic of
+    other multiples by a phi of the header, stepped by the multiple of the step
+    """
+    found = inductions(function, loop)
+    if not found:
+        return
+    forms = linear_forms(function, loop, found)
+    derived = {instr.dst: instr for instr in loop.instructions()
+               if instr.op == "binary" and instr.dst in forms and forms[instr.dst][1] not in (0, 1)}
+    roots = set()
+    for instr in function.instructions():
+        if instr.dst not in derived:
+            roots.update(temp for temp in instr.uses() if temp in derived)
+    addresses = {instr.dst: instr.attr for instr in function.instructions() if instr.op == "addr"}
+    reduced = {}  # Form, with the Symbol of the global for the address of one -> the phi that replaces it
+    for instr in loop.instructions():
+        if instr.dst not in roots:
+            continue
+        form = forms[instr.dst]
+        induction, scale, base, offset = form
+        key = (induction, scale, addresses.get(base, base), offset)
+        if key not in reduced:
+            reduced[key] = reduce(function, loop, form, instr)
+        instr.op, instr.args, instr.attr = "copy", [reduced[key]], None
+    loop.reduced += len(reduced)
+
+
+def reduce(function, loop, form, instr):
+    """New induction variable of the header with the value of form, the form of instr"""
+    induction, scale, base, offset = form
+    t = instr.dst.type
+    line = instr.line
+    init = induction.init
+    code = []
+    if isinstance(init, Constant):
+        start = Constant(wrap_int(scale * init.value + offset), t)
+        if base is not None and start.value:
+            code.append(Instr("binary", function.temp(t), [base, start], "+", line))
+        elif base is not None:
+            start = base
+    else:
+        code.append(Instr("binary", function.temp(INT), [init, Constant(scale, INT)], "*", line))
+        if base is not None:
+            code.append(Instr("binary", function.temp(t), [code[-1].dst, base], "+", line))
+        if offset:
+            code.append(Instr("binary", function.temp(t), [code[-1].dst, Constant(offset, INT)], "+", line))
+    if code:
+        loop.preheader.instrs[-1:-1] = code
+        start = code[-1].dst
+    value, stepped = function.temp(t), function.temp(t)
+    loop.header.instrs.insert(0, Instr("phi", value, [start, stepped], [loop.preheader, loop.latch], line))
+    update = induction.update
+    block = next(block for block in loop.blocks if update in block.instrs)
+    block.instrs.insert(block.instrs.index(update),
+                        Instr("binary", stepped, [value, Constant(wrap_int(scale * induction.step), INT)], "+",
+                              update.line))
+    return value
+
+
+# ---------- Counted loops ----------
+
+def count_loop(function, loop):
+    """Recognises a counted loop and normalizes its test; records it in loop.counter"""
+    latch = loop.latch
+    if latch is None or latch.terminator.op != "branch" or loop.header not in latch.succs:
+        return
+    terminator = latch.terminator
+    compare = next((instr for instr in latch.instrs if instr.dst is terminator.args[0]), None)
+    if compare is None or compare.op != "binary" or compare.attr not in NEGATED:
+        return
+    updates = {induction.update.dst: induction for induction in inductions(function, loop) if induction.step == 1}
+    defined = {instr.dst for instr in loop.instructions() if instr.dst is not None}
+    operator, (left, right) = compare.attr, compare.args
+    if right in updates and left not in updates:
+        operator, left, right = MIRRORED[operator], right, left
+    induction = updates.get(left)
+    if induction is None or right in defined or isinstance(right, Constant) and not is_int_constant(right):
+        return
+    uses = sum(instr.uses().count(compare.dst) for instr in function.instructions())
+    exit_ = next((target for target in terminator.attr if target is not loop.header), None)
+    if exit_ is None:
+        return
+    if terminator.attr[0] is not loop.header:  # The test is for leaving the loop
+        if uses > 1:
+            return
+        operator = NEGATED[operator]
+    init = induction.init
+    if operator == "<=":
+        # i <= INT_MAX always holds, as i wraps: only a constant limit is known to be below it
+        if not is_int_constant(right) or right.value >= INT_MAX:
+            return
+        right = Constant(right.value + 1, right.type)
+        operator = "<"
+    elif operator == "!=" and is_int_constant(init) and is_int_constant(right) and init.value < right.value:
+        operator = "<"  # i reaches the limit from below, one at a time
+    if operator != "<":
+        return
+    compare.attr, compare.args = "<", [induction.update.dst, right]
+    terminator.attr = [loop.header, exit_]
+    # The increment goes right before the test, so the two become one instruction
+    instrs = latch.instrs
+    if induction.update in instrs:
+        start = instrs.index(induction.update)
+        between = [instr for instr in instrs[start + 1:-1] if instr is not compare]
+        if not any(induction.update.dst in instr.uses() or compare.dst in instr.uses() for instr in between):
+            instrs[start:-1] = between + [induction.update, compare]
+    loop.counter = (induction, right)
+
+
+def optimize_loops(function):
+    """Optimizes the loops of a linked SSA function, innermost first; returns them in source order"""
+    loops = find_loops(function)
+    for loop in loops:
+        hoist_invariants(function, loop)
+        merge_inductions(function, loop)
+        reduce_strength(function, loop)
+        count_loop(function, loop)
+    return sorted(loops, key=lambda loop: loop.line)
+
+
+def format_report(loops):
+    """Text of what was done to each loop, grouped by function"""
+    if not loops:
+        return "no loops"
+    lines = []
+    function = None
+    for loop in loops:
+        if loop.function is not function:
+            function = loop.function
+            lines.append(f"{function.name}:")
+        if loop.counter is not None:
+            induction, limit = loop.counter
+            counted = f"counted: {induction.phi.dst!r} from {induction.init!r} while < {limit!r}"
+        else:
+            counted = "not counted"
+        lines.append(f"  line {loop.line:<5} depth {loop.depth}  {loop.hoisted} hoisted, {loop.merged} merged, "
+                     f"{loop.reduced} reduced, {counted}")
+    counted = sum(1 for loop in loops if loop.counter is not None)
+    lines.append(f"{len(loops)} loops, {counted} counted")
+    return "\n".join(lines)
@@ -1,24 +1,13 @@
-from lexical_analyzer import tokenize
-from syntactic_analyzer import parse_unit, arrayDecl, declStruct, declVar, typeBase, print_symbol_table
-import syntactic_analyzer
+from lexical_analyzer import TokenWindow, tokenize_file
+from syntactic_analyzer import Parser
 if __name__ == "__main__":
-    with open("input3.c", 'r') as file:
-        code = file.read()
-
-    token_list = tokenize(code)
-    for token in token_list:
-        print(token)
-    print(f"Total tokens: {len(token_list)}")
-    token_list_clone = token_list
-    #print (declStruct(token_list))
-    #print (declVar(token_list))
-    #print (arrayDecl(token_list))
-    #parse_program(token_list, "EOF")
-    #print (declVar(token_list))
-    print (f"{syntactic_analyzer.current_index}asgfsdgdsfg {token_list[syntactic_analyzer.current_index]}")
-    parse_unit(token_list)
+    # The file is lexed a chunk at a time while it is parsed, so neither it nor its tokens are held whole
+    token_list = TokenWindow(tokenize_file("input3.c"))
+    parser = Parser(token_list, debug=True)
+    parser.parse_unit()
 
     print('\nfinished')
-    print(token_list[syntactic_analyzer.current_index-1])
+    print(f"Total tokens: {len(token_list)}")
+    print(token_list[parser.current_index-1])
 
-    print_symbol_table()
\ No newline at end of file
+    parser.print_symbol_table()
@@ -0,0 +1,260 @@
+"""
+Optimizing pipeline over the SSA IR of ir.py: scalar cleanups, inlining (inline.py), loop
+optimizations (loops.py), and compilation of the result to VM bytecode (ir_codegen.py).
+
+Usage: python optimize.py FILE.c [--no-inline] [--budget N] [--no-loops] [--ir] [--disassemble]
+
+The reports of the inlining decisions and of the loops are printed by default; python vm.py
+-O FILE.c runs a program compiled through this pipeline.
+
+The cleanups keep a function in SSA form and linked:
+
+    propagate_copies     uses of the dst of a copy, or of a phi whose operands agree, read its source
+    fold_constants       conditional constant propagation (dataflow.py); decided branches become jumps
+    eliminate_dead_code  drops instructions whose result is unused and that cannot fail or write
+    simplify_cfg         merges straight-line blocks and bypasses blocks that only jump
+
+Everything keeps the VM's semantics, runtime errors included: a division, a load or a
+conversion of a double to int that may fail is not removed even when its result is unused.
+"""
+import argparse
+import sys
+
+import inline
+import loops
+from codegen import disassemble
+from dataflow import constant_propagation
+from ir import Constant, Instr, Temp, format_function, is_pure, lower_unit, replace_uses, successors
+from ir_codegen import compile_module
+from lexical_analyzer import tokenize
+from syntactic_analyzer import Parser
+
+
+def prune_phis(function):
+    """Drops the phi operands of edges that no longer exist, once link() has rebuilt the edges"""
+    for block in function.blocks:
+        for phi in block.phis():
+            operands = {}
+            for pred, arg in zip(phi.attr, phi.args):
+                if pred in block.preds and pred not in operands:
+                    operands[pred] = arg
+            phi.attr = list(operands)
+            phi.args = list(operands.values())
+
+
+# ---------- Passes ----------
+
+def propagate_copies(function):
+    values = {}
+    changed = True
+    while changed:
+        changed = False
+        for block in function.blocks:
+            for instr in block.instrs:
+                if instr.dst in values:
+                    continue
+                if instr.op == "copy":
+                    values[instr.dst] = instr.args[0]
+                    changed = True
+                elif instr.op == "phi":
+                    sources = set()
+                    for arg in instr.args:
+                        while isinstance(arg, Temp) and arg in values:
+                            arg = values[arg]
+                        if arg is not instr.dst:
+                            sources.add(arg.value if isinstance(arg, Constant) else arg)
+                    if len(sources) == 1:
+                        arg = next(arg for arg in instr.args if arg is not instr.dst)
+                        values[instr.dst] = arg
+                        changed = True
+    if not values:
+        return False
+    for block in function.blocks:
+        block.instrs = [instr for instr in block.instrs if instr.dst not in values]
+    replace_uses(function, values)
+    return True
+
+
+def fold_constants(function):
+    constants, unreachable = constant_propagation(function)
+    values = {instr.dst: Constant(value, instr.dst.type) for instr, value in constants.items()}
+    changed = replace_uses(function, values)
+    for block in function.blocks:
+        terminator = block.terminator
+        if block not in unreachable and terminator.op == "branch" and isinstance(terminator.args[0], Constant):
+            condition = terminator.args[0].value
+            if not isinstance(condition, str):
+                block.instrs[-1] = Instr("jump", attr=[terminator.attr[0 if condition else 1]], line=terminator.line)
+                changed = True
+    if changed:
+        function.link()
+        prune_phis(function)
+    return changed
+
+
+def eliminate_dead_code(function):
+    uses = {}
+    defining = {}
+    for instr in function.instructions():
+        for temp in instr.uses():
+            uses[temp] = uses.get(temp, 0) + 1
+        if instr.dst is not None:
+            defining[instr.dst] = instr
+    dead = set()
+    work = [instr for instr in function.instructions()
+            if instr.dst is not None and not uses.get(instr.dst) and is_pure(instr)]
+    while work:
+        instr = work.pop()
+        if instr in dead:
+            continue
+        dead.add(instr)
+        for temp in instr.uses():
+            uses[temp] -= 1
+            if not uses[temp] and temp in defining and is_pure(defining[temp]):
+                work.append(defining[temp])
+    if not dead:
+        return False
+    for block in function.blocks:
+        block.instrs = [instr for instr in block.instrs if instr not in dead]
+    return True
+
+
+def simplify_cfg(function):
+    """
+    One pass over the blocks that keeps preds and succs up to date as it merges and threads
+    them; the function is linked and the phis of merged blocks replaced once, at the end
+    """
+    changed = False
+    removed = set()
+    values = {}  # dst of a phi of a merged block -> its only operand
+    for block in function.blocks:
+        if block in removed:
+            continue
+        while True:
+            terminator = block.terminator
+            if terminator.op == "branch" and terminator.attr[0] is terminator.attr[1]:
+                target = terminator.attr[0]
+                block.instrs[-1] = Instr("jump", attr=[target], line=terminator.line)
+                block.succs = [target]
+                target.preds.remove(block)
+                changed = True
+                continue
+            if terminator.op != "jump":
+                break
+            succ = terminator.attr[0]
+            if succ is block or succ is function.entry or succ.preds != [block]:
+                break
+            # Straight line: block's code continues with succ's
+            for phi in succ.phis():
+                values[phi.dst] = phi.args[phi.attr.index(block)]
+            block.instrs[-1:] = [instr for instr in succ.instrs if instr.op != "phi"]
+            block.succs = succ.succs
+            for after in set(succ.succs):
+                after.preds = [block if pred is succ else pred for pred in after.preds]
+                for phi in after.phis():
+                    phi.attr = [block if pred is succ else pred for pred in phi.attr]
+            removed.add(succ)
+            changed = True
+        terminator = block.terminator
+        if terminator.op == "jump" and len(block.instrs) == 1 and block is not function.entry \
+                and terminator.attr[0] is not block and thread(block, terminator.attr[0]):
+            changed = True
+            if not block.preds:
+                removed.add(block)  # Every predecessor now goes straight to the target
+                block.succs[0].preds.remove(block)
+    if changed:
+        function.blocks = [block for block in function.blocks if block not in removed]
+        replace_uses(function, values)
+        function.link()
+        prune_phis(function)
+    return changed
+
+
+def thread(block, succ):
+    """Sends the predecessors of block, which only jumps to succ, straight to succ; True if any was"""
+    threaded = False
+    for pred in list(block.preds):
+        terminator = pred.terminator
+        if succ in pred.succs or terminator.attr.count(block) != 1:
+            continue  # succ's phis could not tell the two edges from pred apart
+        terminator.attr = [succ if target is block else target for target in terminator.attr]
+        pred.succs = [succ if target is block else target for target in pred.succs]
+        block.preds.remove(pred)
+        succ.preds.append(pred)
+        for phi in succ.phis():
+            phi.attr.append(pred)
+            phi.args.append(phi.args[phi.attr.index(block)])
+        threaded = True
+    return threaded
+
+
+def cleanup(function):
+    """Runs the scalar passes until none changes the function"""
+    changed = True
+    while changed:
+        changed = propagate_copies(function)
+        changed = fold_constants(function) or changed
+        changed = eliminate_dead_code(function) or changed
+        changed = simplify_cfg(function) or changed
+
+
+# ---------- Pipeline ----------
+
+def optimize_module(module, inline_calls=True, budget=inline.DEFAULT_BUDGET, loop_passes=True):
+    """Optimizes every function of an SSA module in place; returns (inlining decisions, loops.Loop list)"""
+    inliner = inline.Inliner(module, budget)
+    decisions = []
+    found = []
+    for function in inline.bottom_up(module):
+        cleanup(function)
+        if inline_calls and inliner.inline_calls(function, decisions):
+            cleanup(function)
+        if loop_passes:
+            found += loops.optimize_loops(function)
+            cleanup(function)
+    return decisions, found
+
+
+def compile_optimized(unit, inline_calls=True, budget=inline.DEFAULT_BUDGET):
+    """(Program, inlining decisions) for a Unit AST, compiled through the optimized IR"""
+    module = lower_unit(unit)
+    decisions, _ = optimize_module(module, inline_calls, budget)
+    return compile_module(module), decisions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Optimize an AtomC program and report the inlining decisions")
+    arg_parser.add_argument("path", help="AtomC source file")
+    arg_parser.add_argument("--no-inline", action="store_true", help="do not inline calls")
+    arg_parser.add_argument("--budget", type=int, default=inline.DEFAULT_BUDGET,
+                            help=f"size of the largest callee inlined (default {inline.DEFAULT_BUDGET}; "
+                                 f"{inline.HOT_FACTOR}x that for calls in loops)")
+    arg_parser.add_argument("--no-loops", action="store_true", help="do not optimize loops")
+    arg_parser.add_argument("--ir", action="store_true", help="print the optimized IR")
+    arg_parser.add_argument("--disassemble", action="store_true", help="print the bytecode compiled from it")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.path, 'r') as file:
+        code = file.read()
+    parser = Parser(tokenize(code), build_ast=True)
+    try:
+        parser.parse_unit()
+        module = lower_unit(parser.unit)
+        decisions, found = optimize_module(module, not args.no_inline, args.budget, not args.no_loops)
+        text = "\n\n".join(format_function(function) for function in module.functions.values())
+        program = compile_module(module) if args.disassemble else None  # Leaves SSA form
+    except SyntaxError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(inline.format_report(decisions))
+    if not args.no_loops:
+        print("\n" + loops.format_report(found))
+    if args.ir:
+        print("\n" + text)
+    if args.disassemble:
+        print("\n" + disassemble(program))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
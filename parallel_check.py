@@ -0,0 +1,199 @@
+"""
+Two-phase semantic checking of one AtomC unit, with the function bodies spread over a
+process pool.
+
+A function body only sees the structs, globals and functions declared before it, so:
+    1. A declaration pass parses and checks the global declarations and every function
+       signature, and skips each body by jumping to its matching '}'.
+    2. The bodies are split into contiguous chunks of similar token counts. A worker
+       repeats the declaration pass up to the end of its chunk and checks the chunk's
+       bodies at their place in it, so each body sees exactly the declarations the
+       sequential parser would have seen.
+
+Unlike Parser.parse_unit, which stops at the first error, an error in a body only ends
+that body: every body is checked and all diagnostics are returned sorted by line (then by
+token position). The first one is the error a sequential parse reports.
+
+Usage: python parallel_check.py [-j WORKERS] [--engine regex|dfa] FILE
+"""
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from lexical_analyzer import tokenize
+from syntactic_analyzer import Parser
+
+CHUNKS_PER_WORKER = 4  # Smaller chunks balance uneven bodies at the cost of more declaration passes
+LINE_PREFIX = re.compile(r"Line (\d+):")
+
+
+class Diagnostic:
+    def __init__(self, line, message, position):
+        self.line = line
+        self.message = message
+        self.position = position  # Token index where the error was raised, to order errors on one line
+
+    def __str__(self):
+        return self.message if LINE_PREFIX.match(self.message) else f"Line {self.line}: {self.message}"
+
+
+def matching_braces(tokens):
+    """Index of each '{' -> index of its matching '}'"""
+    closing = {}
+    opened = []
+    for index, (token_type, value, _) in enumerate(tokens):
+        if token_type == "DELIMITER":
+            if value == "{":
+                opened.append(index)
+            elif value == "}" and opened:
+                closing[opened.pop()] = index
+    return closing
+
+
+class ChunkDone(Exception):
+    """Raised once the last body of a worker's chunk has been checked"""
+
+
+class DeclarationParser(Parser):
+    """
+    Parser that checks the declarations and signatures of a unit but only the bodies of the
+    functions in `bodies` (0-based positions among the unit's functions); other bodies are
+    skipped. Errors in a checked body are recorded and parsing resumes after that body.
+    """
+
+    def __init__(self, tokens, bodies=(), closing=None):
+        super().__init__(tokens)
+        self.bodies = set(bodies)
+        self.closing = closing if closing is not None else matching_braces(tokens)
+        self.body_sizes = []  # Tokens in the body of each function declared so far
+        self.diagnostics = []
+
+    def diagnostic(self, e):
+        """Diagnostic of a SyntaxError raised at the current position"""
+        position = min(self.current_index, len(self.tokens) - 1)
+        match = LINE_PREFIX.match(str(e))
+        return Diagnostic(int(match.group(1)) if match else self.tokens[position][2], str(e), position)
+
+    def funcBody(self):
+        position = len(self.body_sizes)
+        start = self.current_index
+        end = self.closing.get(start)
+        if end is None:  # No '{' or unbalanced braces: fail exactly like the sequential parser
+            self.body_sizes.append(0)
+            return super().funcBody()
+        self.body_sizes.append(end - start + 1)
+        if position not in self.bodies:
+            self.current_index = end + 1
+            self.stm_node = None
+            return
+        try:
+            super().funcBody()
+        except SyntaxError as e:
+            self.diagnostics.append(self.diagnostic(e))
+            self.current_index = end + 1
+        if position == max(self.bodies):
+            raise ChunkDone()
+
+
+def declaration_pass(tokens, closing=None):
+    """Phase 1: (body token counts, diagnostics) of the declarations, all bodies skipped"""
+    parser = DeclarationParser(tokens, (), closing)
+    try:
+        parser.parse_unit()
+    except SyntaxError as e:
+        parser.diagnostics.append(parser.diagnostic(e))
+    return parser.body_sizes, parser.diagnostics
+
+
+def check_bodies(tokens, bodies, closing=None):
+    """Phase 2: diagnostics of the given function bodies"""
+    parser = DeclarationParser(tokens, bodies, closing)
+    try:
+        parser.parse_unit()
+    except ChunkDone:
+        pass
+    except SyntaxError:
+        pass  # A declaration error after the chunk, already reported by the declaration pass
+    return parser.diagnostics
+
+
+def split_chunks(sizes, count):
+    """Splits function positions into at most count contiguous chunks of similar token totals"""
+    total = sum(sizes)
+    chunks = []
+    chunk = []
+    weight = 0
+    for position, size in enumerate(sizes):
+        chunk.append(position)
+        weight += size
+        if weight * count >= total * (len(chunks) + 1) and len(chunks) < count - 1:
+            chunks.append(chunk)
+            chunk = []
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+# Tokens and brace map of the unit, sent once to each worker by the pool initializer
+_tokens = None
+_closing = None
+
+
+def _load_unit(tokens, closing):
+    global _tokens, _closing
+    _tokens = tokens
+    _closing = closing
+
+
+def _check_chunk(bodies):
+    return check_bodies(_tokens, bodies, _closing)
+
+
+def check_unit(tokens, workers=None):
+    """
+    Checks a tokenized unit in two phases and returns its diagnostics sorted by line; an
+    empty list means the unit is valid. workers: None for one per CPU, 1 for this process.
+    """
+    closing = matching_braces(tokens)
+    sizes, diagnostics = declaration_pass(tokens, closing)
+    workers = workers or os.cpu_count() or 1
+    chunks = split_chunks(sizes, workers * CHUNKS_PER_WORKER if workers > 1 else 1) if sizes else []
+
+    if workers == 1 or len(chunks) <= 1:
+        results = [check_bodies(tokens, chunk, closing) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_load_unit,
+                                 initargs=(tokens, closing)) as executor:
+            results = list(executor.map(_check_chunk, chunks))
+    for result in results:
+        diagnostics.extend(result)
+    diagnostics.sort(key=lambda diagnostic: (diagnostic.line, diagnostic.position))
+    return diagnostics
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Check an AtomC unit, function bodies in parallel")
+    arg_parser.add_argument("path", help="AtomC source file")
+    arg_parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    arg_parser.add_argument("--engine", choices=["regex", "dfa"], default="regex", help="lexer engine")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.path, 'r') as file:
+        code = file.read()
+    try:
+        tokens = tokenize(code, args.engine)
+    except SyntaxError as e:
+        print(e)
+        return 1
+    diagnostics = check_unit(tokens, args.workers)
+    for diagnostic in diagnostics:
+        print(diagnostic)
+    if not diagnostics:
+        print(f"OK     {args.path}")
+    return 1 if diagnostics else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
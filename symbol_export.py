@@ -0,0 +1,223 @@
+"""
+Streaming export of a unit's symbol table: every symbol ever defined, in definition order,
+the locals and arguments of each function included (they stay in the table after their
+scope is left) and tagged with their function.
+
+Each symbol becomes one record, encoded by one of the formats below and written through a
+single buffer that is flushed in large chunks:
+
+    text    the symbol table dump of Parser.print_symbol_table
+    jsonl   one JSON object per line
+    binary  "ATMS" + version, then per record: name, class, mem, depth, type, function,
+            args and members; strings are u16 length + UTF-8, a type is
+            (u8 base, i32 nElements, struct name) and all numbers are little endian
+
+Usage: python symbol_export.py FILE.c [--format text|jsonl|binary] [-o OUT]
+"""
+import argparse
+import io
+import json
+import struct
+import sys
+
+from syntactic_analyzer import (CLS_EXTFUNC, CLS_FUNC, CLS_STRUCT, CLS_VAR, MEM_ARG, MEM_GLOBAL, MEM_LOCAL, TB_CHAR,
+                                TB_DOUBLE, TB_INT, TB_STRUCT, TB_VOID, Parser)
+
+BUFFER_SIZE = 1 << 16
+MAGIC = b"ATMS"
+VERSION = 1
+SEPARATOR = "-" * 60
+
+TYPE_BASES = [TB_INT, TB_DOUBLE, TB_CHAR, TB_STRUCT, TB_VOID]
+CLASS_CODES = {CLS_VAR: 0, CLS_FUNC: 1, CLS_EXTFUNC: 2, CLS_STRUCT: 3}
+CLASS_NAMES = {code: cls for cls, code in CLASS_CODES.items()}
+MEMS = [None, MEM_GLOBAL, MEM_ARG, MEM_LOCAL]
+
+
+class SymbolRecord:
+    __slots__ = ("name", "cls", "type", "mem", "depth", "function", "args", "members")
+
+    def __init__(self, name, cls, type_, mem, depth, function=None, args=(), members=()):
+        self.name = name
+        self.cls = cls
+        self.type = type_  # (typeBase, nElements, struct name or None)
+        self.mem = mem
+        self.depth = depth
+        self.function = function  # Name of the function of an argument or local, else None
+        self.args = args  # (name, type) of each argument of a function
+        self.members = members  # (name, type) of each member of a struct
+
+    def as_dict(self):
+        return {"name": self.name, "class": self.cls, "type": type_dict(self.type), "mem": self.mem,
+                "depth": self.depth, "function": self.function,
+                "args": [{"name": name, "type": type_dict(t)} for name, t in self.args],
+                "members": [{"name": name, "type": type_dict(t)} for name, t in self.members]}
+
+
+def type_tuple(t):
+    return t.typeBase, t.nElements, t.structSymbol.name if t.structSymbol else None
+
+
+def type_dict(t):
+    base, n_elements, struct_name = t
+    return {"base": base, "elements": n_elements, "struct": struct_name}
+
+
+def symbol_records(symbols):
+    """SymbolRecord of each symbol of a SymbolTable, in definition order"""
+    function = None
+    for sym in symbols:
+        if sym.cls == CLS_FUNC:
+            function = sym.name  # Its arguments and locals follow it in the table
+        owner = function if sym.mem in (MEM_ARG, MEM_LOCAL) else None
+        args = [(arg.name, type_tuple(arg.type)) for arg in sym.args] if sym.cls in (CLS_FUNC, CLS_EXTFUNC) else ()
+        members = [(mem.name, type_tuple(mem.type)) for mem in sym.members] if sym.cls == CLS_STRUCT else ()
+        yield SymbolRecord(sym.name, sym.cls, type_tuple(sym.type), sym.mem, sym.depth, owner, args, members)
+
+
+# ---------- Formats ----------
+
+def encode_text(record):
+    base, n_elements, struct_name = record.type
+    lines = [f"Name: {record.name}",
+             f"  Class: {record.cls}",
+             f"  Type: {base}" + (f"[{n_elements}]" if n_elements != -1 else "")
+             + (f" (struct {struct_name})" if struct_name else ""),
+             f"  Mem: {record.mem}",
+             f"  Depth: {record.depth}"]
+    if record.cls in (CLS_FUNC, CLS_EXTFUNC):
+        lines.append("  Args:")
+        lines.extend(f"    - {name}: {t[0]}" for name, t in record.args)
+    if record.cls == CLS_STRUCT:
+        lines.append("  Members:")
+        lines.extend(f"    - {name}: {t[0]}" for name, t in record.members)
+    lines.append(SEPARATOR)
+    return "\n".join(lines) + "\n"
+
+
+_json_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def encode_jsonl(record):
+    return _json_encoder.encode(record.as_dict()) + "\n"
+
+
+def _pack_string(text):
+    data = text.encode() if text else b""
+    return struct.pack("<H", len(data)) + data
+
+
+def _pack_type(t):
+    base, n_elements, struct_name = t
+    return struct.pack("<Bi", TYPE_BASES.index(base), n_elements) + _pack_string(struct_name)
+
+
+def encode_binary(record):
+    parts = [_pack_string(record.name),
+             struct.pack("<BBI", CLASS_CODES[record.cls], MEMS.index(record.mem), record.depth),
+             _pack_type(record.type), _pack_string(record.function)]
+    for fields in (record.args, record.members):
+        parts.append(struct.pack("<H", len(fields)))
+        for name, t in fields:
+            parts.append(_pack_string(name))
+            parts.append(_pack_type(t))
+    return b"".join(parts)
+
+
+# Format -> (encoder, header, footer); text formats are str, binary is bytes
+FORMATS = {
+    "text": (encode_text, "\n SYMBOL TABLE DUMP:\n" + SEPARATOR + "\n", ""),
+    "jsonl": (encode_jsonl, "", ""),
+    "binary": (encode_binary, MAGIC + struct.pack("<H", VERSION), b""),
+}
+
+
+def export(symbols, out, format="jsonl", buffer_size=BUFFER_SIZE):
+    """
+    Writes the records of a SymbolTable to out in the given format, in chunks of about
+    buffer_size. out is a text stream for text and jsonl (a binary stream gets them as
+    UTF-8) and a binary stream for binary.
+    """
+    encode, header, footer = FORMATS[format]
+    binary_out = not isinstance(out, io.TextIOBase)
+    if format == "binary" and not binary_out:
+        raise ValueError("the binary format needs a binary stream")
+    convert = (lambda text: text.encode()) if binary_out and format != "binary" else (lambda data: data)
+    empty = header[:0]
+
+    chunk = [header]
+    size = len(header)
+    for record in symbol_records(symbols):
+        data = encode(record)
+        chunk.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            out.write(convert(empty.join(chunk)))
+            chunk = []
+            size = 0
+    chunk.append(footer)
+    out.write(convert(empty.join(chunk)))
+
+
+def read_binary(data):
+    """SymbolRecords of a binary export"""
+    if data[:4] != MAGIC or struct.unpack_from("<H", data, 4)[0] != VERSION:
+        raise ValueError(f"not a symbol table export of version {VERSION}")
+    position = 6
+
+    def string():
+        nonlocal position
+        length = struct.unpack_from("<H", data, position)[0]
+        position += 2 + length
+        return bytes(data[position - length:position]).decode() or None
+
+    def type_():
+        nonlocal position
+        base, n_elements = struct.unpack_from("<Bi", data, position)
+        position += 5
+        return TYPE_BASES[base], n_elements, string()
+
+    def fields():
+        nonlocal position
+        count = struct.unpack_from("<H", data, position)[0]
+        position += 2
+        return [(string(), type_()) for _ in range(count)]
+
+    while position < len(data):
+        name = string()
+        cls, mem, depth = struct.unpack_from("<BBI", data, position)
+        position += 6
+        t = type_()
+        function = string()
+        yield SymbolRecord(name, CLASS_NAMES[cls], t, MEMS[mem], depth, function, fields(), fields())
+
+
+def main(argv=None):
+    from lexical_analyzer import tokenize
+
+    arg_parser = argparse.ArgumentParser(description="Export the symbol table of an AtomC unit")
+    arg_parser.add_argument("path", help="AtomC source file")
+    arg_parser.add_argument("--format", choices=list(FORMATS), default="jsonl")
+    arg_parser.add_argument("-o", "--output", default=None, help="output file (default: stdout)")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.path, 'r') as file:
+        code = file.read()
+    parser = Parser(tokenize(code))
+    try:
+        parser.parse_unit()
+    except SyntaxError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.output:
+        with open(args.output, "wb") as out:
+            export(parser.symbols, out, args.format)
+    else:
+        sys.stdout.flush()
+        export(parser.symbols, sys.stdout.buffer, args.format)
+        sys.stdout.buffer.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
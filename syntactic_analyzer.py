@@ -1,15 +1,12 @@
-current_index = 0  # Track token position
+import math
+import sys
+
+from ast_nodes import (Assign, Binary, Block, Break, Call, Cast, Const, ExprStm, For, FuncDecl, If, Index, Member,
+                       Return, StructDecl, Unary, Unit, Var, VarDecl, While)
 
 TYPES = ["CT_INT", "CT_REAL", "CT_STRING", "CT_CHAR"]  # Supported types
 SPECIAL_FUNCTIONS = ["put_i", "put_s", "get_i", "put_c", "get_c", "put_d", "get_d", "seconds"]
 
-# Global semantic state
-symbols = []  # Stack of all defined symbols (global + locals)
-crtDepth = 0  # Current scope level
-crtStruct = None  # Pointer to current struct
-crtFunc = None  # Pointer to current function
-maxDepth = 0  # Maximum depth of nested scopes
-
 CLS_VAR = "var"
 CLS_FUNC = "func"
 CLS_EXTFUNC = "extfunc"
@@ -23,6 +20,9 @@ TB_CHAR = "char"
 TB_STRUCT = "struct"
 TB_VOID = "void"
 
+ESCAPES = {'a': '\a', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v',
+           "'": "'", '"': '"', '?': '?', '\\': '\\', '0': '\0'}
+
 
 class Type:
     def __init__(self, typeBase, nElements=-1, structSymbol=None):
@@ -57,36 +57,71 @@ class Symbol:
         self.members = []  # For structs
 
 
-def createType(typeBase, nElements=-1, structSymbol=None):
-    """Create a new Type object"""
-    return Type(typeBase, nElements, structSymbol)
+class SymbolTable:
+    """
+    Hashed, scoped symbol table. Each name maps to the chain of its visible symbols (innermost
+    last) and each depth keeps its visible symbols by name, so lookup, insertion and leaving a
+    scope are O(1) amortized. Iterating yields every symbol ever added in definition order,
+    including those of scopes already left, which is what print_symbol_table dumps.
+    """
 
+    def __init__(self):
+        self.chains = {}  # name -> visible symbols with that name, most recent last
+        self.scopes = {}  # depth -> {name: symbol} of the visible symbols at that depth
+        self.order = []  # All symbols in definition order
+
+    def add(self, sym):
+        self.chains.setdefault(sym.name, []).append(sym)
+        self.scopes.setdefault(sym.depth, {})[sym.name] = sym
+        self.order.append(sym)
+
+    def find(self, name, depth=None):
+        if depth is not None:
+            return self.scopes.get(depth, {}).get(name)
+        chain = self.chains.get(name)
+        return chain[-1] if chain else None
+
+    def defines(self, name, depth):
+        """True if name is already defined at the given depth"""
+        return name in self.scopes.get(depth, {})
+
+    def exitScope(self, depth):
+        """Hide all symbols defined at depth from lookups"""
+        for name, sym in self.scopes.pop(depth, {}).items():
+            chain = self.chains[name]
+            if chain[-1] is sym:
+                chain.pop()
+            else:
+                chain.remove(sym)
+            if not chain:
+                del self.chains[name]
 
-def findSymbol(name, scope=None, depth=None):
-    scope = scope or symbols
-    for sym in reversed(scope):
-        if sym.name == name and (depth is None or sym.depth == depth):
-            return sym
-    return None
+    def __iter__(self):
+        return iter(self.order)
 
+    def __len__(self):
+        return len(self.order)
 
-def addSymbol(name, cls, type_, mem, scope=None):
-    scope = scope or symbols
-    if any(s.name == name and s.depth == crtDepth for s in scope):
-        raise SyntaxError(f"Symbol redefinition: {name}")
-    if (mem == MEM_GLOBAL):
-        sym = Symbol(name, cls, type_, mem, 0)  # Global symbols have depth 0
-    else:
-        sym = Symbol(name, cls, type_, mem, crtDepth)
-    scope.append(sym)
-    return sym
 
+def createType(typeBase, nElements=-1, structSymbol=None):
+    """Create a new Type object"""
+    return Type(typeBase, nElements, structSymbol)
 
-def addExtFunc(name, type_):
-    """Add external/predefined function"""
-    s = addSymbol(name, CLS_EXTFUNC, type_, None)
-    s.args = []
-    return s
+
+def unescape(text):
+    """Replaces the escape sequences in the body of a char or string literal"""
+    if '\\' not in text:
+        return text
+    chars = []
+    i = 0
+    while i < len(text):
+        if text[i] == '\\' and i + 1 < len(text):
+            chars.append(ESCAPES.get(text[i + 1], text[i + 1]))
+            i += 2
+        else:
+            chars.append(text[i])
+            i += 1
+    return "".join(chars)
 
 
 def addFuncArg(func, name, type_):
@@ -96,41 +131,6 @@ def addFuncArg(func, name, type_):
     return arg
 
 
-def addExtFuncs():
-    """Add predefined functions to symbol table"""
-    # void put_s(char s[])
-    s = addExtFunc("put_s", createType(TB_VOID))
-    addFuncArg(s, "s", createType(TB_CHAR, 0))
-
-    # void get_s(char s[])
-    s = addExtFunc("get_s", createType(TB_VOID))
-    addFuncArg(s, "s", createType(TB_CHAR, 0))
-
-    # void put_i(int i)
-    s = addExtFunc("put_i", createType(TB_VOID))
-    addFuncArg(s, "i", createType(TB_INT))
-
-    # int get_i()
-    s = addExtFunc("get_i", createType(TB_INT))
-
-    # void put_d(double d)
-    s = addExtFunc("put_d", createType(TB_VOID))
-    addFuncArg(s, "d", createType(TB_DOUBLE))
-
-    # double get_d()
-    s = addExtFunc("get_d", createType(TB_DOUBLE))
-
-    # void put_c(char c)
-    s = addExtFunc("put_c", createType(TB_VOID))
-    addFuncArg(s, "c", createType(TB_CHAR))
-
-    # char get_c()
-    s = addExtFunc("get_c", createType(TB_CHAR))
-
-    # double seconds()
-    s = addExtFunc("seconds", createType(TB_DOUBLE))
-
-
 def cast(dst, src):
     """Type casting function - checks if src can be converted to dst"""
     # Arrays can only be converted to same type arrays
@@ -173,860 +173,989 @@ def getArithType(s1, s2):
         return createType(TB_CHAR)
 
 
-def deleteSymbolsAfter(start_index):
-    global symbols
-    symbols = symbols[:start_index]
-
-
-def addVar(name, type_):
-    global crtFunc, crtStruct
-    if crtStruct:
-        if findSymbol(name, scope=crtStruct.members):
-            raise SyntaxError(f"Struct member redefinition: {name}")
-        crtStruct.members.append(Symbol(name, CLS_VAR, type_, None, 1))
-    elif crtFunc:
-        if any(sym.name == name and sym.depth == crtDepth for sym in symbols):
-            print_symbol_table()
-            print(f"Current function: {crtFunc.name} at depth {crtDepth}")
-            raise SyntaxError(f"Variable redefinition in function: {name}")
-        addSymbol(name, CLS_VAR, type_, MEM_LOCAL)
-    else:
-        if findSymbol(name):
-            raise SyntaxError(f"Global variable redefinition: {name}")
-        addSymbol(name, CLS_VAR, type_, MEM_GLOBAL)
-
-
-def print_symbol_table():
-    print("\n SYMBOL TABLE DUMP:")
-    print("-" * 60)
-    for sym in symbols:
-        print(f"Name: {sym.name}")
-        print(f"  Class: {sym.cls}")
-        print(f"  Type: {sym.type.typeBase}", end='')
-        if sym.type.nElements != -1:
-            print(f"[{sym.type.nElements}]", end='')
-        if sym.type.structSymbol:
-            print(f" (struct {sym.type.structSymbol.name})", end='')
-        print()
-        print(f"  Mem: {sym.mem}")
-        print(f"  Depth: {sym.depth}")
-        if sym.cls in [CLS_FUNC, CLS_EXTFUNC]:
-            print("  Args:")
-            for arg in sym.args:
-                print(f"    - {arg.name}: {arg.type.typeBase}")
-        if sym.cls == CLS_STRUCT:
-            print("  Members:")
-            for mem in sym.members:
-                print(f"    - {mem.name}: {mem.type.typeBase}")
-        print("-" * 60)
-
-
-# ---------- Token Helpers ----------
-
-def current_token(tokens):
-    global current_index
-    return tokens[current_index] if current_index < len(tokens) else ("EOF", "EOF", -1)
-
-
-def consume(tokens, expected_type, expected_value=None):
-    global current_index
-    if current_index >= len(tokens):
-        return False
-    token_type, token_value, _ = tokens[current_index]
-    if token_type == expected_type and (expected_value is None or token_value == expected_value):
-        current_index += 1
-        return True
-    return False
-
-
-# ---------- Grammar Parsing Functions ----------
-def parse_unit(tokens):
-    global current_index
-    # Add predefined functions
-    addExtFuncs()
-
-    while current_token(tokens)[0] != "EOF":
-        token = current_token(tokens)
-        if token[0] == "KEYWORD" and token[1] == "struct":
-            if declStruct(tokens):
-                continue  # Restart the loop to check all cases
-            elif declVar(tokens):
-                continue
-            else:
-                raise SyntaxError(f"Line {token[2]}: Unexpected token {token}")
-        if token[0] == "KEYWORD" and token[1] in ["int", "char", "double", "void"]:
-            if declFunc(tokens):  # Check for function declaration
-                continue  # Restart the loop
-            if declVar(tokens):  # Check for variable declaration
-                continue  # Restart the loop
-            raise SyntaxError("Invalid declaration")
-        else:
-            raise SyntaxError(f"Line {token[2]}: Unexpected token {token}")
-    if not consume(tokens, "EOF"):
-        raise SyntaxError("Expected 'EOF' token at the end of the program")
-    print(" Program parsed successfully!")
-
-
-# ---------- declStruct: STRUCT ID LACC declVar* RACC SEMICOLON ----------
-def declStruct(tokens):
-    global crtStruct, current_index
-    clone_index = current_index
-    start_index = len(symbols)
-
-    if not consume(tokens, "KEYWORD", "struct"): return False
-    if not consume(tokens, "IDENTIFIER"):
-        raise SyntaxError("Missing struct name")
-
-    name = tokens[current_index - 1][1]
+ARITHMETIC_OPS = {"+", "-", "*", "/"}
+FOLD_OPS = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "<": lambda a, b: int(a < b),
+    "<=": lambda a, b: int(a <= b),
+    ">": lambda a, b: int(a > b),
+    ">=": lambda a, b: int(a >= b),
+    "==": lambda a, b: int(a == b),
+    "!=": lambda a, b: int(a != b),
+    "&&": lambda a, b: int(bool(a) and bool(b)),
+    "||": lambda a, b: int(bool(a) or bool(b)),
+}
 
-    if not consume(tokens, "DELIMITER", "{"):
-        current_index = clone_index
-        return False  # Not a struct definition
 
-    if findSymbol(name):
-        raise SyntaxError(f"Symbol redefinition: {name}")
+def ctValue(rv):
+    """Python value of a constant scalar expression"""
+    return rv.ctVal.d if rv.type.typeBase == TB_DOUBLE else rv.ctVal.i
 
-    type_ = Type(TB_STRUCT)
-    struct_sym = addSymbol(name, CLS_STRUCT, type_, None)
-    type_.structSymbol = struct_sym  # Set the struct symbol reference
-    crtStruct = struct_sym
-    struct_sym.members = []  # Init inner scope for members
 
-    while declVar(tokens): pass
+def wrap_int(value):
+    """value as a 32 bit two's complement int"""
+    return (value + 0x80000000 & 0xFFFFFFFF) - 0x80000000
 
-    if not consume(tokens, "DELIMITER", "}"): raise SyntaxError("Expected '}'")
-    if not consume(tokens, "DELIMITER", ";"): raise SyntaxError("Expected ';'")
 
-    crtStruct = None
-    return True
+def isScalarCt(rv):
+    return rv.isCtVal and rv.type.nElements == -1 and rv.type.typeBase in [TB_CHAR, TB_INT, TB_DOUBLE]
 
 
-# ---------- declVar: typeBase ID arrayDecl? ( COMMA ID arrayDecl? )* SEMICOLON ----------
-def declVar(tokens):
-    global crtStruct, crtFunc
-    t = parse_type_base(tokens)
-    if not t:
-        return False
-
-    if not consume(tokens, "IDENTIFIER"):
-        raise SyntaxError("Missing variable name")
-    name = tokens[current_index - 1][1]
-
-    # Check for array declaration
-    array_info = arrayDecl(tokens)
-    if array_info is not None:
-        t.nElements = array_info
-    else:
-        t.nElements = -1
-
-    addVar(name, t)
-
-    while consume(tokens, "DELIMITER", ","):
-        if not consume(tokens, "IDENTIFIER"):
-            raise SyntaxError("Missing variable name after ','")
-        name = tokens[current_index - 1][1]
-
-        # Create new type for each variable
-        temp_type = Type(t.typeBase, -1, t.structSymbol)
-        array_info = arrayDecl(tokens)
-        if array_info is not None:
-            temp_type.nElements = array_info
-
-        addVar(name, temp_type)
-
-    if not consume(tokens, "DELIMITER", ";"):
-        raise SyntaxError("Expected ';'")
-    return True
-
-
-def parse_type_base(
-        tokens):  # if next token is a type (int | double | char | struct ID): return Type object, else return None
-    global current_index
-    if consume(tokens, "KEYWORD", "int"):
-        return Type(TB_INT)
-    if consume(tokens, "KEYWORD", "double"):
-        return Type(TB_DOUBLE)
-    if consume(tokens, "KEYWORD", "char"):
-        return Type(TB_CHAR)
-    if consume(tokens, "KEYWORD", "struct"):
-        if not consume(tokens, "IDENTIFIER"):
-            raise SyntaxError("Expected struct name")
-        struct_name = tokens[current_index - 1][1]
-        s = findSymbol(struct_name)
-        if not s:
-            raise SyntaxError(f"Undefined struct: {struct_name}")
-        if s.cls != CLS_STRUCT:
-            raise SyntaxError(f"{struct_name} is not a struct")
-        return Type(TB_STRUCT, -1, s)
-    return None
-
-
-# ---------- typeBase: INT | DOUBLE | CHAR | STRUCT ID ----------
-def typeBase(tokens):  # returns True if next token is a type (int | double | char | struct ID), else False
-    global current_index
-    start_index = current_index
-    t = parse_type_base(tokens)
-    current_index = start_index  # Restore state
-    return t is not None
-
-
-# ---------- arrayDecl: LBRACKET expr? RBRACKET ----------
-def arrayDecl(tokens):
-    global current_index
-    if not consume(tokens, "DELIMITER", "["):
+def foldBinary(op, rv1, rv2, type_):
+    """
+    Value of `rv1 op rv2` when both are constants, computed in type_ like at run time (int
+    arithmetic wraps to 32 bits); None if it must be left to run time
+    """
+    if not isScalarCt(rv1) or not isScalarCt(rv2):
         return None
-
-    # Try to parse a constant expression for the array size
-    size = parseConstExpr(tokens)
-    if size is not None:
-        if not isinstance(size, int) or size <= 0:
-            raise SyntaxError("Array size must be a positive constant")
-    else:
-        size = 0  # Array without given size
-
-    if not consume(tokens, "DELIMITER", "]"):
-        raise SyntaxError("Expected ']'")
-    return size
-
-def parseConstExpr(tokens):
-    global current_index
-    start_index = current_index
-    expr_str = ""
-    paren_count = 0
-    while current_index < len(tokens):
-        token_type, token_value, _ = tokens[current_index]
-        if token_type == "DELIMITER" and token_value == "]" and paren_count == 0:
-            break
-        if token_type == "DELIMITER" and token_value == "(":
-            paren_count += 1
-        if token_type == "DELIMITER" and token_value == ")":
-            paren_count -= 1
-        if token_type == "CT_INT":
-            expr_str += token_value
-        elif token_type == "OPERATOR" and token_value in "+-*/%":
-            expr_str += token_value
-        elif token_type == "DELIMITER" and token_value in "()":
-            expr_str += token_value
-        else:
-            break
-        current_index += 1
-    if not expr_str:
-        current_index = start_index
+    a, b = ctValue(rv1), ctValue(rv2)
+    if type_.typeBase == TB_DOUBLE and op in ARITHMETIC_OPS:
+        a, b = float(a), float(b)
+    if op == "/":
+        if b == 0:
+            return None  # Reported at run time, like any other division by zero
+        if type_.typeBase == TB_DOUBLE:
+            return a / b
+        q = abs(a) // abs(b)
+        return wrap_int(q if (a < 0) == (b < 0) else -q)  # C division truncates toward zero
+    value = FOLD_OPS[op](a, b)
+    return wrap_int(value) if op in ARITHMETIC_OPS and type_.typeBase != TB_DOUBLE else value
+
+
+def foldCast(type_, rv):
+    """Value of the constant rv converted to type_, or None"""
+    if not isScalarCt(rv) or type_.nElements > -1 or type_.typeBase not in [TB_CHAR, TB_INT, TB_DOUBLE]:
         return None
-    try:
-        # Evaluate the expression safely
-        value = eval(expr_str, {"__builtins__": None}, {})
-        return int(value)
-    except Exception:
-        raise SyntaxError("Invalid constant expression for array size")
-
-
-# ---------- typeName: typeBase arrayDecl? ----------
-def typeName(tokens):
-    t = parse_type_base(tokens)
-    if not t:
+    value = ctValue(rv)
+    if type_.typeBase == TB_DOUBLE:
+        return float(value)
+    if isinstance(value, float) and not math.isfinite(value):
+        return None  # The conversion fails at run time
+    if type_.typeBase == TB_CHAR:
+        return int(value) & 0xFF
+    return wrap_int(int(value))
+
+
+def checkLogic(t1, t2):
+    if t1.typeBase == TB_STRUCT or t2.typeBase == TB_STRUCT:
+        raise SyntaxError("a structure cannot be logically tested")
+    return createType(TB_INT)
+
+
+def checkEquality(t1, t2):
+    if t1.typeBase == TB_STRUCT or t2.typeBase == TB_STRUCT:
+        raise SyntaxError("a structure cannot be compared")
+    return createType(TB_INT)
+
+
+def checkRelational(t1, t2):
+    if t1.nElements > -1 or t2.nElements > -1:
+        raise SyntaxError("an array cannot be compared")
+    if t1.typeBase == TB_STRUCT or t2.typeBase == TB_STRUCT:
+        raise SyntaxError("a structure cannot be compared")
+    return createType(TB_INT)
+
+
+def checkAdditive(t1, t2):
+    if t1.nElements > -1 or t2.nElements > -1:
+        raise SyntaxError("an array cannot be added or subtracted")
+    if t1.typeBase == TB_STRUCT or t2.typeBase == TB_STRUCT:
+        raise SyntaxError("a structure cannot be added or subtracted")
+    return getArithType(t1, t2)
+
+
+def checkMultiplicative(t1, t2):
+    if t1.nElements > -1 or t2.nElements > -1:
+        raise SyntaxError("an array cannot be multiplied or divided")
+    if t1.typeBase == TB_STRUCT or t2.typeBase == TB_STRUCT:
+        raise SyntaxError("a structure cannot be multiplied or divided")
+    return getArithType(t1, t2)
+
+
+class BinaryOp:
+    def __init__(self, precedence, check, operand_error):
+        self.precedence = precedence  # Higher binds tighter; all binary operators are left associative
+        self.check = check  # (left type, right type) -> result type, raises SyntaxError
+        self.operand_error = operand_error  # Message when the right operand is missing
+
+
+BINARY_OPS = {
+    "||": BinaryOp(1, checkLogic, "Expected expression after '||'"),
+    "&&": BinaryOp(2, checkLogic, "Expected expression after '&&'"),
+    "==": BinaryOp(3, checkEquality, "Expected expression after equality operator"),
+    "!=": BinaryOp(3, checkEquality, "Expected expression after equality operator"),
+    "<": BinaryOp(4, checkRelational, "Expected expression after relational operator"),
+    "<=": BinaryOp(4, checkRelational, "Expected expression after relational operator"),
+    ">": BinaryOp(4, checkRelational, "Expected expression after relational operator"),
+    ">=": BinaryOp(4, checkRelational, "Expected expression after relational operator"),
+    "+": BinaryOp(5, checkAdditive, "Expected expression after '+' or '-'"),
+    "-": BinaryOp(5, checkAdditive, "Expected expression after '+' or '-'"),
+    "*": BinaryOp(6, checkMultiplicative, "Expected expression after '*' or '/'"),
+    "/": BinaryOp(6, checkMultiplicative, "Expected expression after '*' or '/'"),
+}
+
+
+class Parser:
+    """
+    Compilation context for one AtomC unit. The token list, the parse position and all semantic
+    state live on the instance, so separate Parser objects can compile units in the same process
+    or on different threads without sharing anything.
+    """
+
+    def __init__(self, tokens, build_ast=False, debug=False, imports=None):
+        self.tokens = tokens
+        self.current_index = 0  # Track token position
+        self.rescanned_tokens = 0  # Tokens handed back by rewind() to be parsed again
+        self.debug = debug  # Trace rules and dump the symbol table on redefinitions (main.py)
+        self.symbols = SymbolTable()  # All defined symbols (global + locals)
+        self.crtDepth = 0  # Current scope level
+        self.crtStruct = None  # Pointer to current struct
+        self.crtFunc = None  # Pointer to current function
+        self.loopDepth = 0  # Number of loops around the current statement, for break
+        self.maxDepth = 0  # Maximum depth of nested scopes
+        # Interface files (interface.py) searched for global names the unit does not define; when
+        # given, the predefined functions come from them instead of addExtFuncs
+        self.imports = imports
+        self.expr_return_value = RetVal()  # Type information of the last parsed expression
+
+        # AST construction (see ast_nodes), only done when build_ast is set
+        self.build_ast = build_ast
+        self.unit = None  # Unit node, once parse_unit has finished
+        self.expr_node = None  # Node of the last parsed expression
+        self.stm_node = None  # Node of the last parsed statement
+        self.decl_nodes = []  # Nodes of the last declStruct/declVar
+        self.crtLocals = []  # Local variables of the current function
+
+    def findSymbol(self, name, scope=None, depth=None):
+        if scope is not None:
+            return scope.find(name, depth)
+        sym = self.symbols.find(name, depth)
+        if sym is None and self.imports and depth is None:
+            sym = self.importSymbol(name)
+        return sym
+
+    def importSymbol(self, name):
+        """Adds the global symbol called name from the first import that declares it"""
+        for interface in self.imports:
+            sym = interface.find(name)
+            if sym is not None:
+                self.symbols.add(sym)
+                return sym
         return None
 
-    array_info = arrayDecl(tokens)
-    if array_info is not None:
-        t.nElements = array_info
-
-    return t
-
-
-# ---------- declFunc: ( typeBase MUL? | VOID ) ID ( funcArg ( , funcArg )* )? ) stmCompound ----------
-def declFunc(tokens):
-    global crtFunc, crtDepth, current_index, maxDepth
-    print(f"DeclFunc called {current_index}")
-    start_index = current_index
-
-    t = None
-    if consume(tokens, "KEYWORD", "void"):
-        t = Type(TB_VOID)
-    else:
-        t = parse_type_base(tokens)
-        if not t:
-            current_index = start_index
+    def addSymbol(self, name, cls, type_, mem, scope=None):
+        scope = scope if scope is not None else self.symbols
+        if scope.defines(name, self.crtDepth):
+            raise SyntaxError(f"Symbol redefinition: {name}")
+        if (mem == MEM_GLOBAL):
+            sym = Symbol(name, cls, type_, mem, 0)  # Global symbols have depth 0
+        else:
+            sym = Symbol(name, cls, type_, mem, self.crtDepth)
+        scope.add(sym)
+        return sym
+
+    def addExtFunc(self, name, type_):
+        """Add external/predefined function"""
+        s = self.addSymbol(name, CLS_EXTFUNC, type_, None)
+        s.args = []
+        return s
+
+    def addExtFuncs(self):
+        """Add predefined functions to symbol table"""
+        # void put_s(char s[])
+        s = self.addExtFunc("put_s", createType(TB_VOID))
+        addFuncArg(s, "s", createType(TB_CHAR, 0))
+
+        # void get_s(char s[])
+        s = self.addExtFunc("get_s", createType(TB_VOID))
+        addFuncArg(s, "s", createType(TB_CHAR, 0))
+
+        # void put_i(int i)
+        s = self.addExtFunc("put_i", createType(TB_VOID))
+        addFuncArg(s, "i", createType(TB_INT))
+
+        # int get_i()
+        s = self.addExtFunc("get_i", createType(TB_INT))
+
+        # void put_d(double d)
+        s = self.addExtFunc("put_d", createType(TB_VOID))
+        addFuncArg(s, "d", createType(TB_DOUBLE))
+
+        # double get_d()
+        s = self.addExtFunc("get_d", createType(TB_DOUBLE))
+
+        # void put_c(char c)
+        s = self.addExtFunc("put_c", createType(TB_VOID))
+        addFuncArg(s, "c", createType(TB_CHAR))
+
+        # char get_c()
+        s = self.addExtFunc("get_c", createType(TB_CHAR))
+
+        # double seconds()
+        s = self.addExtFunc("seconds", createType(TB_DOUBLE))
+
+    def addVar(self, name, type_):
+        if self.crtStruct:
+            if self.findSymbol(name, scope=self.crtStruct.members):
+                raise SyntaxError(f"Struct member redefinition: {name}")
+            sym = Symbol(name, CLS_VAR, type_, None, 1)
+            self.crtStruct.members.add(sym)
+            return sym
+        elif self.crtFunc:
+            if self.symbols.defines(name, self.crtDepth):
+                if self.debug:
+                    self.print_symbol_table()
+                    print(f"Current function: {self.crtFunc.name} at depth {self.crtDepth}")
+                raise SyntaxError(f"Variable redefinition in function: {name}")
+            sym = self.addSymbol(name, CLS_VAR, type_, MEM_LOCAL)
+            self.crtLocals.append(sym)
+            return sym
+        else:
+            if self.findSymbol(name):
+                raise SyntaxError(f"Global variable redefinition: {name}")
+            return self.addSymbol(name, CLS_VAR, type_, MEM_GLOBAL)
+
+    def foldResult(self, value, line):
+        """
+        Marks the last expression as the constant value (replacing its node with a Const),
+        or as not constant when value is None. Returns True when the expression was folded.
+        """
+        rv = self.expr_return_value
+        if value is None:
+            rv.isCtVal = False
             return False
-        if consume(tokens, "OPERATOR", "*"):
-            t.nElements = 0
+        rv.isCtVal = True
+        rv.ctVal = CtVal()
+        if rv.type.typeBase == TB_DOUBLE:
+            rv.ctVal.d = value
         else:
-            t.nElements = -1
-
-    if not consume(tokens, "IDENTIFIER"):
-        current_index = start_index
-        return False
-    name = tokens[current_index - 1][1]
-
-    if not consume(tokens, "DELIMITER", "("):
-        current_index = start_index
-        return False
-
-    if findSymbol(name):
-        raise SyntaxError(f"Symbol redefinition: {name}")
-
-    crtFunc = addSymbol(name, CLS_FUNC, t, None)
-    crtFunc.args = []
-
-    # Assign a unique depth for this function
-    maxDepth += 1
-    crtDepth = maxDepth
-
-    if funcArg(tokens):
-        while consume(tokens, "DELIMITER", ","):
-            if not funcArg(tokens):
-                raise SyntaxError("Invalid function argument")
+            rv.ctVal.i = value
+        self.expr_node = Const(value, rv.type, line) if self.build_ast else None
+        return True
 
-    if not consume(tokens, "DELIMITER", ")"):
-        raise SyntaxError("Expected ')'")
+    def print_symbol_table(self, out=None):
+        """Symbol table dump, written by symbol_export's text format (to stdout by default)"""
+        from symbol_export import export  # symbol_export imports this module
+        export(self.symbols, out if out is not None else sys.stdout, "text")
 
-    stmCompound(tokens)
-    deleteSymbolsAfter(len(symbols))  # Clean up locals
-    crtFunc = None
-    return True
+    # ---------- Token Helpers ----------
 
+    def current_token(self):
+        return self.tokens[self.current_index] if self.current_index < len(self.tokens) else ("EOF", "EOF", -1)
 
-# ---------- funcArg: typeBase ID arrayDecl? ----------
-def funcArg(tokens):
-    t = parse_type_base(tokens)
-    if not t:
+    def consume(self, expected_type, expected_value=None):
+        if self.current_index >= len(self.tokens):
+            return False
+        token_type, token_value, _ = self.tokens[self.current_index]
+        if token_type == expected_type and (expected_value is None or token_value == expected_value):
+            self.current_index += 1
+            return True
         return False
 
-    if not consume(tokens, "IDENTIFIER"):
-        raise SyntaxError("Expected argument name")
-    name = tokens[current_index - 1][1]
-
-    array_info = arrayDecl(tokens)
-    if array_info is not None:
-        t.nElements = array_info
-
-    # Define in global scope for semantic validation
-    s = addSymbol(name, CLS_VAR, t, MEM_ARG)
-    # Also save to the current function's arg list
-    print(f"Adding argument {name} of type {t.typeBase} to function {crtFunc.name} at depth {crtDepth}")
-    arg = Symbol(name, CLS_VAR, t, MEM_ARG, crtDepth)
-    crtFunc.args.append(arg)
-
-    return True
-
-
-# ---------- stmCompound: { (declVar | stm)* } ----------
-def stmCompound(tokens):
-    global crtDepth
-    if not consume(tokens, "DELIMITER", "{"): return False
-
-    while True:
-        if tokens[current_index][1] == "}": break
-        if not (declVar(tokens) or stm(tokens)):
-            raise SyntaxError(f"Unexpected token {tokens[current_index]} inside compound statement")
-    if not consume(tokens, "DELIMITER", "}"): raise SyntaxError("Expected '}'")
-    return True
-
-
-# ---------- stm: all statement forms ----------
-def stm(tokens):
-    global expr_return_value
-    print(f"Current token: {tokens[current_index]}")
-    if stmCompound(tokens): return True
-
-    if consume(tokens, "KEYWORD", "if"):
-        if not consume(tokens, "DELIMITER", "("): raise SyntaxError("Expected '(' after 'if'")
-        if not expr(tokens): raise SyntaxError("Expected expression in 'if'")
-
-        # Check if struct in logical test
-        if expr_return_value.type.typeBase == TB_STRUCT:
-            print (f"Line {tokens[current_index][2]}: {expr_return_value.type.typeBase}")
-            print (current_token(tokens))
-            raise SyntaxError("a structure cannot be logically tested")
-
-        if not consume(tokens, "DELIMITER", ")"): raise SyntaxError("Expected ')' after 'if'")
-        stm(tokens)
-        if consume(tokens, "KEYWORD", "else"):
-            stm(tokens)
-        return True
+    def peek(self, offset):
+        """(type, value) of the token `offset` positions after the current one, without consuming anything"""
+        index = self.current_index + offset
+        return self.tokens[index][:2] if index < len(self.tokens) else ("EOF", "EOF")
+
+    def rewind(self, index):
+        """Moves the parse position back to index, counting the tokens that will be scanned again"""
+        self.rescanned_tokens += self.current_index - index
+        self.current_index = index
+
+    def last_line(self):
+        """Line of the last consumed token"""
+        return self.tokens[self.current_index - 1][2]
+
+    # ---------- Grammar Parsing Functions ----------
+    # ---------- unit: ( declStruct | declFunc | declVar )* EOF ----------
+    # The next tokens decide the declaration without trial parsing: STRUCT ID LACC starts declStruct,
+    # otherwise the shared prefix `typeBase ID` (or `VOID ID`) is parsed once by declTyped.
+    def parse_unit(self):
+        # Add predefined functions
+        if self.imports is None:
+            self.addExtFuncs()
+        decls = []
+
+        while self.current_token()[0] != "EOF":
+            token = self.current_token()
+            if token[0] == "KEYWORD" and token[1] == "struct":
+                if self.peek(1)[0] != "IDENTIFIER":
+                    raise SyntaxError("Missing struct name")
+                if self.peek(2) == ("DELIMITER", "{"):
+                    self.declStruct()
+                else:
+                    self.declTyped()
+            elif token[0] == "KEYWORD" and token[1] in ["int", "char", "double", "void"]:
+                self.declTyped()
+            else:
+                raise SyntaxError(f"Line {token[2]}: Unexpected token {token}")
+            decls.extend(self.decl_nodes)
+        if not self.consume("EOF"):
+            raise SyntaxError("Expected 'EOF' token at the end of the program")
+        if self.build_ast:
+            self.unit = Unit(decls, self.symbols)
+        if self.debug:
+            print(" Program parsed successfully!")
+
+    # ---------- declTyped: ( typeBase MUL? | VOID ) ID, continued by declFunc or declVar ----------
+    def declTyped(self):
+        if self.consume("KEYWORD", "void"):
+            t = Type(TB_VOID)
+        else:
+            t = self.parse_type_base()
+            if self.consume("OPERATOR", "*"):
+                t.nElements = 0  # Only valid as a function result
+
+        if not self.consume("IDENTIFIER"):
+            raise SyntaxError("Invalid declaration" if t.typeBase == TB_VOID else "Missing variable name")
+        name = self.tokens[self.current_index - 1][1]
+        line = self.last_line()
+
+        if self.peek(0) == ("DELIMITER", "("):
+            return self.declFunc(t, name, line)
+        if t.typeBase == TB_VOID or t.nElements == 0:
+            raise SyntaxError("Invalid declaration")
+        return self.declVar(t, name, line)
 
-    if consume(tokens, "KEYWORD", "while"):
-        if not consume(tokens, "DELIMITER", "("): raise SyntaxError("Expected '(' after 'while'")
-        if not expr(tokens): raise SyntaxError("Expected expression in 'while'")
+    # ---------- declStruct: STRUCT ID LACC declVar* RACC SEMICOLON ----------
+    def declStruct(self):
+        if self.peek(0) != ("KEYWORD", "struct") or self.peek(2) != ("DELIMITER", "{"):
+            return False  # Not a struct definition
+        self.current_index += 1
+        if not self.consume("IDENTIFIER"):
+            raise SyntaxError("Missing struct name")
 
-        # Check if struct in logical test
-        if expr_return_value.type.typeBase == TB_STRUCT:
-            raise SyntaxError("a structure cannot be logically tested")
+        name = self.tokens[self.current_index - 1][1]
+        self.current_index += 1
 
-        if not consume(tokens, "DELIMITER", ")"): raise SyntaxError("Expected ')' after 'while'")
-        stm(tokens)
-        return True
+        if self.findSymbol(name):
+            raise SyntaxError(f"Symbol redefinition: {name}")
 
-    if consume(tokens, "KEYWORD", "for"):
-        if not consume(tokens, "DELIMITER", "("): raise SyntaxError("Expected '(' after 'for'")
-        expr(tokens)  # optional
-        if not consume(tokens, "DELIMITER", ";"): raise SyntaxError("Expected ';'")
+        type_ = Type(TB_STRUCT)
+        struct_sym = self.addSymbol(name, CLS_STRUCT, type_, None)
+        type_.structSymbol = struct_sym  # Set the struct symbol reference
+        self.crtStruct = struct_sym
+        struct_sym.members = SymbolTable()  # Init inner scope for members
 
-        if expr(tokens):  # optional condition
-            if expr_return_value.type.typeBase == TB_STRUCT:
-                raise SyntaxError("a structure cannot be logically tested")
+        while self.declVar(): pass
 
-        if not consume(tokens, "DELIMITER", ";"): raise SyntaxError("Expected ';'")
-        expr(tokens)  # optional
-        if not consume(tokens, "DELIMITER", ")"): raise SyntaxError("Expected ')'")
-        stm(tokens)
-        return True
+        if not self.consume("DELIMITER", "}"): raise SyntaxError("Expected '}'")
+        if not self.consume("DELIMITER", ";"): raise SyntaxError("Expected ';'")
 
-    if consume(tokens, "KEYWORD", "break"):
-        if not consume(tokens, "DELIMITER", ";"): raise SyntaxError("Expected ';' after 'break'")
+        self.crtStruct = None
+        self.decl_nodes = [StructDecl(struct_sym, self.last_line())] if self.build_ast else []
         return True
 
-    if consume(tokens, "KEYWORD", "return"):
-        if expr(tokens):  # optional return value
-            if crtFunc.type.typeBase == TB_VOID:
-                raise SyntaxError("a void function cannot return a value")
-            cast(crtFunc.type, expr_return_value.type)
-        if not consume(tokens, "DELIMITER", ";"): raise SyntaxError("Expected ';' after 'return'")
-        return True
+    # ---------- declVar: typeBase ID arrayDecl? ( COMMA ID arrayDecl? )* SEMICOLON ----------
+    def declVar(self, t=None, name=None, line=None):  # t, name, line: prefix already parsed by declTyped
+        if t is None:
+            t = self.parse_type_base()
+            if not t:
+                return False
 
-    expr_result = expr(tokens)
-    if not expr_result:
-        raise SyntaxError(f"Line {tokens[current_index][2]}: Expected expression before ';'")
-    if not consume(tokens, "DELIMITER", ";"):
-        raise SyntaxError("Expected ';'")
-    return True
+            if not self.consume("IDENTIFIER"):
+                raise SyntaxError("Missing variable name")
+            name = self.tokens[self.current_index - 1][1]
+            line = self.last_line()
 
+        # Check for array declaration
+        array_info = self.arrayDecl()
+        if array_info is not None:
+            t.nElements = array_info
+        else:
+            t.nElements = -1
 
-# Global variable to store expression return value
-expr_return_value = RetVal()
+        syms = [self.addVar(name, t)]
 
+        while self.consume("DELIMITER", ","):
+            if not self.consume("IDENTIFIER"):
+                raise SyntaxError("Missing variable name after ','")
+            name = self.tokens[self.current_index - 1][1]
 
-def expr(tokens):
-    global expr_return_value
-    result = exprAssign(tokens)
-    return result
+            # Create new type for each variable
+            temp_type = Type(t.typeBase, -1, t.structSymbol)
+            array_info = self.arrayDecl()
+            if array_info is not None:
+                temp_type.nElements = array_info
 
+            syms.append(self.addVar(name, temp_type))
 
-def exprAssign(tokens):
-    global current_index, expr_return_value
-    start_index = current_index
+        if not self.consume("DELIMITER", ";"):
+            raise SyntaxError("Expected ';'")
+        self.decl_nodes = [VarDecl(sym, line) for sym in syms] if self.build_ast else []
+        return True
 
-    if exprOr(tokens):  # Try left-hand side
-        rv1 = RetVal()
-        rv1.type = expr_return_value.type
-        rv1.isLVal = expr_return_value.isLVal
-        rv1.isCtVal = expr_return_value.isCtVal
-        rv1.ctVal = expr_return_value.ctVal
+    def parse_type_base(self):  # if next token is a type (int | double | char | struct ID): return Type object, else return None
+        if self.consume("KEYWORD", "int"):
+            return Type(TB_INT)
+        if self.consume("KEYWORD", "double"):
+            return Type(TB_DOUBLE)
+        if self.consume("KEYWORD", "char"):
+            return Type(TB_CHAR)
+        if self.consume("KEYWORD", "struct"):
+            if not self.consume("IDENTIFIER"):
+                raise SyntaxError("Expected struct name")
+            struct_name = self.tokens[self.current_index - 1][1]
+            s = self.findSymbol(struct_name)
+            if not s:
+                raise SyntaxError(f"Undefined struct: {struct_name}")
+            if s.cls != CLS_STRUCT:
+                raise SyntaxError(f"{struct_name} is not a struct")
+            return Type(TB_STRUCT, -1, s)
+        return None
 
-        if consume(tokens, "OPERATOR", "="):
-            if not rv1.isLVal:
-                raise SyntaxError("cannot assign to a non-lval")
+    # ---------- typeBase: INT | DOUBLE | CHAR | STRUCT ID ----------
+    def typeBase(self):  # returns True if next token starts a type (int | double | char | struct ID), else False
+        token_type, token_value = self.peek(0)
+        return token_type == "KEYWORD" and token_value in ["int", "double", "char", "struct"]
+
+    # ---------- arrayDecl: LBRACKET expr? RBRACKET ----------
+    def arrayDecl(self):
+        if not self.consume("DELIMITER", "["):
+            return None
+
+        # Try to parse a constant expression for the array size
+        size = self.parseConstExpr()
+        if size is not None:
+            if not isinstance(size, int) or size <= 0:
+                raise SyntaxError("Array size must be a positive constant")
+        else:
+            size = 0  # Array without given size
+
+        if not self.consume("DELIMITER", "]"):
+            raise SyntaxError("Expected ']'")
+        return size
+
+    def parseConstExpr(self):
+        """Value of the constant int/char expression of an array size, folded by the expression rules"""
+        if not self.expr():
+            return None
+        rv = self.expr_return_value
+        if not isScalarCt(rv) or rv.type.typeBase == TB_DOUBLE:
+            raise SyntaxError(f"Line {self.last_line()}: Invalid constant expression for array size")
+        return rv.ctVal.i
+
+    # ---------- typeName: typeBase arrayDecl? ----------
+    def typeName(self):
+        t = self.parse_type_base()
+        if not t:
+            return None
 
-            if exprAssign(tokens):
-                rv2 = expr_return_value
+        array_info = self.arrayDecl()
+        if array_info is not None:
+            t.nElements = array_info
 
-                # Check array assignment
-                if rv1.type.nElements > -1 or rv2.type.nElements > -1:
-                    raise SyntaxError("the arrays cannot be assigned")
+        return t
 
-                # Check type compatibility
-                cast(rv1.type, rv2.type)
+    # ---------- declFunc: ( typeBase MUL? | VOID ) ID LPAR ( funcArg ( , funcArg )* )? RPAR stmCompound ----------
+    def declFunc(self, t, name, line):  # Called by declTyped with the prefix up to ID already parsed
+        if self.debug:
+            print(f"DeclFunc called {self.current_index}")
+        if not self.consume("DELIMITER", "("):
+            return False
 
-                # Update return value
-                expr_return_value.type = rv1.type
-                expr_return_value.isLVal = False
-                expr_return_value.isCtVal = False
-                return True
-            else:
-                raise SyntaxError(f"Line {tokens[current_index][2]}: Invalid expression after '='")
-        else:
-            # Restore the original return value
-            expr_return_value = rv1
-        return True  # Just an OR-expression, not assignment
-    current_index = start_index
-    return False
+        if self.findSymbol(name):
+            raise SyntaxError(f"Symbol redefinition: {name}")
 
+        self.crtFunc = self.addSymbol(name, CLS_FUNC, t, None)
+        self.crtFunc.args = []
+        self.crtLocals = []
 
-def exprOr(tokens):
-    global current_index, expr_return_value
-    if not exprAnd(tokens):
-        return False
+        # Assign a unique depth for this function
+        self.maxDepth += 1
+        self.crtDepth = self.maxDepth
 
-    while consume(tokens, "OPERATOR", "||"):
-        rv1 = expr_return_value
-        if not exprAnd(tokens):
-            raise SyntaxError(f"Line {tokens[current_index][2]}: Expected expression after '||'")
-        rv2 = expr_return_value
+        if self.funcArg():
+            while self.consume("DELIMITER", ","):
+                if not self.funcArg():
+                    raise SyntaxError("Invalid function argument")
 
-        # Check struct in logical operation
-        if rv1.type.typeBase == TB_STRUCT or rv2.type.typeBase == TB_STRUCT:
-            raise SyntaxError("a structure cannot be logically tested")
+        if not self.consume("DELIMITER", ")"):
+            raise SyntaxError("Expected ')'")
 
-        # Result is int
-        expr_return_value.type = createType(TB_INT)
-        expr_return_value.isLVal = False
-        expr_return_value.isCtVal = False
-    return True
+        self.funcBody()
+        self.symbols.exitScope(self.crtDepth)  # Clean up args and locals
+        self.decl_nodes = [FuncDecl(self.crtFunc, self.stm_node, self.crtLocals, line)] if self.build_ast else []
+        self.crtFunc = None
+        return True
 
+    def funcBody(self):
+        """Body of the current function; parallel_check skips or isolates bodies by overriding it"""
+        self.stmCompound()
 
-def exprAnd(tokens):
-    global current_index, expr_return_value
-    if not exprEq(tokens):
-        return False
+    # ---------- funcArg: typeBase ID arrayDecl? ----------
+    def funcArg(self):
+        t = self.parse_type_base()
+        if not t:
+            return False
 
-    while consume(tokens, "OPERATOR", "&&"):
-        rv1 = expr_return_value
-        if not exprEq(tokens):
-            raise SyntaxError(f"Line {tokens[current_index][2]}: Expected expression after '&&'")
-        rv2 = expr_return_value
+        if not self.consume("IDENTIFIER"):
+            raise SyntaxError("Expected argument name")
+        name = self.tokens[self.current_index - 1][1]
 
-        # Check struct in logical operation
-        if rv1.type.typeBase == TB_STRUCT or rv2.type.typeBase == TB_STRUCT:
-            raise SyntaxError("a structure cannot be logically tested")
+        array_info = self.arrayDecl()
+        if array_info is not None:
+            t.nElements = array_info
 
-        # Result is int
-        expr_return_value.type = createType(TB_INT)
-        expr_return_value.isLVal = False
-        expr_return_value.isCtVal = False
-    return True
+        # Define in global scope for semantic validation
+        s = self.addSymbol(name, CLS_VAR, t, MEM_ARG)
+        # Also save to the current function's arg list, as the same symbol the body refers to
+        if self.debug:
+            print(f"Adding argument {name} of type {t.typeBase} to function {self.crtFunc.name} at depth {self.crtDepth}")
+        self.crtFunc.args.append(s)
 
+        return True
 
-def exprEq(tokens):
-    global current_index, expr_return_value
-    if not exprRel(tokens):
-        return False
+    # ---------- stmCompound: { (declVar | stm)* } ----------
+    def stmCompound(self):
+        if not self.consume("DELIMITER", "{"): return False
+        line = self.last_line()
+        items = []
+
+        while True:
+            if self.tokens[self.current_index][1] == "}": break
+            if self.declVar():
+                items.extend(self.decl_nodes)
+            elif self.stm():
+                if self.build_ast:
+                    items.append(self.stm_node)
+            else:
+                raise SyntaxError(f"Unexpected token {self.tokens[self.current_index]} inside compound statement")
+        if not self.consume("DELIMITER", "}"): raise SyntaxError("Expected '}'")
+        self.stm_node = Block(items, line) if self.build_ast else None
+        return True
 
-    while True:
-        if consume(tokens, "OPERATOR", "==") or consume(tokens, "OPERATOR", "!="):
-            rv1 = expr_return_value
-            if not exprRel(tokens):
-                raise SyntaxError(f"Line {tokens[current_index][2]}: Expected expression after equality operator")
-            rv2 = expr_return_value
+    # ---------- stm: all statement forms ----------
+    def stm(self):
+        if self.debug:
+            print(f"Current token: {self.tokens[self.current_index]}")
+        if self.stmCompound(): return True
 
-            # Check struct comparison
-            if rv1.type.typeBase == TB_STRUCT or rv2.type.typeBase == TB_STRUCT:
-                raise SyntaxError("a structure cannot be compared")
+        if self.consume("KEYWORD", "if"):
+            line = self.last_line()
+            if not self.consume("DELIMITER", "("): raise SyntaxError("Expected '(' after 'if'")
+            if not self.expr(): raise SyntaxError("Expected expression in 'if'")
+            cond = self.expr_node
 
-            # Result is int
-            expr_return_value.type = createType(TB_INT)
-            expr_return_value.isLVal = False
-            expr_return_value.isCtVal = False
-        else:
-            break
-    return True
+            # Check if struct in logical test
+            if self.expr_return_value.type.typeBase == TB_STRUCT:
+                raise SyntaxError("a structure cannot be logically tested")
 
+            if not self.consume("DELIMITER", ")"): raise SyntaxError("Expected ')' after 'if'")
+            self.stm()
+            then, orelse = self.stm_node, None
+            if self.consume("KEYWORD", "else"):
+                self.stm()
+                orelse = self.stm_node
+            self.stm_node = If(cond, then, orelse, line) if self.build_ast else None
+            return True
 
-def exprRel(tokens):
-    global current_index, expr_return_value
-    if not exprAdd(tokens):
-        return False
+        if self.consume("KEYWORD", "while"):
+            line = self.last_line()
+            if not self.consume("DELIMITER", "("): raise SyntaxError("Expected '(' after 'while'")
+            if not self.expr(): raise SyntaxError("Expected expression in 'while'")
+            cond = self.expr_node
 
-    while True:
-        if consume(tokens, "OPERATOR", "<") or consume(tokens, "OPERATOR", "<=") or \
-                consume(tokens, "OPERATOR", ">") or consume(tokens, "OPERATOR", ">="):
-            rv1 = expr_return_value
-            if not exprAdd(tokens):
-                raise SyntaxError(f"Line {tokens[current_index][2]}: Expected expression after relational operator")
-            rv2 = expr_return_value
+            # Check if struct in logical test
+            if self.expr_return_value.type.typeBase == TB_STRUCT:
+                raise SyntaxError("a structure cannot be logically tested")
 
-            # Check array comparison
-            if rv1.type.nElements > -1 or rv2.type.nElements > -1:
-                raise SyntaxError("an array cannot be compared")
+            if not self.consume("DELIMITER", ")"): raise SyntaxError("Expected ')' after 'while'")
+            self.loopDepth += 1
+            self.stm()
+            self.loopDepth -= 1
+            self.stm_node = While(cond, self.stm_node, line) if self.build_ast else None
+            return True
 
-            # Check struct comparison
-            if rv1.type.typeBase == TB_STRUCT or rv2.type.typeBase == TB_STRUCT:
-                raise SyntaxError("a structure cannot be compared")
+        if self.consume("KEYWORD", "for"):
+            line = self.last_line()
+            init = cond = step = None
+            if not self.consume("DELIMITER", "("): raise SyntaxError("Expected '(' after 'for'")
+            if self.expr():  # optional
+                init = self.expr_node
+            if not self.consume("DELIMITER", ";"): raise SyntaxError("Expected ';'")
+
+            if self.expr():  # optional condition
+                if self.expr_return_value.type.typeBase == TB_STRUCT:
+                    raise SyntaxError("a structure cannot be logically tested")
+                cond = self.expr_node
+
+            if not self.consume("DELIMITER", ";"): raise SyntaxError("Expected ';'")
+            if self.expr():  # optional
+                step = self.expr_node
+            if not self.consume("DELIMITER", ")"): raise SyntaxError("Expected ')'")
+            self.loopDepth += 1
+            self.stm()
+            self.loopDepth -= 1
+            self.stm_node = For(init, cond, step, self.stm_node, line) if self.build_ast else None
+            return True
 
-            # Result is int
-            expr_return_value.type = createType(TB_INT)
-            expr_return_value.isLVal = False
-            expr_return_value.isCtVal = False
-        else:
-            break
-    return True
+        if self.consume("KEYWORD", "break"):
+            line = self.last_line()
+            if not self.loopDepth:
+                raise SyntaxError(f"Line {line}: break outside a loop")
+            if not self.consume("DELIMITER", ";"): raise SyntaxError("Expected ';' after 'break'")
+            self.stm_node = Break(line) if self.build_ast else None
+            return True
 
+        if self.consume("KEYWORD", "return"):
+            line = self.last_line()
+            value = None
+            if self.expr():  # optional return value
+                if self.crtFunc.type.typeBase == TB_VOID:
+                    raise SyntaxError("a void function cannot return a value")
+                cast(self.crtFunc.type, self.expr_return_value.type)
+                value = self.expr_node
+            if not self.consume("DELIMITER", ";"): raise SyntaxError("Expected ';' after 'return'")
+            self.stm_node = Return(value, line) if self.build_ast else None
+            return True
 
-def exprAdd(tokens):
-    global current_index, expr_return_value
-    if not exprMul(tokens):
-        return False
+        line = self.current_token()[2]
+        expr_result = self.expr()
+        if not expr_result:
+            raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Expected expression before ';'")
+        if not self.consume("DELIMITER", ";"):
+            raise SyntaxError("Expected ';'")
+        self.stm_node = ExprStm(self.expr_node, line) if self.build_ast else None
+        return True
 
-    while True:
-        if consume(tokens, "OPERATOR", "+") or consume(tokens, "OPERATOR", "-"):
-            rv1 = expr_return_value
-            if not exprMul(tokens):
-                raise SyntaxError(f"Line {tokens[current_index][2]}: Expected expression after '+' or '-'")
-            rv2 = expr_return_value
-
-            # Check array arithmetic
-            if rv1.type.nElements > -1 or rv2.type.nElements > -1:
-                raise SyntaxError("an array cannot be added or subtracted")
-
-            # Check struct arithmetic
-            if rv1.type.typeBase == TB_STRUCT or rv2.type.typeBase == TB_STRUCT:
-                raise SyntaxError("a structure cannot be added or subtracted")
-
-            # Get arithmetic result type
-            expr_return_value.type = getArithType(rv1.type, rv2.type)
-            expr_return_value.isLVal = False
-            expr_return_value.isCtVal = False
-        else:
-            break
-    return True
+    def expr(self):
+        result = self.exprAssign()
+        return result
 
+    def exprAssign(self):
+        start_index = self.current_index
 
-def exprMul(tokens):
-    global current_index, expr_return_value
-    if not exprCast(tokens):
+        if self.exprBinary():  # Try left-hand side
+            rv1 = RetVal()
+            rv1.type = self.expr_return_value.type
+            rv1.isLVal = self.expr_return_value.isLVal
+            rv1.isCtVal = self.expr_return_value.isCtVal
+            rv1.ctVal = self.expr_return_value.ctVal
+            target = self.expr_node
+
+            if self.consume("OPERATOR", "="):
+                line = self.last_line()
+                if not rv1.isLVal:
+                    raise SyntaxError("cannot assign to a non-lval")
+
+                if self.exprAssign():
+                    rv2 = self.expr_return_value
+
+                    # Check array assignment
+                    if rv1.type.nElements > -1 or rv2.type.nElements > -1:
+                        raise SyntaxError("the arrays cannot be assigned")
+
+                    # Check type compatibility
+                    cast(rv1.type, rv2.type)
+
+                    # Update return value
+                    self.expr_return_value.type = rv1.type
+                    self.expr_return_value.isLVal = False
+                    self.expr_return_value.isCtVal = False
+                    self.expr_node = Assign(target, self.expr_node, rv1.type, line) if self.build_ast else None
+                    return True
+                else:
+                    raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Invalid expression after '='")
+            else:
+                # Restore the original return value
+                self.expr_return_value = rv1
+            return True  # Just an OR-expression, not assignment
+        self.rewind(start_index)
         return False
 
-    while True:
-        if consume(tokens, "OPERATOR", "*") or consume(tokens, "OPERATOR", "/"):
-            rv1 = expr_return_value
-            if not exprCast(tokens):
-                raise SyntaxError(f"Line {tokens[current_index][2]}: Expected expression after '*' or '/'")
-            rv2 = expr_return_value
-
-            # Check array arithmetic
-            if rv1.type.nElements > -1 or rv2.type.nElements > -1:
-                raise SyntaxError("an array cannot be multiplied or divided")
-
-            # Check struct arithmetic
-            if rv1.type.typeBase == TB_STRUCT or rv2.type.typeBase == TB_STRUCT:
-                raise SyntaxError("a structure cannot be multiplied or divided")
-
-            # Get arithmetic result type
-            expr_return_value.type = getArithType(rv1.type, rv2.type)
-            expr_return_value.isLVal = False
-            expr_return_value.isCtVal = False
-        else:
-            break
-    return True
-
+    # ---------- exprBinary: exprCast ( binaryOp exprCast )*, grouped by BINARY_OPS precedence ----------
+    # Replaces the exprOr -> exprAnd -> exprEq -> exprRel -> exprAdd -> exprMul chain: an operand costs
+    # one call here instead of one per precedence level, and nesting only grows when a tighter operator
+    # follows a looser one.
+    def exprBinary(self, min_precedence=1):
+        if not self.exprCast():
+            return False
 
-def exprCast(tokens):
-    global current_index, expr_return_value
-    start_index = current_index
+        tokens = self.tokens
+        while self.current_index < len(tokens):
+            token_type, op, _ = tokens[self.current_index]
+            binary = BINARY_OPS.get(op) if token_type == "OPERATOR" else None
+            if binary is None or binary.precedence < min_precedence:
+                break
+            self.current_index += 1
+            rv1 = self.expr_return_value
+            left, line = self.expr_node, self.last_line()
+            if not self.exprBinary(binary.precedence + 1):
+                raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: {binary.operand_error}")
+            rv2 = self.expr_return_value
+
+            # Semantic checks of the operator give the result type; constant operands are folded
+            t = binary.check(rv1.type, rv2.type)
+            value = foldBinary(op, rv1, rv2, t)
+            self.expr_return_value.type = t
+            self.expr_return_value.isLVal = False
+            if not self.foldResult(value, line):
+                self.expr_node = Binary(op, left, self.expr_node, t, line) if self.build_ast else None
+        return True
 
-    if consume(tokens, "DELIMITER", "("):
-        t = typeName(tokens)
-        if t:  # Type cast
-            if consume(tokens, "DELIMITER", ")"):
-                if exprCast(tokens):
-                    rv = expr_return_value
+    def exprCast(self):
+        # LPAR followed by a type keyword is a cast; any other LPAR is left to exprPrimary untouched
+        token_type, token_value = self.peek(1)
+        if self.peek(0) == ("DELIMITER", "(") and token_type == "KEYWORD" and \
+                token_value in ["int", "double", "char", "struct"]:
+            self.current_index += 1
+            line = self.last_line()
+            t = self.typeName()
+            if self.consume("DELIMITER", ")"):
+                if self.exprCast():
+                    rv = self.expr_return_value
 
                     # Check if cast is valid
                     cast(t, rv.type)
 
                     # Update return value with cast type
-                    expr_return_value.type = t
-                    expr_return_value.isLVal = False
-                    expr_return_value.isCtVal = False
+                    value = foldCast(t, rv)
+                    self.expr_return_value.type = t
+                    self.expr_return_value.isLVal = False
+                    if not self.foldResult(value, line):
+                        self.expr_node = Cast(self.expr_node, t, line) if self.build_ast else None
                     return True
                 else:
-                    raise SyntaxError(f"Line {tokens[current_index][2]}: Invalid expression after cast")
+                    raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Invalid expression after cast")
             else:
-                raise SyntaxError(f"Line {tokens[current_index][2]}: Missing ')' after type name")
-        else:
-            current_index = start_index  # Not a type cast — backtrack
-
-    return exprUnary(tokens)
-
-
-def exprUnary(tokens):
-    global current_index, expr_return_value
+                raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Missing ')' after type name")
+
+        return self.exprUnary()
+
+    def exprUnary(self):
+
+        if self.consume("OPERATOR", "-"):
+            line = self.last_line()
+            if not self.exprUnary():
+                raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Invalid operand for unary operator")
+
+            rv = self.expr_return_value
+
+            # Check if operand can be negated
+            if rv.type.nElements > -1:
+                raise SyntaxError("an array cannot be negated")
+            if rv.type.typeBase == TB_STRUCT:
+                raise SyntaxError("a structure cannot be negated")
+            if rv.type.typeBase not in [TB_CHAR, TB_INT, TB_DOUBLE]:
+                raise SyntaxError("invalid operand for unary minus")
+
+            # Result keeps the same type, not an lvalue
+            self.expr_return_value.isLVal = False
+            value = None
+            if isScalarCt(rv):
+                value = -ctValue(rv) if rv.type.typeBase == TB_DOUBLE else wrap_int(-ctValue(rv))
+            if not self.foldResult(value, line):
+                self.expr_node = Unary("-", self.expr_node, rv.type, line) if self.build_ast else None
+            return True
 
-    if consume(tokens, "OPERATOR", "-"):
-        if not exprUnary(tokens):
-            raise SyntaxError(f"Line {tokens[current_index][2]}: Invalid operand for unary operator")
+        elif self.consume("OPERATOR", "!"):
+            line = self.last_line()
+            if not self.exprUnary():
+                raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Invalid operand for unary operator")
 
-        rv = expr_return_value
+            rv = self.expr_return_value
 
-        # Check if operand can be negated
-        if rv.type.nElements > -1:
-            raise SyntaxError("an array cannot be negated")
-        if rv.type.typeBase == TB_STRUCT:
-            raise SyntaxError("a structure cannot be negated")
-        if rv.type.typeBase not in [TB_CHAR, TB_INT, TB_DOUBLE]:
-            raise SyntaxError("invalid operand for unary minus")
+            # Check if operand can be logically negated
+            if rv.type.typeBase == TB_STRUCT:
+                raise SyntaxError("a structure cannot be logically tested")
 
-        # Result keeps the same type, not an lvalue, not constant
-        expr_return_value.isLVal = False
-        expr_return_value.isCtVal = False
-        return True
+            # Result is int
+            value = int(not ctValue(rv)) if isScalarCt(rv) else None
+            self.expr_return_value.type = createType(TB_INT)
+            self.expr_return_value.isLVal = False
+            if not self.foldResult(value, line):
+                self.expr_node = Unary("!", self.expr_node, self.expr_return_value.type, line) if self.build_ast else None
+            return True
 
-    elif consume(tokens, "OPERATOR", "!"):
-        if not exprUnary(tokens):
-            raise SyntaxError(f"Line {tokens[current_index][2]}: Invalid operand for unary operator")
+        return self.exprPostfix()
 
-        rv = expr_return_value
+    def exprPostfix(self):
 
-        # Check if operand can be logically negated
-        if rv.type.typeBase == TB_STRUCT:
-            raise SyntaxError("a structure cannot be logically tested")
+        if not self.exprPrimary():
+            return False
 
-        # Result is int
-        expr_return_value.type = createType(TB_INT)
-        expr_return_value.isLVal = False
-        expr_return_value.isCtVal = False
-        return True
+        while True:
+            if self.consume("DELIMITER", "["):  # array indexing
+                base, line = self.expr_node, self.last_line()
+                # Save the array variable info before parsing index
+                rv1 = RetVal()
+                rv1.type = Type(self.expr_return_value.type.typeBase, self.expr_return_value.type.nElements,
+                                self.expr_return_value.type.structSymbol)
+                rv1.isLVal = self.expr_return_value.isLVal
+                rv1.isCtVal = self.expr_return_value.isCtVal
+                rv1.ctVal = self.expr_return_value.ctVal
 
-    return exprPostfix(tokens)
+                if not self.expr():
+                    raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Missing expression inside []")
 
+                rv2 = self.expr_return_value
 
-def exprPostfix(tokens):
-    global current_index, expr_return_value
+                # Check array indexing semantics
+                if rv1.type.nElements == -1:
+                    raise SyntaxError("only an array can be indexed")
+                if rv2.type.typeBase != TB_INT:
+                    raise SyntaxError("an array can only be indexed by an integer")
 
-    if not exprPrimary(tokens):
-        return False
+                if not self.consume("DELIMITER", "]"):
+                    raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Missing ']'")
 
-    while True:
-        if consume(tokens, "DELIMITER", "["):  # array indexing
-            # Save the array variable info before parsing index
-            rv1 = RetVal()
-            rv1.type = Type(expr_return_value.type.typeBase, expr_return_value.type.nElements,
-                            expr_return_value.type.structSymbol)
-            rv1.isLVal = expr_return_value.isLVal
-            rv1.isCtVal = expr_return_value.isCtVal
-            rv1.ctVal = expr_return_value.ctVal
+                # Result is the element type, is lvalue
+                self.expr_return_value.type = createType(rv1.type.typeBase, -1, rv1.type.structSymbol)
+                self.expr_return_value.isLVal = True
+                self.expr_return_value.isCtVal = False
+                self.expr_node = Index(base, self.expr_node, self.expr_return_value.type, line) if self.build_ast else None
 
-            if not expr(tokens):
-                raise SyntaxError(f"Line {tokens[current_index][2]}: Missing expression inside []")
+            elif self.consume("OPERATOR", "."):  # struct access
+                rv = self.expr_return_value
 
-            rv2 = expr_return_value
+                if rv.type.typeBase != TB_STRUCT:
+                    raise SyntaxError("a field can only be selected from a structure")
 
-            # Check array indexing semantics
-            if rv1.type.nElements == -1:
-                raise SyntaxError("only an array can be indexed")
-            if rv2.type.typeBase != TB_INT:
-                raise SyntaxError("an array can only be indexed by an integer")
+                if not self.consume("IDENTIFIER"):
+                    raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Expected field name after '.'")
 
-            if not consume(tokens, "DELIMITER", "]"):
-                raise SyntaxError(f"Line {tokens[current_index][2]}: Missing ']'")
+                field_name = self.tokens[self.current_index - 1][1]
 
-            # Result is the element type, is lvalue
-            expr_return_value.type = createType(rv1.type.typeBase, -1, rv1.type.structSymbol)
-            expr_return_value.isLVal = True
-            expr_return_value.isCtVal = False
+                # Find field in struct
+                field_symbol = self.findSymbol(field_name, scope=rv.type.structSymbol.members)
+                if not field_symbol:
+                    raise SyntaxError(f"undefined structure member: {field_name}")
 
-        elif consume(tokens, "OPERATOR", "."):  # struct access
-            rv = expr_return_value
+                # Result is the field type, is lvalue if original was lvalue
+                self.expr_return_value.type = field_symbol.type
+                self.expr_return_value.isLVal = rv.isLVal
+                self.expr_return_value.isCtVal = False
+                self.expr_node = Member(self.expr_node, field_symbol, self.last_line()) if self.build_ast else None
 
-            if rv.type.typeBase != TB_STRUCT:
-                raise SyntaxError("a field can only be selected from a structure")
-
-            if not consume(tokens, "IDENTIFIER"):
-                raise SyntaxError(f"Line {tokens[current_index][2]}: Expected field name after '.'")
-
-            field_name = tokens[current_index - 1][1]
+            else:
+                break
+        return True
 
-            # Find field in struct
-            field_symbol = findSymbol(field_name, scope=rv.type.structSymbol.members)
-            if not field_symbol:
-                raise SyntaxError(f"undefined structure member: {field_name}")
+    def exprPrimary(self):
+        # Every primary starts a fresh RetVal, so the operand results saved by the
+        # enclosing rules (rv1, call arguments) are not overwritten by the next operand
+
+        if self.consume("IDENTIFIER"):
+            name = self.tokens[self.current_index - 1][1]
+            line = self.last_line()
+
+            if self.consume("DELIMITER", "("):  # function call
+                sym = self.findSymbol(name)
+                if not sym:
+                    raise SyntaxError(f"undefined function: {name}")
+                if sym.cls not in [CLS_FUNC, CLS_EXTFUNC]:
+                    raise SyntaxError(f"{name} is not a function")
+
+                # Check arguments
+                args = []
+                arg_nodes = []
+                if self.expr():
+                    args.append(self.expr_return_value)
+                    arg_nodes.append(self.expr_node)
+                    while self.consume("DELIMITER", ","):
+                        if not self.expr():
+                            raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Expected argument expression after ','")
+                        args.append(self.expr_return_value)
+                        arg_nodes.append(self.expr_node)
+
+                if not self.consume("DELIMITER", ")"):
+                    raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Expected ')' after arguments")
+
+                # Check argument count and types
+                if len(args) != len(sym.args):
+                    raise SyntaxError(f"incorrect number of arguments for function {name}")
+
+                for i, (provided_arg, expected_arg) in enumerate(zip(args, sym.args)):
+                    try:
+                        cast(expected_arg.type, provided_arg.type)
+                    except SyntaxError:
+                        raise SyntaxError(f"incompatible type for argument {i + 1} of function {name}")
+
+                # Function call result
+                self.expr_return_value = RetVal()
+                self.expr_return_value.type = sym.type
+                self.expr_return_value.isLVal = False
+                self.expr_return_value.isCtVal = False
+                self.expr_node = Call(sym, arg_nodes, line) if self.build_ast else None
+                return True
 
-            # Result is the field type, is lvalue if original was lvalue
-            expr_return_value.type = field_symbol.type
-            expr_return_value.isLVal = rv.isLVal
-            expr_return_value.isCtVal = False
+            else:  # Variable reference
+                sym = self.findSymbol(name)
+                if not sym:
+                    raise SyntaxError(f"undefined symbol: {name}")
+                if sym.cls != CLS_VAR:
+                    raise SyntaxError(f"{name} is not a variable")
+
+                # Variable reference
+                self.expr_return_value = RetVal()
+                self.expr_return_value.type = sym.type
+                self.expr_return_value.isLVal = True
+                self.expr_return_value.isCtVal = False
+                self.expr_node = Var(sym, line) if self.build_ast else None
+                return True
 
-        else:
-            break
-    return True
-
-
-def exprPrimary(tokens):
-    global current_index, expr_return_value
-
-    if consume(tokens, "IDENTIFIER"):
-        name = tokens[current_index - 1][1]
-
-        if consume(tokens, "DELIMITER", "("):  # function call
-            sym = findSymbol(name)
-            if not sym:
-                raise SyntaxError(f"undefined function: {name}")
-            if sym.cls not in [CLS_FUNC, CLS_EXTFUNC]:
-                raise SyntaxError(f"{name} is not a function")
-
-            # Check arguments
-            args = []
-            if expr(tokens):
-                args.append(expr_return_value)
-                while consume(tokens, "DELIMITER", ","):
-                    if not expr(tokens):
-                        raise SyntaxError(f"Line {tokens[current_index][2]}: Expected argument expression after ','")
-                    args.append(expr_return_value)
-
-            if not consume(tokens, "DELIMITER", ")"):
-                raise SyntaxError(f"Line {tokens[current_index][2]}: Expected ')' after arguments")
-
-            # Check argument count and types
-            if len(args) != len(sym.args):
-                raise SyntaxError(f"incorrect number of arguments for function {name}")
-
-            for i, (provided_arg, expected_arg) in enumerate(zip(args, sym.args)):
-                try:
-                    cast(expected_arg.type, provided_arg.type)
-                except SyntaxError:
-                    raise SyntaxError(f"incompatible type for argument {i + 1} of function {name}")
-
-            # Function call result
-            expr_return_value.type = sym.type
-            expr_return_value.isLVal = False
-            expr_return_value.isCtVal = False
+        elif self.consume("CT_INT"):
+            value_str = self.tokens[self.current_index - 1][1]
+            if value_str.startswith("0x") or value_str.startswith("0X"):
+                value = int(value_str, 16)
+            elif value_str.startswith("0") and value_str != "0":
+                value = int(value_str, 8)
+            else:
+                value = int(value_str, 10)
+            self.expr_return_value = RetVal()
+            self.expr_return_value.type = createType(TB_INT)
+            self.expr_return_value.isLVal = False
+            self.expr_return_value.isCtVal = True
+            self.expr_return_value.ctVal.i = value
+            self.expr_node = Const(value, self.expr_return_value.type, self.last_line()) if self.build_ast else None
             return True
 
-        else:  # Variable reference
-            sym = findSymbol(name)
-            if not sym:
-                raise SyntaxError(f"undefined symbol: {name}")
-            if sym.cls != CLS_VAR:
-                raise SyntaxError(f"{name} is not a variable")
-
-            # Variable reference
-            expr_return_value.type = sym.type
-            expr_return_value.isLVal = True
-            expr_return_value.isCtVal = False
+        elif self.consume("CT_REAL"):
+            value = float(self.tokens[self.current_index - 1][1])
+            self.expr_return_value = RetVal()
+            self.expr_return_value.type = createType(TB_DOUBLE)
+            self.expr_return_value.isLVal = False
+            self.expr_return_value.isCtVal = True
+            self.expr_return_value.ctVal.d = value
+            self.expr_node = Const(value, self.expr_return_value.type, self.last_line()) if self.build_ast else None
             return True
 
-    elif consume(tokens, "CT_INT"):
-        value_str = tokens[current_index - 1][1]
-        if value_str.startswith("0x") or value_str.startswith("0X"):
-            value = int(value_str, 16)
-        elif value_str.startswith("0") and value_str != "0":
-            value = int(value_str, 8)
-        else:
-            value = int(value_str, 10)
-        expr_return_value.type = createType(TB_INT)
-        expr_return_value.isLVal = False
-        expr_return_value.isCtVal = True
-        expr_return_value.ctVal.i = value
-        return True
-
-    elif consume(tokens, "CT_REAL"):
-        value = float(tokens[current_index - 1][1])
-        expr_return_value.type = createType(TB_DOUBLE)
-        expr_return_value.isLVal = False
-        expr_return_value.isCtVal = True
-        expr_return_value.ctVal.d = value
-        return True
+        elif self.consume("CT_CHAR"):
+            value = self.tokens[self.current_index - 1][1]
+            self.expr_return_value = RetVal()
+            self.expr_return_value.type = createType(TB_CHAR)
+            self.expr_return_value.isLVal = False
+            self.expr_return_value.isCtVal = True
+            self.expr_return_value.ctVal.i = ord(unescape(value[1:-1]))  # Extract char from 'c'
+            self.expr_node = Const(self.expr_return_value.ctVal.i, self.expr_return_value.type,
+                                   self.last_line()) if self.build_ast else None
+            return True
 
-    elif consume(tokens, "CT_CHAR"):
-        value = tokens[current_index - 1][1]
-        expr_return_value.type = createType(TB_CHAR)
-        expr_return_value.isLVal = False
-        expr_return_value.isCtVal = True
-        expr_return_value.ctVal.i = ord(value[1]) if len(value) >= 3 else 0  # Extract char from 'c'
-        return True
+        elif self.consume("CT_STRING"):
+            value = self.tokens[self.current_index - 1][1]
+            self.expr_return_value = RetVal()
+            self.expr_return_value.type = createType(TB_CHAR, len(value) - 2)  # -2 for quotes
+            self.expr_return_value.isLVal = False
+            self.expr_return_value.isCtVal = True
+            self.expr_return_value.ctVal.str = unescape(value[1:-1])  # Remove quotes
+            self.expr_node = Const(self.expr_return_value.ctVal.str, self.expr_return_value.type,
+                                   self.last_line()) if self.build_ast else None
+            return True
 
-    elif consume(tokens, "CT_STRING"):
-        value = tokens[current_index - 1][1]
-        expr_return_value.type = createType(TB_CHAR, len(value) - 2)  # -2 for quotes
-        expr_return_value.isLVal = False
-        expr_return_value.isCtVal = True
-        expr_return_value.ctVal.str = value[1:-1]  # Remove quotes
-        return True
+        elif self.consume("DELIMITER", "("):
+            if not self.expr():
+                raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Expected expression inside parentheses")
+            if not self.consume("DELIMITER", ")"):
+                raise SyntaxError(f"Line {self.tokens[self.current_index][2]}: Expected ')' after expression")
+            return True
 
-    elif consume(tokens, "DELIMITER", "("):
-        if not expr(tokens):
-            raise SyntaxError(f"Line {tokens[current_index][2]}: Expected expression inside parentheses")
-        if not consume(tokens, "DELIMITER", ")"):
-            raise SyntaxError(f"Line {tokens[current_index][2]}: Expected ')' after expression")
-        return True
+        return False
 
-    return False
\ No newline at end of file
+def parse_unit(tokens, build_ast=False):
+    """Parses and checks a whole unit in a fresh Parser, which is returned for inspection"""
+    parser = Parser(tokens, build_ast)
+    parser.parse_unit()
+    return parser
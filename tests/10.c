@@ -0,0 +1,30 @@
+// int arithmetic wraps at 32 bits, in variables and in memory
+int		v[3];
+
+int		twice(int x)
+{
+	return x+x;
+}
+
+void main()
+{
+	int		i,big;
+	double	d;
+	big=2147483647;
+	i=big+1;
+	put_i(i);put_c(' ');
+	v[0]=big;v[0]=v[0]+1;
+	put_i(v[0]);put_c(' ');
+	put_i(twice(big));put_c(' ');
+	i=65536;
+	put_i(i*i+1);put_c(' ');
+	i=-big-1;
+	put_i(-i);put_c(' ');
+	put_i(i/-1);put_c(' ');
+	put_i(i-1);put_c(' ');
+	d=4294967297.5;
+	put_i((int)d);put_c(' ');
+	for(i=big-3;i>0;i=i+1)v[1]=v[1]+1;
+	put_i(i);put_c(' ');
+	put_i(v[1]);
+}
@@ -0,0 +1,27 @@
+// Arithmetic on chars is done on ints; the result is masked when it becomes a char again
+char	s[4];
+
+char	sum(char a,char b)
+{
+	return a+b;
+}
+
+void main()
+{
+	char	c;
+	c=200;
+	put_i(c+c);put_c(' ');
+	c=c+c;
+	put_i(c);put_c(' ');
+	c=10;
+	c=-c;
+	put_i(c);put_c(' ');
+	s[0]=200;
+	s[1]=s[0]*s[0];
+	put_i(s[1]);put_c(' ');
+	put_i(sum(s[0],s[0]));put_c(' ');
+	put_i((char)(s[0]+100));put_c(' ');
+	c=250;
+	c=c/2;
+	put_i(c);
+}
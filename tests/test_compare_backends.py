@@ -0,0 +1,56 @@
+import argparse
+import os
+import shutil
+
+import pytest
+
+import c_backend
+from compare_backends import DEFAULT_INPUT, DEFAULT_TIMEOUT, compare
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+ARGS = argparse.Namespace(cc=c_backend.DEFAULT_CC, timeout=DEFAULT_TIMEOUT)
+BACKENDS = ["opt", "jit"] + (["c"] if shutil.which(c_backend.DEFAULT_CC) else [])
+
+
+def test_lexical_error_skips_the_program(tmp_path):
+    path = tmp_path / "percent.c"
+    path.write_text("void main() { int x; x = 5 % 2; }")
+    assert compare(str(path), BACKENDS, DEFAULT_INPUT, ARGS) is None
+
+
+@pytest.mark.parametrize("name", ["10.c", "11.c"])  # int overflow, char arithmetic
+def test_backends_agree_on_wrapping(name):
+    assert compare(os.path.join(TESTS, name), BACKENDS, DEFAULT_INPUT, ARGS) == []
+
+
+def test_c_backend_wraps_division_and_conversions(tmp_path):
+    if "c" not in BACKENDS:
+        pytest.skip("no C compiler")
+    path = tmp_path / "wrap.c"
+    path.write_text("""
+    void main() {
+        int i; double d; char c;
+        i = -2147483647 - 1; put_i(i / -1); put_c(' ');
+        d = -3000000000.0; put_i((int)d); put_c(' ');
+        d = 1e30; put_i((int)d); put_c(' ');
+        d = 300.7; c = d; put_i(c); put_c(' ');
+        d = 1e308; d = d * 10; put_i((int)d);
+    }""")
+    assert compare(str(path), ["c"], DEFAULT_INPUT, ARGS) == []
+
+
+def test_backends_agree_on_a_valueless_return(tmp_path):
+    path = tmp_path / "return.c"
+    path.write_text("""
+    struct P { int x; double y; };
+    int f(int n) { if (n > 0) return; return n; }
+    double g(int n) { while (n) return; return 2.5; }
+    struct P h(int n) { struct P p; p.x = n; if (n) return; return p; }
+    void v(int n) { if (n) return; put_i(n); }
+    void main() {
+        struct P p;
+        put_i(f(3)); put_c(' '); put_d(g(1)); put_c(' ');
+        p = h(4); put_i(p.x); put_c(' '); put_d(p.y); put_c(' ');
+        v(1); v(0);
+    }""")
+    assert compare(str(path), BACKENDS, DEFAULT_INPUT, ARGS) == []
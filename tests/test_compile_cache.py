@@ -0,0 +1,51 @@
+import os
+import shutil
+
+import compile_cache
+from batch import compile_code
+from compile_cache import SOURCES, CacheEntry, CompileCache, compiler_version
+
+CODE = "void main() { put_i(1); }"
+
+
+def test_entries_round_trip(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    assert cache.get(CODE) is None
+    cache.put(CODE, CacheEntry(["tokens"], True))
+    entry = cache.get(CODE)
+    assert entry.ok and entry.tokens == ["tokens"]
+    assert cache.get(CODE + " ") is None
+
+
+def test_entries_of_another_compiler_version_are_not_read(tmp_path, monkeypatch):
+    cache = CompileCache(str(tmp_path))
+    cache.put(CODE, CacheEntry([], True))
+    monkeypatch.setattr(compile_cache, "COMPILER_VERSION", "other")
+    assert cache.get(CODE) is None
+
+
+def test_compiler_version_follows_the_sources(tmp_path):
+    here = os.path.dirname(compile_cache.__file__)
+    for name in SOURCES:
+        shutil.copy(os.path.join(here, name), tmp_path / name)
+    assert compiler_version(str(tmp_path)) == compile_cache.COMPILER_VERSION
+    with open(tmp_path / "syntactic_analyzer.py", "a") as file:
+        file.write("\n# changed\n")
+    assert compiler_version(str(tmp_path)) != compile_cache.COMPILER_VERSION
+
+
+def test_eviction_keeps_the_cache_under_its_size(tmp_path):
+    cache = CompileCache(str(tmp_path), max_bytes=2000)
+    for i in range(20):
+        cache.put(f"{CODE} // {i}", CacheEntry(["x" * 50] * 5, True))
+    assert cache.evictions
+    assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) <= 2000
+
+
+def test_batch_results_come_from_the_cache_the_second_time(tmp_path):
+    for code, ok in ((CODE, True), ("void main() { put_i(x); }", False)):
+        first = compile_code(code, cache_dir=str(tmp_path))
+        second = compile_code(code, cache_dir=str(tmp_path))
+        assert (first.cached, second.cached) == (False, True)
+        assert first.ok == second.ok == ok
+        assert (first.error, first.tokens, first.symbols) == (second.error, second.tokens, second.symbols)
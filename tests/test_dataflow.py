@@ -0,0 +1,48 @@
+from dataflow import Liveness, constant_propagation, solve
+from ir import lower_unit, reverse_postorder
+from lexical_analyzer import tokenize
+from syntactic_analyzer import Parser
+
+
+def function_of(code, name="f"):
+    parser = Parser(tokenize(code), build_ast=True)
+    parser.parse_unit()
+    function = lower_unit(parser.unit).functions[name]
+    function.link()
+    return function
+
+
+class Recording(Liveness):
+    """Liveness that records the blocks it is applied to"""
+
+    def __init__(self):
+        self.visits = []
+
+    def transfer(self, block, value):
+        self.visits.append(block)
+        return super().transfer(block, value)
+
+
+def test_straight_code_visits_each_block_once_in_order():
+    body = "".join(f"if (x > {i}) y = y + 1;\n" for i in range(30))
+    function = function_of(f"int f(int x) {{ int y; y = 0;\n{body}return y; }}")
+    analysis = Recording()
+    solve(function, analysis)
+    order = reverse_postorder(function)
+    order.reverse()  # Liveness flows backward
+    assert analysis.visits == order
+
+
+def test_constants_reach_a_fixed_point_through_loops():
+    function = function_of("""
+    int f(int n) {
+        int i; int k; int j;
+        k = 3;
+        for (i = 0; i < n; i = i + 1) { j = 0; while (j < n) { k = k * 1; j = j + 1; } }
+        return k + 2147483647;
+    }""")
+    constants, unreachable = constant_propagation(function)
+    ret = next(instr for instr in function.instructions() if instr.op == "ret")
+    value = ret.args[0]
+    assert not unreachable
+    assert any(instr.dst is value and folded == -2147483646 for instr, folded in constants.items())
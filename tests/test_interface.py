@@ -0,0 +1,78 @@
+import io
+
+import pytest
+
+from interface import SUFFIX, InterfaceFile, dump, exported_symbols, load_imports, main, write_interface
+from lexical_analyzer import tokenize
+from syntactic_analyzer import Parser
+
+LIBRARY = """
+struct Pt { int x; double y; };
+int count;
+int twice(int n) { return 2 * n; }
+void main() { count = twice(3); }
+"""
+
+
+def parse(code, imports=None):
+    parser = Parser(tokenize(code), imports=imports)
+    parser.parse_unit()
+    return parser
+
+
+def write_library(tmp_path):
+    path = str(tmp_path / ("lib" + SUFFIX))
+    write_interface(path, exported_symbols(parse(LIBRARY).symbols))
+    return path
+
+
+def test_round_trip_and_lookup(tmp_path):
+    with InterfaceFile.open(write_library(tmp_path)) as interface:
+        assert [sym.name for sym in interface.symbols()] == ["Pt", "count", "twice"]
+        twice = interface.find("twice")
+        assert twice is interface.find("twice")
+        assert [arg.name for arg in twice.args] == ["n"]
+        assert [member.name for member in interface.find("Pt").members] == ["x", "y"]
+        assert interface.find("missing") is None
+
+
+def test_main_is_not_exported(tmp_path):
+    with InterfaceFile.open(write_library(tmp_path)) as interface:
+        assert interface.find("main") is None
+
+
+def test_importing_units_that_define_main(tmp_path):
+    imports = load_imports([write_library(tmp_path)])
+    parse("void main() { put_i(twice(count)); }", imports)
+    for interface in imports:
+        interface.close()
+
+
+def test_close_unmaps_the_file(tmp_path):
+    with InterfaceFile.open(write_library(tmp_path)) as interface:
+        pass
+    assert interface.data.closed
+
+
+def test_not_an_interface_file(tmp_path):
+    path = tmp_path / ("bad" + SUFFIX)
+    path.write_bytes(b"not an interface file at all, but long enough" * 4)
+    with pytest.raises(ValueError):
+        InterfaceFile.open(str(path))
+    with pytest.raises(ValueError):
+        load_imports([write_library(tmp_path), str(path)])
+
+
+def test_dump(tmp_path):
+    out = io.StringIO()
+    with InterfaceFile.open(write_library(tmp_path)) as interface:
+        dump(interface, out)
+    assert "func    int twice(int n)" in out.getvalue()
+
+
+def test_write_command(tmp_path):
+    source = tmp_path / "lib.c"
+    source.write_text(LIBRARY)
+    assert main(["write", str(source)]) == 0
+    with InterfaceFile.open(str(tmp_path / ("lib" + SUFFIX))) as interface:
+        assert interface.find("twice") is not None and interface.find("main") is None
@@ -0,0 +1,37 @@
+import io
+
+from ir import lower_unit
+from lexical_analyzer import tokenize
+from optimize import compile_optimized
+from syntactic_analyzer import Parser
+from vm import VM, Runtime
+
+
+def parse(code):
+    parser = Parser(tokenize(code), build_ast=True)
+    parser.parse_unit()
+    return parser.unit
+
+
+def run_optimized(code, inline_calls=True):
+    out = io.StringIO()
+    program, _ = compile_optimized(parse(code), inline_calls)
+    VM(program, Runtime(io.StringIO(), out)).run()
+    return out.getvalue()
+
+
+def test_valueless_return_in_non_void_function_returns_zero():
+    module = lower_unit(parse("int f(int x) { if (x) return; return 7; } void g() { return; }"))
+    rets = [instr for instr in module.functions["f"].instructions() if instr.op == "ret"]
+    assert len(rets) == 2 and all(len(instr.args) == 1 for instr in rets)
+    assert 0 in [instr.args[0].value for instr in rets]
+    assert all(not instr.args for instr in module.functions["g"].instructions() if instr.op == "ret")
+
+
+def test_valueless_return_with_and_without_inlining():
+    code = """
+    int f(int x) { if (x) return; return 7; }
+    double g() { return; }
+    void main() { put_i(f(1)); put_i(f(0)); put_d(g()); }"""
+    assert run_optimized(code) == "070"
+    assert run_optimized(code, inline_calls=False) == "070"
@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+from ast_nodes import Break, FuncDecl
+from jit import JIT, compile_python, compile_source
+from lexical_analyzer import tokenize
+from syntactic_analyzer import Parser
+from vm import AtomCRuntimeError, Runtime
+
+
+def run(code, stdin=""):
+    out = io.StringIO()
+    JIT(compile_source(code), Runtime(io.StringIO(stdin), out)).run()
+    return out.getvalue()
+
+
+def test_int_overflow_wraps():
+    code = """
+    void main() {
+        int i; int v[1]; double d;
+        i = 2147483647; i = i + 1; put_i(i); put_c(' ');
+        v[0] = 2147483647; v[0] = v[0] + 1; put_i(v[0]); put_c(' ');
+        i = 65536; put_i(i * i + 1); put_c(' ');
+        i = -2147483647 - 1; put_i(-i); put_c(' ');
+        put_i(i / -1); put_c(' ');
+        d = 4294967296.0; put_i((int)d);
+    }"""
+    assert run(code) == "-2147483648 -2147483648 1 -2147483648 -2147483648 0"
+
+
+def test_char_arithmetic_is_masked_on_assignment():
+    code = """
+    void main() {
+        char c; char s[2];
+        c = 200; c = c + c; put_i(c); put_c(' ');
+        c = 10; c = -c; put_i(c); put_c(' ');
+        s[0] = 200; s[1] = s[0] * s[0]; put_i(s[1]); put_c(' ');
+        c = 200; put_i(c + c); put_c(' ');
+        c = 250; c = c / 2; put_i(c); put_c(' ');
+        c = 'x' * 'x'; put_i(c);
+    }"""
+    assert run(code) == "144 246 64 400 125 64"
+
+
+def test_valueless_return_in_non_void_function_returns_zero():
+    code = """
+    int f(int x) { if (x) return; return 7; }
+    double g() { return; }
+    void main() { put_i(f(1)); put_i(f(0)); put_d(g()); }"""
+    assert run(code) == "070"
+
+
+def test_break_outside_a_loop_is_a_syntax_error():
+    with pytest.raises(SyntaxError, match="Line 1: break outside a loop"):
+        compile_source("void main() { break; }")
+
+
+def test_generated_python_errors_are_reported_at_the_atomc_line():
+    parser = Parser(tokenize("void main() {\n  put_i(1);\n}"), build_ast=True)
+    parser.parse_unit()
+    main = next(decl for decl in parser.unit.decls if isinstance(decl, FuncDecl))
+    main.body.items.append(Break(2))  # Only the parser keeps it out of loops
+    with pytest.raises(SyntaxError, match="^Line 2: 'break' outside loop$"):
+        compile_python(parser.unit)
+
+
+def test_stack_overflow_is_reported_at_the_line_of_the_call():
+    code = "int r(int x) { int big[1000]; big[0] = x;\nreturn r(x + 1); }\nvoid main() { put_i(r(0)); }"
+    with pytest.raises(AtomCRuntimeError, match="^Line 2: stack overflow$"):
+        run(code)
@@ -0,0 +1,131 @@
+import glob
+import os
+
+import pytest
+
+from ir import format_function, lower_unit
+from lexical_analyzer import (S_DEAD, S_START, TRANSITIONS, TokenWindow, tokenize, tokenize_buffer, tokenize_file,
+                              tokenize_stream)
+from syntactic_analyzer import Parser
+
+ENGINES = ["regex", "dfa"]
+CORPUS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "*.c")))
+
+SOURCES = [
+    "int x; while (x <= 10) x = x + 1;",
+    "0x1F 017 0 42 1.5 1.5e-3 1e3 018.5 08e2 0.5E+2",
+    "0x1int 1.5int intx int_ _int",
+    "a.b && c || !d != e == f >= g > h < i",
+    "'a' '\\n' '\\'' \"s\\n\\?\" \"two\nlines\"",
+    "// comment\nx /* block\n comment */ y / z",
+    "1.5abc 1. 1.5e 1.5e+ x.5",
+    "// comment at the end",
+    "x /* not closed",
+    "a b \n٣.5 x",
+    "",
+]
+ERRORS = ["12ab", "1e5x", "018", "0x", "a & b", "x | y", "''", "'ab'", "\"open", "%", "int é", "٣"]
+
+
+@pytest.mark.parametrize("code", SOURCES)
+def test_engines_produce_the_same_tokens(code):
+    assert tokenize(code, "dfa") == tokenize(code, "regex")
+
+
+@pytest.mark.parametrize("path", CORPUS)
+def test_engines_agree_on_the_corpus(path):
+    with open(path, 'r') as file:
+        code = file.read()
+    assert tokenize(code, "dfa") == tokenize(code, "regex")
+
+
+@pytest.mark.parametrize("code", ERRORS)
+def test_engines_report_the_same_errors(code):
+    messages = []
+    for engine in ENGINES:
+        with pytest.raises(SyntaxError) as error:
+            tokenize("x;\n" + code, engine)
+        messages.append(str(error.value))
+    assert messages[0] == messages[1]
+    assert messages[0].startswith("LEXICAL ERROR: Line 2: ")
+
+
+def test_keywords_are_identifiers_looked_up():
+    assert tokenize("while whilex", "dfa")[:2] == [("KEYWORD", "while", 1), ("IDENTIFIER", "whilex", 1)]
+
+
+def test_transitions_are_a_table_of_states_by_byte():
+    assert all(len(row) == 256 for row in TRANSITIONS)
+    assert TRANSITIONS[S_START][ord('%')] == S_DEAD
+    assert TRANSITIONS[S_START][ord('i')] == TRANSITIONS[S_START][ord('_')] != S_DEAD
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        tokenize("x", "lalr")
+
+
+SPANNING = [
+    "x /* a block comment\nover lines ** / */ y",
+    "s = \"a string with \\\" and \\n\"; c = '\\''; d = 'q';",
+    "a <= b >= c == d != e && f || g // to the end\nh",
+    "1.5e+3 0x1F 017 12 3.25E-2 1. x.5",
+    "int intx while whiley",
+]
+
+
+def chunks(code, size):
+    return [code[start:start + size] for start in range(0, len(code), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8])
+@pytest.mark.parametrize("code", SPANNING)
+def test_tokens_spanning_chunks(code, size):
+    assert list(tokenize_stream(chunks(code, size))) == tokenize(code)
+
+
+@pytest.mark.parametrize("path", CORPUS)
+def test_tokenize_file_with_tiny_chunks(path):
+    with open(path, 'r') as file:
+        code = file.read()
+    assert list(tokenize_file(path, chunk_size=3)) == tokenize(code)
+
+
+def test_stream_reports_lexical_errors_at_their_line():
+    with pytest.raises(SyntaxError, match="Line 2: Unexpected character '%'"):
+        list(tokenize_stream(chunks("x;\ny % 2;", 2)))
+
+
+def lowered(unit):
+    """Text of the IR of every function, which reflects the whole AST"""
+    return [format_function(function) for function in lower_unit(unit).functions.values()]
+
+
+@pytest.mark.parametrize("path", CORPUS)
+def test_parser_reads_a_token_window_like_a_list(path):
+    with open(path, 'r') as file:
+        code = file.read()
+    parsed = Parser(tokenize(code), build_ast=True)
+    parsed.parse_unit()
+    streamed = Parser(TokenWindow(tokenize_file(path, chunk_size=16), history=8), build_ast=True)
+    streamed.parse_unit()
+    assert lowered(streamed.unit) == lowered(parsed.unit)
+    assert [sym.name for sym in streamed.symbols] == [sym.name for sym in parsed.symbols]
+
+
+@pytest.mark.parametrize("path", CORPUS)
+def test_parser_reads_a_token_buffer_like_a_list(path):
+    with open(path, 'r') as file:
+        code = file.read()
+    tokens = tokenize_buffer(code)
+    assert list(tokens) == tokenize(code)
+    parsed = Parser(tokenize(code), build_ast=True)
+    parsed.parse_unit()
+    buffered = Parser(tokens, build_ast=True)
+    buffered.parse_unit()
+    assert lowered(buffered.unit) == lowered(parsed.unit)
+
+
+def test_token_buffer_reports_lexical_errors():
+    with pytest.raises(SyntaxError, match="Line 2: Unexpected character '%'"):
+        tokenize_buffer("x;\ny % 2;")
@@ -0,0 +1,83 @@
+import io
+
+from ir import lower_unit
+from lexical_analyzer import tokenize
+from loops import optimize_loops
+from optimize import compile_optimized
+from syntactic_analyzer import Parser
+from vm import VM, Runtime
+
+NEST = """
+int a[10];
+int b[10];
+void main() {
+  int i; int j; int s;
+  s = 0;
+  for (i = 0; i < 10; i = i + 1) {
+    a[i] = i;
+    for (j = 0; j < 10; j = j + 1) { s = s + a[j] + b[j] + a[j]; }
+  }
+  put_i(s);
+}
+"""
+
+
+def parse(code):
+    parser = Parser(tokenize(code), build_ast=True)
+    parser.parse_unit()
+    return parser.unit
+
+
+def optimized(code, name="main"):
+    function = lower_unit(parse(code)).functions[name]
+    function.link()
+    found = optimize_loops(function)
+    return function, found
+
+
+def test_an_address_hoisted_from_both_loops_of_a_nest_is_computed_once():
+    function, found = optimized(NEST)
+    addresses = [instr.attr.name for instr in function.instructions() if instr.op == "addr"]
+    assert sorted(addresses) == ["a", "b"]
+    assert all(instr.op != "addr" for loop in found for instr in loop.instructions())
+
+
+def run(code):
+    out = io.StringIO()
+    program, _ = compile_optimized(parse(code))
+    VM(program, Runtime(io.StringIO(), out)).run()
+    return out.getvalue()
+
+
+def test_merged_nest_runs_like_the_source():
+    assert run(NEST) == str(sum(2 * sum(range(i + 1)) for i in range(10)))
+
+
+def test_a_load_is_not_merged_with_one_before_a_store():
+    code = """
+    int g[2];
+    void main() {
+      int i; int j; int s; int t;
+      s = 0;
+      for (i = 0; i < 3; i = i + 1) {
+        t = g[0];
+        g[0] = t + 1;
+        for (j = 0; j < 4; j = j + 1) { s = s + g[0]; }
+      }
+      put_i(s);
+    }
+    """
+    assert run(code) == str(4 * (1 + 2 + 3))
+
+
+def test_a_hoisted_instruction_may_use_a_merged_one():
+    code = """
+    double f(int x) {
+      int i; double s;
+      s = 0.0;
+      for (i = 0; i < 3; i = i + 1) { s = s + (double)x; s = s + ((double)x + x); }
+      return s;
+    }
+    void main() { put_d(f(2)); }
+    """
+    assert run(code) == run(code.replace("(double)x + x", "(double)(x + x)"))
@@ -0,0 +1,38 @@
+import io
+
+import ir
+from ir import lower_unit
+from lexical_analyzer import tokenize
+from optimize import compile_optimized, fold_constants, simplify_cfg
+from syntactic_analyzer import Parser
+from vm import VM, Runtime
+
+
+def parse(code):
+    parser = Parser(tokenize(code), build_ast=True)
+    parser.parse_unit()
+    return parser.unit
+
+
+def chain(n, condition="x > {i}"):
+    body = "".join(f"if ({condition.format(i=i)}) y = y + {i}; else y = y - 1;\n" for i in range(n))
+    return f"int f(int x) {{ int y; int k; y = 0; k = 25;\n{body}return y; }}\nvoid main() {{ put_i(f(get_i())); }}"
+
+
+def test_simplify_cfg_links_once_per_pass(monkeypatch):
+    function = lower_unit(parse(chain(50, "{i} < k"))).functions["f"]
+    function.link()
+    fold_constants(function)  # Leaves a chain of blocks that only jump to the next
+    links = []
+    original = ir.Function.link
+    monkeypatch.setattr(ir.Function, "link", lambda self: links.append(self) or original(self))
+    assert simplify_cfg(function)
+    assert len(links) == 1
+    assert not simplify_cfg(function)  # Every merge was done by the first pass
+
+
+def test_simplified_if_chain_runs_like_the_source():
+    out = io.StringIO()
+    program, _ = compile_optimized(parse(chain(200)))
+    VM(program, Runtime(io.StringIO("120"), out)).run()
+    assert out.getvalue() == str(sum(range(120)) - 80)
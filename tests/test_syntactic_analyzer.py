@@ -0,0 +1,49 @@
+import pytest
+
+from ast_nodes import Cast, Const, FuncDecl
+from lexical_analyzer import tokenize
+from syntactic_analyzer import TB_CHAR, TB_INT, Parser
+
+
+def folded(expr, t="int"):
+    """Node of expr, assigned to a variable of type t"""
+    parser = Parser(tokenize(f"{t} x; void main() {{ x = {expr}; }}"), build_ast=True)
+    parser.parse_unit()
+    main = next(decl for decl in parser.unit.decls if isinstance(decl, FuncDecl))
+    return main.body.items[0].expr.value
+
+
+@pytest.mark.parametrize("expr, value", [
+    ("2147483647 + 1", -2147483648),
+    ("-2147483647 - 1 - 1", 2147483647),
+    ("65536 * 65536", 0),
+    ("-(-2147483647 - 1)", -2147483648),
+    ("(-2147483647 - 1) / -1", -2147483648),
+    ("(int)4294967297.5", 1),
+    ("-7 / 2", -3),
+    ("2 < 3 && 0 || 1", 1),
+])
+def test_int_folding_wraps_like_the_vm(expr, value):
+    node = folded(expr)
+    assert isinstance(node, Const) and node.value == value and node.type.typeBase == TB_INT
+
+
+def test_char_folding_is_done_on_ints_and_masked_by_casts():
+    node = folded("'x' * 'x'", "char")
+    assert (node.value, node.type.typeBase) == (14400, TB_CHAR)  # Masked when stored, like c * c
+    assert folded("(char)('x' * 'x')", "char").value == 64
+
+
+def test_double_folding_does_not_wrap():
+    assert folded("2147483647 * 2.0", "double").value == 4294967294.0
+
+
+def test_conversions_that_fail_are_left_to_run_time():
+    assert isinstance(folded("(int)(1e308 * 10)"), Cast)
+
+
+def test_struct_condition_is_an_error_and_prints_nothing(capsys):
+    parser = Parser(tokenize("struct P { int x; }; void main() { struct P p; if (p) put_i(1); }"))
+    with pytest.raises(SyntaxError, match="a structure cannot be logically tested"):
+        parser.parse_unit()
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,102 @@
+import io
+
+import pytest
+
+from vm import VM, AtomCRuntimeError, Runtime, compile_source
+
+
+def run(code, optimize=False, stdin=""):
+    out = io.StringIO()
+    VM(compile_source(code, optimize), Runtime(io.StringIO(stdin), out)).run()
+    return out.getvalue()
+
+
+@pytest.fixture(params=[False, True], ids=["codegen", "optimized"])
+def optimize(request):
+    return request.param
+
+
+def test_int_overflow_wraps_in_registers_and_memory(optimize):
+    code = """
+    void main() {
+        int i; int v[1];
+        i = 2147483647; i = i + 1; put_i(i); put_c(' ');
+        v[0] = 2147483647; v[0] = v[0] + 1; put_i(v[0]); put_c(' ');
+        i = 65536; i = i * 65536; put_i(i); put_c(' ');
+        i = -2147483647; i = i - 2; put_i(i); put_c(' ');
+        i = -2147483647 - 1; put_i(-i); put_c(' ');
+        put_i(i / -1);
+    }"""
+    assert run(code, optimize) == "-2147483648 -2147483648 0 2147483647 -2147483648 -2147483648"
+
+
+def test_char_arithmetic_is_masked_on_assignment(optimize):
+    code = """
+    void main() {
+        char c; char s[2];
+        c = 200; c = c + c; put_i(c); put_c(' ');
+        c = 10; c = -c; put_i(c); put_c(' ');
+        s[0] = 200; s[1] = s[0] * s[0]; put_i(s[1]); put_c(' ');
+        c = 200; put_i(c + c); put_c(' ');
+        put_i((char)(c + c)); put_c(' ');
+        c = 'x' * 'x'; put_i(c);
+    }"""
+    assert run(code, optimize) == "144 246 64 400 144 64"
+
+
+def test_counted_loop_increment_wraps(optimize):
+    code = """
+    void main() {
+        int i; int n;
+        n = 10;
+        for (i = 0; i < n; i = i + 1) { if (i < 0) { put_i(i); break; } if (i == 5) i = 2147483647; }
+    }"""
+    assert run(code, optimize) == "-2147483648"
+
+
+def test_double_arithmetic_does_not_wrap(optimize):
+    code = "void main() { double d; d = 2147483647; d = d * 4 - d; put_d(-d); }"
+    assert run(code, optimize) == "-6.44245e+09"
+
+
+def test_get_i_wraps_its_input(optimize):
+    assert run("void main() { put_i(get_i()); }", optimize, "4294967297") == "1"
+
+
+def test_short_circuit_assigned_to_an_operand(optimize):
+    code = """
+    void main() {
+        int x; char c;
+        x = 7; x = (x == 7) && 1; put_i(x);
+        x = 7; x = x == 8 || x == 7; put_i(x);
+        c = 'a'; c = c == 'a' && c; put_i(c);
+    }"""
+    assert run(code, optimize) == "111"
+
+
+def test_break_outside_a_loop_is_a_syntax_error(optimize):
+    with pytest.raises(SyntaxError, match="Line 1: break outside a loop"):
+        compile_source("void main() { if (1) break; }", optimize)
+
+
+def test_break_leaves_the_innermost_loop(optimize):
+    code = """
+    void main() {
+        int i; int j;
+        for (i = 0; i < 3; i = i + 1) { for (j = 0; ; j = j + 1) { if (j == i) break; } put_i(j); }
+        while (1) break;
+    }"""
+    assert run(code, optimize) == "012"
+
+
+def test_valueless_return_in_non_void_function_returns_zero(optimize):
+    code = """
+    int f(int x) { if (x) return; return 7; }
+    void main() { put_i(f(1)); put_i(f(0)); }"""
+    assert run(code, optimize) == "07"
+
+
+def test_stack_overflow_is_reported_at_the_line_of_the_call(optimize):
+    code = "int r(int x) { int big[1000]; big[0] = x;\nreturn r(x + 1); }\nvoid main() { put_i(r(0)); }"
+    with pytest.raises(AtomCRuntimeError, match="^Line 2: stack overflow$"):
+        run(code, optimize)
@@ -0,0 +1,436 @@
+"""
+Virtual machine executing the bytecode produced by codegen.compile_unit.
+
+Usage: python vm.py FILE.c [-O] [--disassemble] [--layout] [--profile] [--folded OUT [--folded-metric time]]
+
+-O compiles through the optimizing pipeline of optimize.py instead of codegen.compile_unit.
+
+The dispatch loop keeps pc, the register list of the current frame and the globals in
+locals, and tests opcodes roughly in order of how often they execute. Calls push
+(return pc, caller registers, result register, caller frame address) on a list instead of
+recursing in Python. int and char values are Python ints and double values are Python
+floats. int arithmetic wraps to 32 bits like in C; char arithmetic is done on ints, and
+values are masked to an unsigned byte when converted to char.
+
+Arrays and structs live in one Memory: the static data of the program followed by the
+stack, where each call takes the zeroed frame_size bytes of its function. Typed memoryview
+casts of the same bytes read and write int and double elements, whose addresses the
+layout keeps aligned, so an access is a single index operation.
+"""
+import argparse
+import sys
+import time
+
+from codegen import (ADD, ADDF, ADDK, CALL, CONST, DIVF, DIVI, EQ, EXT, FRAME, GE, GETG, GT, INCJLT, INCJLTK, JEQ, JEQK, JGE,
+                     JGEK, JGT, JGTK, JLE, JLEK, JLT, JLTK, JMP, JNE, JNEK, JNZ, JZ, LDC, LDD, LDFC, LDFD, LDFI, LDI, LE,
+                     LT, MEMCPY, MOV, MUL, MULF, MULK, NE, NEG, NEGF, NOT, RET, RETV, SETG, STC, STD, STFC, STFD, STFI, STI, SUB, SUBF, SUBK,
+                     TOCHAR, TODOUBLE, TOINT, compile_unit, disassemble)
+from layout import MAX_ALIGN, align_up, format_layouts
+from lexical_analyzer import tokenize
+from syntactic_analyzer import Parser, wrap_int
+
+
+class AtomCRuntimeError(Exception):
+    def __init__(self, message, line=None):
+        super().__init__(f"Line {line}: {message}" if line is not None else message)
+        self.line = line
+
+
+DEFAULT_STACK_SIZE = 1 << 20  # Bytes of memory for the frames of active calls
+
+
+def int_div(a, b):
+    """C integer division, truncating toward zero"""
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+class Memory:
+    """Flat byte memory: static data, then the stack; `ints` and `doubles` view the same bytes"""
+
+    def __init__(self, data, stack_size=DEFAULT_STACK_SIZE):
+        self.stack_base = align_up(len(data), MAX_ALIGN)
+        self.bytes = bytearray(data) + bytes(self.stack_base - len(data) + align_up(stack_size, MAX_ALIGN))
+        self.view = memoryview(self.bytes)  # Slices of a view copy faster than bytearray slices
+        self.ints = self.view.cast("i")
+        self.doubles = self.view.cast("d")
+
+    def string(self, address):
+        """Python text of the zero terminated string at address"""
+        end = self.bytes.find(0, address)
+        return self.bytes[address:end if end >= 0 else len(self.bytes)].decode("latin-1")
+
+    def store_string(self, address, text):
+        codes = bytes(ord(c) & 0xFF for c in text) + b"\0"
+        self.bytes[address:address + len(codes)] = codes
+
+
+class Runtime:
+    """The external functions registered by Parser.addExtFuncs"""
+
+    def __init__(self, stdin=None, stdout=None):
+        self.stdin = stdin if stdin is not None else sys.stdin
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self.pending = ""  # Input read from stdin and not consumed yet
+        self.memory = None  # Memory of the VM running the program; char arrays are addresses in it
+
+    def _fill(self):
+        line = self.stdin.readline()
+        if not line:
+            raise AtomCRuntimeError("unexpected end of input")
+        self.pending += line
+
+    def _word(self):
+        while not self.pending.strip():
+            self.pending = ""
+            self._fill()
+        words = self.pending.lstrip().split(None, 1)
+        self.pending = words[1] if len(words) > 1 else ""
+        return words[0]
+
+    def put_s(self, s):
+        self.stdout.write(self.memory.string(s))
+
+    def get_s(self, s):
+        while not self.pending:
+            self._fill()
+        text, _, self.pending = self.pending.partition("\n")
+        self.memory.store_string(s, text)  # Like C gets(), the array size is not known here
+
+    def put_i(self, i):
+        self.stdout.write(str(i))
+
+    def get_i(self):
+        word = self._word()
+        try:
+            return wrap_int(int(word))
+        except ValueError:
+            raise AtomCRuntimeError(f"get_i: invalid int {word!r}") from None
+
+    def put_d(self, d):
+        self.stdout.write(f"{d:g}")
+
+    def get_d(self):
+        word = self._word()
+        try:
+            return float(word)
+        except ValueError:
+            raise AtomCRuntimeError(f"get_d: invalid double {word!r}") from None
+
+    def put_c(self, c):
+        self.stdout.write(chr(c & 0xFF))
+
+    def get_c(self):
+        while not self.pending.strip():
+            self.pending = ""
+            self._fill()
+        self.pending = self.pending.lstrip()
+        c, self.pending = self.pending[0], self.pending[1:]
+        return ord(c) & 0xFF
+
+    @staticmethod
+    def seconds():
+        return time.perf_counter()
+
+
+class VM:
+    def __init__(self, program, runtime=None, stack_size=DEFAULT_STACK_SIZE):
+        self.program = program
+        self.runtime = runtime if runtime is not None else Runtime()
+        self.globals = list(program.globals)
+        self.memory = self.runtime.memory = Memory(program.data, stack_size)
+
+        # Link external calls to the runtime's bound methods
+        self.code = []
+        for op, a, b, c in program.code:
+            if op == EXT:
+                name, nargs = b
+                b = (getattr(self.runtime, name), nargs)
+            self.code.append((op, a, b, c))
+
+    def run(self, entry="main", profile=None):
+        """Runs entry() to completion and returns its result; profile: a vm_profile.VMProfile to fill"""
+        function = self.program.functions.get(entry)
+        if function is None:
+            raise AtomCRuntimeError(f"no {entry} function")
+        code = self.code if profile is None else profile.code(self.code, entry)
+        g = self.globals
+        memory = self.memory
+        mem = memory.bytes
+        view = memory.view
+        mi = memory.ints
+        md = memory.doubles
+        limit = len(mem)
+        fp = memory.stack_base  # Address of the current frame
+        sp = fp + function.frame_size  # First free byte of the stack
+        if sp > limit:
+            raise AtomCRuntimeError("stack overflow")
+        view[fp:sp] = function.frame_zero
+        r = list(function.frame)
+        pc = function.entry
+        stack = []
+        try:
+            while True:
+                op, a, b, c = code[pc]
+                pc += 1
+                if op == INCJLTK:
+                    i = r[a] + 1
+                    r[a] = i
+                    if i < b:
+                        pc = c
+                    elif i > 0x7FFFFFFF:
+                        r[a] = i = wrap_int(i)
+                        if i < b:
+                            pc = c
+                elif op == LDI:
+                    r[a] = mi[(r[b] >> 2) + r[c]]
+                elif op == STI:
+                    try:
+                        mi[(r[a] >> 2) + r[b]] = r[c]
+                    except ValueError:  # An int constant of the source that does not fit 32 bits
+                        mi[(r[a] >> 2) + r[b]] = wrap_int(r[c])
+                elif op == ADD:
+                    v = r[b] + r[c]
+                    r[a] = v if -0x80000000 <= v <= 0x7FFFFFFF else wrap_int(v)
+                elif op == MOV:
+                    r[a] = r[b]
+                elif op == ADDK:
+                    v = r[b] + c
+                    r[a] = v if -0x80000000 <= v <= 0x7FFFFFFF else wrap_int(v)
+                elif op == INCJLT:
+                    i = r[a] + 1
+                    r[a] = i
+                    if i < r[b]:
+                        pc = c
+                    elif i > 0x7FFFFFFF:
+                        r[a] = i = wrap_int(i)
+                        if i < r[b]:
+                            pc = c
+                elif op == JLTK:
+                    if r[a] < b:
+                        pc = c
+                elif op == JGEK:
+                    if r[a] >= b:
+                        pc = c
+                elif op == CONST:
+                    r[a] = b
+                elif op == JMP:
+                    pc = a
+                elif op == CALL:
+                    frame = b.frame[:]
+                    if b.nargs:
+                        frame[:b.nargs] = r[c:c + b.nargs]
+                    stack.append((pc, r, a, fp))
+                    r = frame
+                    pc = b.entry
+                    fp = sp
+                    if b.frame_size:
+                        sp += b.frame_size
+                        if sp > limit:  # pc is already the callee's: report the line of the call
+                            raise AtomCRuntimeError("stack overflow", self.program.lines[stack[-1][0] - 1])
+                        view[fp:sp] = b.frame_zero
+                elif op == RET:
+                    value = r[a]
+                    if not stack:
+                        return value
+                    sp = fp
+                    pc, r, a, fp = stack.pop()
+                    r[a] = value
+                elif op == RETV:
+                    if not stack:
+                        return None
+                    sp = fp
+                    pc, r, a, fp = stack.pop()
+                elif op == SUB:
+                    v = r[b] - r[c]
+                    r[a] = v if -0x80000000 <= v <= 0x7FFFFFFF else wrap_int(v)
+                elif op == MUL:
+                    v = r[b] * r[c]
+                    r[a] = v if -0x80000000 <= v <= 0x7FFFFFFF else wrap_int(v)
+                elif op == SUBK:
+                    v = r[b] - c
+                    r[a] = v if -0x80000000 <= v <= 0x7FFFFFFF else wrap_int(v)
+                elif op == MULK:
+                    v = r[b] * c
+                    r[a] = v if -0x80000000 <= v <= 0x7FFFFFFF else wrap_int(v)
+                elif op == ADDF:
+                    r[a] = r[b] + r[c]
+                elif op == SUBF:
+                    r[a] = r[b] - r[c]
+                elif op == MULF:
+                    r[a] = r[b] * r[c]
+                elif op == DIVF:
+                    r[a] = r[b] / r[c]
+                elif op == DIVI:
+                    r[a] = wrap_int(int_div(r[b], r[c]))
+                elif op == JLT:
+                    if r[a] < r[b]:
+                        pc = c
+                elif op == JLE:
+                    if r[a] <= r[b]:
+                        pc = c
+                elif op == JGT:
+                    if r[a] > r[b]:
+                        pc = c
+                elif op == JGE:
+                    if r[a] >= r[b]:
+                        pc = c
+                elif op == JEQ:
+                    if r[a] == r[b]:
+                        pc = c
+                elif op == JNE:
+                    if r[a] != r[b]:
+                        pc = c
+                elif op == JLEK:
+                    if r[a] <= b:
+                        pc = c
+                elif op == JGTK:
+                    if r[a] > b:
+                        pc = c
+                elif op == JEQK:
+                    if r[a] == b:
+                        pc = c
+                elif op == JNEK:
+                    if r[a] != b:
+                        pc = c
+                elif op == JZ:
+                    if not r[a]:
+                        pc = b
+                elif op == JNZ:
+                    if r[a]:
+                        pc = b
+                elif op == GETG:
+                    r[a] = g[b]
+                elif op == SETG:
+                    g[a] = r[b]
+                elif op == LDFI:
+                    r[a] = mi[(r[b] + c) >> 2]
+                elif op == STFI:
+                    try:
+                        mi[(r[a] + b) >> 2] = r[c]
+                    except ValueError:
+                        mi[(r[a] + b) >> 2] = wrap_int(r[c])
+                elif op == LDD:
+                    r[a] = md[(r[b] >> 3) + r[c]]
+                elif op == STD:
+                    md[(r[a] >> 3) + r[b]] = r[c]
+                elif op == LDFD:
+                    r[a] = md[(r[b] + c) >> 3]
+                elif op == STFD:
+                    md[(r[a] + b) >> 3] = r[c]
+                elif op == LDC:
+                    r[a] = mem[r[b] + r[c]]
+                elif op == STC:
+                    mem[r[a] + r[b]] = r[c] & 0xFF
+                elif op == LDFC:
+                    r[a] = mem[r[b] + c]
+                elif op == STFC:
+                    mem[r[a] + b] = r[c] & 0xFF
+                elif op == FRAME:
+                    r[a] = fp + b
+                elif op == MEMCPY:
+                    dst = r[a]
+                    src = r[b]
+                    view[dst:dst + c] = view[src:src + c]
+                elif op == LT:
+                    r[a] = 1 if r[b] < r[c] else 0
+                elif op == LE:
+                    r[a] = 1 if r[b] <= r[c] else 0
+                elif op == GT:
+                    r[a] = 1 if r[b] > r[c] else 0
+                elif op == GE:
+                    r[a] = 1 if r[b] >= r[c] else 0
+                elif op == EQ:
+                    r[a] = 1 if r[b] == r[c] else 0
+                elif op == NE:
+                    r[a] = 1 if r[b] != r[c] else 0
+                elif op == NEG:
+                    r[a] = wrap_int(-r[b])
+                elif op == NEGF:
+                    r[a] = -r[b]
+                elif op == NOT:
+                    r[a] = 0 if r[b] else 1
+                elif op == EXT:
+                    fn, nargs = b
+                    r[a] = fn(*r[c:c + nargs])
+                elif op == TOINT:
+                    r[a] = wrap_int(int(r[b]))
+                elif op == TOCHAR:
+                    r[a] = int(r[b]) & 0xFF
+                elif op == TODOUBLE:
+                    r[a] = float(r[b])
+                else:
+                    raise AtomCRuntimeError(f"invalid opcode {op}")
+        except AtomCRuntimeError as e:
+            if e.line is None:
+                raise AtomCRuntimeError(str(e), self.program.lines[pc - 1]) from None
+            raise
+        except ZeroDivisionError:
+            raise AtomCRuntimeError("division by zero", self.program.lines[pc - 1]) from None
+        except IndexError:
+            raise AtomCRuntimeError("memory access out of bounds", self.program.lines[pc - 1]) from None
+        except (TypeError, ValueError, OverflowError) as e:
+            raise AtomCRuntimeError(str(e), self.program.lines[pc - 1]) from None
+        finally:
+            if profile is not None:
+                profile.finish(pc - 1)
+
+
+def compile_source(code, optimize=False):
+    """Lexes, parses and lowers AtomC source to a Program, through the optimizer if optimize is True"""
+    parser = Parser(tokenize(code), build_ast=True)
+    parser.parse_unit()
+    if optimize:
+        from optimize import compile_optimized  # Imports this module
+        return compile_optimized(parser.unit)[0]
+    return compile_unit(parser.unit)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compile and run an AtomC program")
+    arg_parser.add_argument("path", help="AtomC source file")
+    arg_parser.add_argument("-O", "--optimize", action="store_true", help="inline and optimize through the IR")
+    arg_parser.add_argument("--disassemble", action="store_true", help="print the bytecode instead of running it")
+    arg_parser.add_argument("--layout", action="store_true", help="print the struct layouts instead of running")
+    arg_parser.add_argument("--profile", action="store_true", help="print a hot-spot report to stderr after the run")
+    arg_parser.add_argument("--folded", default=None, help="write the folded call stacks of the run to this file")
+    arg_parser.add_argument("--folded-metric", choices=["instructions", "time"], default="instructions",
+                            help="value of each folded stack (time is in microseconds)")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.path, 'r') as file:
+        code = file.read()
+    try:
+        program = compile_source(code, args.optimize)
+    except SyntaxError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.disassemble or args.layout:
+        if args.layout:
+            print(format_layouts(program.layouts))
+        if args.disassemble:
+            print(disassemble(program))
+        return 0
+    vm = VM(program)
+    profile = None
+    if args.profile or args.folded:
+        from vm_profile import VMProfile
+        profile = VMProfile(program, vm.runtime.seconds)
+    status = 0
+    try:
+        vm.run(profile=profile)
+    except AtomCRuntimeError as e:
+        sys.stdout.flush()
+        print(f"\nruntime error: {e}", file=sys.stderr)
+        status = 1
+    sys.stdout.flush()
+    if args.profile:
+        print(f"\n{profile.report(code.splitlines())}", file=sys.stderr)
+    if args.folded:
+        with open(args.folded, "w") as file:
+            file.write(profile.folded(args.folded_metric))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
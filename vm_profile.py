@@ -0,0 +1,178 @@
+"""
+Profiling of AtomC programs run by vm.VM: calls and executed instructions per function and
+per source line, wall time sampled with the clock of the seconds() builtin, a hot-spot
+report and flame-graph folded stacks.
+
+VM.run(profile=VMProfile(...)) fetches instructions through ProfiledCode, a list whose
+indexing does the bookkeeping, so the dispatch loop itself is unchanged and an unprofiled
+run pays nothing. Each fetch counts the instruction; CALL and RET/RETV fetches also
+maintain a shadow call stack, and the time since the previous call or return is charged to
+the stack being left, so stack times are exact up to the clock's resolution. Line times
+are sampled: every `interval` instructions the time since the previous sample goes to the
+line of the instruction being fetched.
+
+Folded stacks (`main;sum 4000000` per line) are what flamegraph.pl and speedscope read;
+the value is executed instructions, or microseconds with metric="time".
+"""
+from codegen import CALL, JUMP_TARGET, RET, RETV
+
+DEFAULT_INTERVAL = 97  # Instructions between line samples; prime, so loops of a dividing length do not alias
+
+
+class ProfiledCode(list):
+    """Instruction list that reports every fetch to its VMProfile"""
+
+    def __init__(self, code, profile):
+        super().__init__(code)
+        self.profile = profile
+        self.callees = {pc: instruction[2].name for pc, instruction in enumerate(code) if instruction[0] == CALL}
+        self.returns = {pc for pc, instruction in enumerate(code) if instruction[0] in (RET, RETV)}
+
+    def __getitem__(self, pc):
+        profile = self.profile
+        profile.counts[pc] += 1
+        profile.ticks += 1
+        if profile.ticks >= profile.next_sample:
+            profile.sample(pc)
+        if pc in self.callees:
+            profile.enter(self.callees[pc])
+        elif pc in self.returns:
+            profile.leave()
+        return list.__getitem__(self, pc)
+
+
+class VMProfile:
+    def __init__(self, program, clock, interval=DEFAULT_INTERVAL):
+        self.program = program
+        self.clock = clock
+        self.interval = interval
+        self.counts = [0] * len(program.code)  # Executions of each instruction
+        self.line_times = {}  # Source line -> seconds
+        self.stack_counts = {}  # Folded stack -> instructions executed with that stack
+        self.stack_times = {}  # Folded stack -> seconds
+        self.calls = {}  # Function name -> calls
+        self.ticks = 0  # Instructions executed so far
+        self.next_sample = interval
+        self.stack = []  # Folded stack of each active call, innermost last
+        self.stack_ticks = 0  # ticks when the current stack was entered
+        self.last_time = 0.0  # Clock at the last call or return
+        self.last_sample = 0.0  # Clock at the last line sample
+        self.start_time = 0.0
+        self.total_time = 0.0
+
+    def code(self, code, entry):
+        """The instructions to run entry() with, profiled"""
+        self.stack = [entry]
+        self.calls[entry] = self.calls.get(entry, 0) + 1
+        self.stack_ticks = self.ticks
+        self.last_time = self.last_sample = self.start_time = self.clock()
+        return ProfiledCode(code, self)
+
+    # ---------- Events ----------
+
+    def _charge(self):
+        """Charges the instructions and time since the last call or return to the current stack"""
+        now = self.clock()
+        key = self.stack[-1]
+        self.stack_times[key] = self.stack_times.get(key, 0.0) + now - self.last_time
+        self.stack_counts[key] = self.stack_counts.get(key, 0) + self.ticks - self.stack_ticks
+        self.last_time = now
+        self.stack_ticks = self.ticks
+
+    def enter(self, name):
+        self._charge()
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.stack.append(f"{self.stack[-1]};{name}")
+
+    def leave(self):
+        self._charge()
+        if len(self.stack) > 1:
+            self.stack.pop()
+
+    def sample(self, pc):
+        now = self.clock()
+        line = self.program.lines[pc]
+        self.line_times[line] = self.line_times.get(line, 0.0) + now - self.last_sample
+        self.last_sample = now
+        self.next_sample = self.ticks + self.interval
+
+    def finish(self, pc):
+        """Closes the run at the instruction pc; called by VM.run however the program ends"""
+        if self.stack:
+            self.sample(pc)
+            self._charge()
+            self.stack = []
+        self.total_time = self.last_time - self.start_time
+
+    # ---------- Results ----------
+
+    def function_of(self):
+        """Name of the function of each instruction"""
+        names = [None] * len(self.program.code)
+        for name, function in self.program.functions.items():
+            names[function.entry:function.end] = [name] * (function.end - function.entry)
+        return names
+
+    def function_stats(self):
+        """{name: (calls, self instructions, self seconds)}"""
+        instructions = {}
+        for name, count in zip(self.function_of(), self.counts):
+            instructions[name] = instructions.get(name, 0) + count
+        seconds = {}
+        for key, elapsed in self.stack_times.items():
+            name = key.rsplit(";", 1)[-1]
+            seconds[name] = seconds.get(name, 0.0) + elapsed
+        return {name: (self.calls.get(name, 0), instructions.get(name, 0), seconds.get(name, 0.0))
+                for name in self.program.functions if name in self.calls or instructions.get(name)}
+
+    def line_stats(self):
+        """{line: (instructions, seconds)}"""
+        counts = {}
+        for line, count in zip(self.program.lines, self.counts):
+            if count:
+                counts[line] = counts.get(line, 0) + count
+        return {line: (count, self.line_times.get(line, 0.0)) for line, count in counts.items()}
+
+    def hot_loops(self):
+        """(iterations, first line, last line, function) of every loop that ran, most iterations first"""
+        names = self.function_of()
+        loops = {}
+        for pc, instruction in enumerate(self.program.code):
+            position = JUMP_TARGET.get(instruction[0])
+            if position is None:
+                continue
+            target = instruction[position]
+            if target <= pc and self.counts[target]:  # Backward branch: target is the loop head
+                lines = self.program.lines[target:pc + 1]
+                loops[target] = (self.counts[target], min(lines), max(lines), names[pc])
+        return sorted(loops.values(), key=lambda loop: (-loop[0], loop[1]))
+
+    def folded(self, metric="instructions"):
+        """Flame graph input: one `stack value` line per call stack"""
+        if metric == "time":
+            values = {key: round(elapsed * 1e6) for key, elapsed in self.stack_times.items()}
+        else:
+            values = self.stack_counts
+        return "".join(f"{key} {value}\n" for key, value in sorted(values.items()) if value)
+
+    def report(self, source_lines=None, top=15):
+        """Hot-spot report; source_lines (the program text split in lines) adds the code of each line"""
+        total = sum(self.counts) or 1
+        lines = [f"{sum(self.counts)} instructions, {self.total_time * 1000:.1f} ms", "",
+                 f"{'function':20} {'calls':>10} {'instructions':>14} {'%':>6} {'ms':>10}"]
+        stats = sorted(self.function_stats().items(), key=lambda item: -item[1][1])
+        for name, (calls, count, seconds) in stats:
+            lines.append(f"{name:20} {calls:>10} {count:>14} {count * 100 / total:>6.1f} {seconds * 1000:>10.1f}")
+
+        lines += ["", f"{'line':>6} {'instructions':>14} {'%':>6} {'ms':>10}  source"]
+        hot = sorted(self.line_stats().items(), key=lambda item: (-item[1][0], item[0]))[:top]
+        for line, (count, seconds) in hot:
+            text = source_lines[line - 1].strip() if source_lines and 0 < line <= len(source_lines) else ""
+            lines.append(f"{line:>6} {count:>14} {count * 100 / total:>6.1f} {seconds * 1000:>10.1f}  {text}")
+
+        loops = self.hot_loops()[:top]
+        if loops:
+            lines += ["", f"{'loop lines':>12} {'iterations':>12}  function"]
+            for iterations, first, last, name in loops:
+                lines.append(f"{f'{first}-{last}':>12} {iterations:>12}  {name}")
+        return "\n".join(lines)